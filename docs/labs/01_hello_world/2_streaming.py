@@ -4,26 +4,30 @@ Streaming Responses
 Instead of waiting for the full response, get tokens as they're generated.
 Watch the text appear word by word - like the model is typing.
 
+With streaming, the number that matters is time to FIRST token, not time
+to the full response. stream_metrics.py times every chunk as it arrives.
+
 Run: uv run python docs/labs/01_hello_world/2_streaming.py
 """
 
-import time
-
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from stream_metrics import StreamMetrics, instrumented_create
+
 load_dotenv()  # Load OPENAI_API_KEY from .env
 
 client = OpenAI()  # Automatically uses OPENAI_API_KEY env var
 
-start = time.time()
+metrics = StreamMetrics()
 
-stream = client.chat.completions.create(
+stream = instrumented_create(
+    client,
+    metrics,
     model="gpt-4.1-mini",
     messages=[
         {"role": "user", "content": "Write a haiku about APIs."}
     ],
-    stream=True,
 )
 
 print("Response: ", end="", flush=True)
@@ -33,5 +37,12 @@ for chunk in stream:
     if content:
         print(content, end="", flush=True)
 
-elapsed = time.time() - start
-print(f"\n\n⏱ {elapsed:.2f}s (time to full response)")
+timing = stream.timing
+gaps = metrics.histogram("inter_token_seconds", "gpt-4.1-mini")
+print(f"\n\n⏱ {timing.ttft:.2f}s to first token, {timing.total:.2f}s to full response")
+print(f"⚡ {timing.tokens_per_sec or 0:.0f} tokens/sec, gap between chunks p50 {gaps.percentile(50) * 1000:.0f}ms / p99 {gaps.percentile(99) * 1000:.0f}ms")
+if timing.stalls:
+    print(f"⚠️  {timing.stalls} stall(s), longest gap {timing.max_gap:.2f}s")
+
+# Same numbers, ready for a dashboard (JSON) or a /metrics endpoint (Prometheus)
+print(f"\n📊 Prometheus:\n{metrics.to_prometheus()}")
@@ -4,52 +4,56 @@ Voice In, Voice Out
 Record your voice → Whisper transcribes it → LLM responds → TTS speaks the answer.
 This shows the full pipeline for voice-based AI interaction.
 
-Run: uv run python docs/labs/01_hello_world/3_voice.py
+By default the reply is PIPELINED: it is spoken sentence by sentence while the
+LLM is still writing it (see voice_pipeline.py). --sequential waits for each
+stage to finish, as the original did - compare the time to first audio.
+
+Run: uv run python docs/labs/01_hello_world/3_voice.py [--sequential]
 """
 
-import tempfile
-from pathlib import Path
+import argparse
+import time
+from typing import Optional
 
+import numpy as np
 import sounddevice as sd
-import soundfile as sf
 from dotenv import load_dotenv
 from openai import OpenAI
 
+from audio_io import decode_audio, encode_wav
+from vad_recorder import record_utterance
+from voice_pipeline import respond_and_speak
+
 load_dotenv()  # Load OPENAI_API_KEY from .env
 
 client = OpenAI()  # Automatically uses OPENAI_API_KEY env var
 
 SAMPLE_RATE = 16000  # Whisper expects 16kHz
-RECORD_SECONDS = 5
+MAX_RECORD_SECONDS = 15  # Recording stops when you stop talking; this is just the cap
 
+SYSTEM_PROMPT = "You are a helpful assistant. Keep responses brief and conversational."
 
-def record_audio() -> Path:
-    """Record audio from microphone and save to temp file."""
-    print(f"🎤 Recording for {RECORD_SECONDS} seconds... Speak now!")
 
-    audio = sd.rec(
-        int(RECORD_SECONDS * SAMPLE_RATE),
-        samplerate=SAMPLE_RATE,
-        channels=1,
-        dtype="float32",
-    )
-    sd.wait()
-    print("✓ Recording complete")
+def record_audio() -> Optional[np.ndarray]:
+    """Record until you stop speaking and trim the silence. Stays in memory."""
+    print("🎤 Listening... Speak now! (stops when you pause)")
 
-    temp_file = Path(tempfile.gettempdir()) / "voice_input.wav"
-    sf.write(temp_file, audio, SAMPLE_RATE)
-    return temp_file
+    audio = record_utterance(SAMPLE_RATE, max_seconds=MAX_RECORD_SECONDS)
+    if len(audio) == 0:
+        print("✗ Didn't hear anything")
+        return None
+    print(f"✓ Recording complete ({len(audio) / SAMPLE_RATE:.1f}s of speech)")
+    return audio
 
 
-def transcribe(audio_path: Path) -> str:
-    """Transcribe audio file using Whisper."""
+def transcribe(audio: np.ndarray) -> str:
+    """Transcribe recorded samples using Whisper (uploaded straight from memory)."""
     print("📝 Transcribing...")
 
-    with open(audio_path, "rb") as f:
-        transcript = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=f,
-        )
+    transcript = client.audio.transcriptions.create(
+        model="whisper-1",
+        file=encode_wav(audio, SAMPLE_RATE),
+    )
 
     print(f"✓ You said: \"{transcript.text}\"")
     return transcript.text
@@ -62,7 +66,7 @@ def get_response(text: str) -> str:
     response = client.chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
-            {"role": "system", "content": "You are a helpful assistant. Keep responses brief and conversational."},
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": text},
         ],
     )
@@ -72,40 +76,72 @@ def get_response(text: str) -> str:
     return reply
 
 
-def speak(text: str) -> None:
+def speak(text: str, started_at: Optional[float] = None) -> None:
     """Convert text to speech and play it."""
     print("🔊 Speaking...")
 
-    speech_file = Path(tempfile.gettempdir()) / "voice_output.mp3"
-
-    response = client.audio.speech.create(
+    with client.audio.speech.with_streaming_response.create(
         model="tts-1",
         voice="nova",
         input=text,
-    )
+    ) as response:
+        mp3_bytes = b"".join(response.iter_bytes())
 
-    response.stream_to_file(speech_file)
-
-    # Play the audio
-    data, samplerate = sf.read(speech_file)
+    # Play the audio, decoded in memory
+    data, samplerate = decode_audio(mp3_bytes)
     sd.play(data, samplerate)
+    if started_at is not None:
+        print(f"⏱ First audio after {time.perf_counter() - started_at:.2f}s")
     sd.wait()
     print("✓ Done")
 
 
+def respond_pipelined(text: str) -> str:
+    """Stream the LLM response and speak each sentence as soon as it is complete."""
+    print("🤖 Thinking and 🔊 speaking at the same time...")
+    print('✓ Response: "', end="", flush=True)
+
+    reply, timing = respond_and_speak(
+        client,
+        [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": text},
+        ],
+        on_text=lambda chunk: print(chunk, end="", flush=True),
+    )
+
+    print('"')
+    if timing.first_audio is not None:
+        print(f"⏱ First audio after {timing.first_audio:.2f}s (first sentence ready at {timing.first_sentence:.2f}s)")
+    print(f"✓ Done: {timing.sentences} sentence(s) in {timing.total:.2f}s")
+    return reply
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sequential", action="store_true", help="Run the stages one after another")
+    args = parser.parse_args()
+
     print("\n=== Voice Assistant Demo ===\n")
 
     # 1. Record
-    audio_path = record_audio()
+    audio = record_audio()
+    if audio is None:
+        raise SystemExit(1)
 
     # 2. Transcribe (Speech → Text)
-    user_text = transcribe(audio_path)
+    user_text = transcribe(audio)
+
+    if args.sequential:
+        started_at = time.perf_counter()
 
-    # 3. Think (Text → Text)
-    assistant_text = get_response(user_text)
+        # 3. Think (Text → Text)
+        assistant_text = get_response(user_text)
 
-    # 4. Speak (Text → Speech)
-    speak(assistant_text)
+        # 4. Speak (Text → Speech)
+        speak(assistant_text, started_at)
+    else:
+        # 3 + 4. Think and speak, overlapped
+        assistant_text = respond_pipelined(user_text)
 
     print("\n=== Pipeline complete ===")
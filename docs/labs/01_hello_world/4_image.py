@@ -2,47 +2,74 @@
 Image Generation with DALL-E
 
 Text in, image out. Describe what you want, get a picture.
-The image URL is temporary - download it if you want to keep it.
+The image URL is temporary - so we download it right away into a local store
+(see image_batch.py). Ask for the same image again and it comes from disk
+instantly instead of costing another 10-20 seconds.
+
+Several prompts are generated concurrently, within the images-per-minute limit.
 
 Run: uv run python docs/labs/01_hello_world/4_image.py
+     uv run python docs/labs/01_hello_world/4_image.py "a red fox" "a blue whale" ...
+     uv run python docs/labs/01_hello_world/4_image.py --prompts-file prompts.txt
 """
 
+import argparse
+import asyncio
 import time
 import webbrowser
+from pathlib import Path
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from image_batch import IMAGES_PER_MINUTE, FailedImage, ImageStore, generate_images
 
 load_dotenv()  # Load OPENAI_API_KEY from .env
 
-client = OpenAI()  # Automatically uses OPENAI_API_KEY env var
+client = AsyncOpenAI()  # Automatically uses OPENAI_API_KEY env var
 
 PROMPT = "A robot teaching a classroom of humans about artificial intelligence, digital art style"
+STORE_DIR = Path(__file__).parent / "generated_images"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Generate images with DALL-E")
+    parser.add_argument("prompts", nargs="*", help=f"Default: {PROMPT!r}")
+    parser.add_argument("--prompts-file", type=Path, help="One prompt per line")
+    parser.add_argument("--per-minute", type=float, default=IMAGES_PER_MINUTE)
+    args = parser.parse_args()
+
+    prompts = list(args.prompts)
+    if args.prompts_file:
+        prompts += [line.strip() for line in args.prompts_file.read_text().splitlines() if line.strip()]
+    prompts = prompts or [PROMPT]
 
-print(f"🎨 Generating image...")
-print(f"   Prompt: \"{PROMPT}\"\n")
+    print(f"🎨 Generating {len(prompts)} image(s)...")
+    for prompt in prompts:
+        print(f"   Prompt: \"{prompt}\"")
+    print()
 
-start = time.time()
+    start = time.time()
+    images = await generate_images(client, ImageStore(STORE_DIR), prompts, per_minute=args.per_minute)
+    elapsed = time.time() - start
 
-response = client.images.generate(
-    model="dall-e-3",
-    prompt=PROMPT,
-    size="1024x1024",
-    quality="standard",
-    n=1,
-)
+    for image in images:
+        if isinstance(image, FailedImage):
+            print(f"✗ failed: \"{image.prompt}\"")
+            print(f"   {image.error}\n")
+            continue
+        source = "📦 from the local store" if image.cached else f"✓ generated in {image.elapsed:.1f}s"
+        print(f"{source}: \"{image.prompt}\"")
+        print(f"📝 DALL-E revised the prompt to:")
+        print(f"   \"{image.revised_prompt}\"")
+        print(f"💾 {image.path}\n")
 
-elapsed = time.time() - start
+    print(f"⏱ {elapsed:.1f}s total")
 
-image_url = response.data[0].url
-revised_prompt = response.data[0].revised_prompt
+    if len(images) == 1 and not isinstance(images[0], FailedImage):
+        print("Opening in browser...")
+        webbrowser.open(images[0].path.as_uri())
 
-print(f"✓ Image generated in {elapsed:.1f}s\n")
-print(f"📝 DALL-E revised your prompt to:")
-print(f"   \"{revised_prompt}\"\n")
-print(f"🔗 Image URL (temporary, ~1 hour):")
-print(f"   {image_url}\n")
 
-# Open in browser
-print("Opening in browser...")
-webbrowser.open(image_url)
+if __name__ == "__main__":
+    asyncio.run(main())
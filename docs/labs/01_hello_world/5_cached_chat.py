@@ -0,0 +1,52 @@
+"""
+Caching Responses
+
+Sending the same prompt twice pays twice. A cache in front of the API
+answers repeats locally - in microseconds instead of hundreds of milliseconds.
+
+1. Same prompt twice       → exact-match cache hit
+2. Same prompt, reformatted → still an exact hit (line endings and leading/
+   trailing whitespace are normalized; spacing inside a line is kept, so
+   code stays intact)
+3. Paraphrased prompt       → semantic hit (similar embedding, same context)
+4. temperature=0.7          → never cached: you asked for variety
+
+Run: uv run python docs/labs/01_hello_world/5_cached_chat.py
+"""
+
+import time
+
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from response_cache import ResponseCache, cached_create
+
+load_dotenv()  # Load OPENAI_API_KEY from .env
+
+client = OpenAI()  # Automatically uses OPENAI_API_KEY env var
+
+cache = ResponseCache(similarity_threshold=0.9)
+
+PROMPTS = [
+    ("First call", "Explain Software 3.0 in one sentence.", 0),
+    ("Same prompt", "Explain Software 3.0 in one sentence.", 0),
+    ("Reformatted", "  Explain Software 3.0 in one sentence.\r\n", 0),
+    ("Paraphrased", "In one sentence, explain Software 3.0.", 0),
+    ("Creative", "Explain Software 3.0 in one sentence.", 0.7),
+]
+
+for label, prompt, temperature in PROMPTS:
+    start = time.time()
+
+    response = cached_create(
+        client,
+        cache,
+        model="gpt-4.1-mini",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+    )
+
+    elapsed = time.time() - start
+    print(f"{label:12} ⏱ {elapsed * 1000:7.1f}ms  {response.choices[0].message.content[:60]}...")
+
+print(f"\n📊 Cache: {cache.stats()}")
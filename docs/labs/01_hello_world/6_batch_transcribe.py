@@ -0,0 +1,305 @@
+"""
+Batch Transcription
+
+3_voice.py transcribes one recording at a time. To work through a backlog
+of recordings, this script:
+
+1. Walks a directory for audio files
+2. Converts each to what Whisper wants: 16kHz mono, DC-free, peak-normalized
+   (vectorized NumPy - no per-sample Python loops)
+3. Splits long files at pauses into segments well under the 25MB upload limit
+4. Uploads segments through a bounded pool of worker threads (the client retries
+   429s and 5xx with backoff)
+5. Appends one JSON line per segment to a manifest as soon as it's done -
+   the manifest is also the checkpoint: rerun and finished segments are skipped
+
+Run: uv run python docs/labs/01_hello_world/6_batch_transcribe.py path/to/recordings
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import soundfile as sf
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from audio_io import encode_wav
+from vad_recorder import FRAME_MS, frame_energy_db
+
+TARGET_RATE = 16000  # Whisper resamples to 16kHz anyway - don't upload more than that
+MAX_SEGMENT_SECONDS = 600  # 16-bit mono 16kHz: ~19MB, under Whisper's 25MB limit
+SPLIT_SEARCH_SECONDS = 30  # Look this far back from the limit for the quietest pause
+SILENT_SEGMENT_DB = -45.0  # Segments never louder than this are skipped (Whisper hallucinates on silence)
+AUDIO_EXTENSIONS = {".wav", ".flac", ".ogg", ".mp3", ".aiff", ".aif"}
+MANIFEST_NAME = "transcripts.jsonl"
+
+
+# ----------------------------
+# Audio preparation
+# ----------------------------
+def _lowpass(audio: np.ndarray, cutoff: float, taps: int = 63) -> np.ndarray:
+    """Windowed-sinc low-pass; `cutoff` as a fraction of the sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return np.convolve(audio, kernel / kernel.sum(), mode="same")
+
+
+def to_mono(audio: np.ndarray, sample_rate: int, target_rate: int = TARGET_RATE) -> np.ndarray:
+    """Mix down to mono and resample to target_rate."""
+    if audio.ndim == 2:
+        audio = audio.mean(axis=1)
+    if sample_rate != target_rate:
+        if sample_rate > target_rate:
+            # Filter out what the lower rate can't represent, or it aliases into the speech band
+            audio = _lowpass(audio, cutoff=0.5 * target_rate / sample_rate)
+        n_out = int(round(len(audio) * target_rate / sample_rate))
+        positions = np.arange(n_out) * (sample_rate / target_rate)
+        audio = np.interp(positions, np.arange(len(audio)), audio)
+    return audio.astype(np.float32)
+
+
+def normalize(audio: np.ndarray, peak: float = 0.9) -> np.ndarray:
+    """Remove DC offset and scale so the loudest sample is at `peak`."""
+    audio = audio - audio.mean()
+    loudest = np.abs(audio).max() if len(audio) else 0.0
+    return audio * (peak / loudest) if loudest > 0 else audio
+
+
+def split_at_silence(
+    audio: np.ndarray,
+    sample_rate: int = TARGET_RATE,
+    max_seconds: float = MAX_SEGMENT_SECONDS,
+    search_seconds: float = SPLIT_SEARCH_SECONDS,
+) -> List[Tuple[int, int]]:
+    """(start, end) sample ranges of at most max_seconds, cut at the quietest nearby pause."""
+    frame_len = sample_rate * FRAME_MS // 1000
+    max_frames = int(max_seconds * 1000 / FRAME_MS)
+    search = max(1, min(max_frames // 4, int(search_seconds * 1000 / FRAME_MS)))
+
+    # Smooth over ~300ms so we cut in a pause, not in one quiet frame mid-word
+    energies = frame_energy_db(audio, frame_len)
+    energies = np.convolve(energies, np.ones(10) / 10, mode="same")
+
+    bounds = []
+    start = 0
+    while len(energies) - start > max_frames:
+        window_start = start + max_frames - search
+        cut = window_start + int(np.argmin(energies[window_start:start + max_frames]))
+        bounds.append((start * frame_len, cut * frame_len))
+        start = cut
+    bounds.append((start * frame_len, len(audio)))
+    return bounds
+
+
+def is_silent(audio: np.ndarray, sample_rate: int = TARGET_RATE) -> bool:
+    energies = frame_energy_db(audio, sample_rate * FRAME_MS // 1000)
+    return energies.size == 0 or float(energies.max()) < SILENT_SEGMENT_DB
+
+
+# ----------------------------
+# Jobs + checkpointing
+# ----------------------------
+@dataclass
+class Segment:
+    file: str  # Relative to the input directory
+    fingerprint: str  # Size + mtime: a changed file is transcribed again
+    index: int
+    count: int
+    start: float  # Seconds
+    end: float
+    audio: Optional[np.ndarray]
+    error: Optional[str] = None  # The file couldn't be read: recorded, nothing uploaded
+
+
+def fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def find_audio_files(directory: Path) -> List[Path]:
+    return sorted(p for p in directory.rglob("*") if p.suffix.lower() in AUDIO_EXTENSIONS)
+
+
+def read_records(manifest: Path) -> List[Dict]:
+    """Every complete manifest line. A crash mid-write leaves a torn last line, which is skipped."""
+    if not manifest.exists():
+        return []
+    records = []
+    with open(manifest) as f:
+        for line in f:
+            if not line.endswith("\n"):
+                break  # Half-written: that segment is simply done again
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def drop_torn_line(manifest: Path) -> None:
+    """Cut a half-written last line, so the next append starts on a line of its own."""
+    if not manifest.exists():
+        return
+    with open(manifest, "rb+") as f:
+        data = f.read()
+        f.truncate(data.rfind(b"\n") + 1)
+
+
+def load_checkpoint(manifest: Path) -> Tuple[Set[Tuple[str, str, int]], Dict[Tuple[str, str], int]]:
+    """Segments already transcribed, and how many segments each file has."""
+    done: Set[Tuple[str, str, int]] = set()
+    counts: Dict[Tuple[str, str], int] = {}
+    for record in read_records(manifest):
+        counts[record["file"], record["fingerprint"]] = record["segments"]
+        if "text" in record:
+            done.add((record["file"], record["fingerprint"], record["segment"]))
+    return done, counts
+
+
+def iter_segments(directory: Path, manifest: Path, max_seconds: float) -> Iterator[Segment]:
+    """Segments still to transcribe. Files are only loaded when they have work left."""
+    done, counts = load_checkpoint(manifest)
+    for path in find_audio_files(directory):
+        name = str(path.relative_to(directory))
+        fp = fingerprint(path)
+        count = counts.get((name, fp))
+        if count is not None and all((name, fp, i) in done for i in range(count)):
+            continue
+
+        try:
+            data, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        except Exception as e:  # Recorded, not raised: one bad file mustn't stop the batch
+            yield Segment(name, fp, 0, 1, 0.0, 0.0, None, error=f"{type(e).__name__}: {e}")
+            continue
+        audio = normalize(to_mono(data, sample_rate))
+        bounds = split_at_silence(audio, TARGET_RATE, max_seconds)
+        for index, (start, end) in enumerate(bounds):
+            if (name, fp, index) not in done:
+                yield Segment(
+                    name, fp, index, len(bounds), start / TARGET_RATE, end / TARGET_RATE, audio[start:end]
+                )
+
+
+# ----------------------------
+# Transcription
+# ----------------------------
+def transcribe_segment(client, segment: Segment, model: str) -> Dict:
+    record = {
+        "file": segment.file,
+        "fingerprint": segment.fingerprint,
+        "segment": segment.index,
+        "segments": segment.count,
+        "start": round(segment.start, 3),
+        "end": round(segment.end, 3),
+    }
+    if segment.error is not None:
+        record["error"] = segment.error
+        return record
+    if is_silent(segment.audio):
+        record["text"] = ""
+        return record
+    try:
+        transcript = client.audio.transcriptions.create(
+            model=model,
+            file=encode_wav(segment.audio, TARGET_RATE, name=f"segment_{segment.index}.wav"),
+        )
+        record["text"] = transcript.text
+    except Exception as e:  # Recorded, not raised: one bad file mustn't stop the batch
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+def transcribe_directory(
+    client,
+    directory: Path,
+    manifest: Path,
+    workers: int = 8,
+    max_seconds: float = MAX_SEGMENT_SECONDS,
+    model: str = "whisper-1",
+) -> Dict[str, int]:
+    """Transcribe every pending segment under `directory`, appending results to `manifest`."""
+    stats = {"transcribed": 0, "silent": 0, "errors": 0}
+
+    def write(futures, out) -> None:
+        for future in futures:
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()  # Every finished segment is checkpointed right away
+            if "error" in record:
+                stats["errors"] += 1
+                print(f"  ✗ {record['file']} [{record['segment'] + 1}/{record['segments']}] {record['error']}")
+            elif record["text"]:
+                stats["transcribed"] += 1
+                print(f"  ✓ {record['file']} [{record['segment'] + 1}/{record['segments']}]")
+            else:
+                stats["silent"] += 1
+
+    drop_torn_line(manifest)
+    with ThreadPoolExecutor(max_workers=workers) as pool, open(manifest, "a") as out:
+        pending = set()
+        for segment in iter_segments(directory, manifest, max_seconds):
+            # Bounded: at most 2x workers segments in memory, however large the backlog
+            if len(pending) >= workers * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished, out)
+            pending.add(pool.submit(transcribe_segment, client, segment, model))
+        write(wait(pending).done, out)
+
+    return stats
+
+
+def read_transcripts(manifest: Path) -> Dict[str, str]:
+    """Full text per file, segments joined in order (latest version of each file wins)."""
+    latest: Dict[str, Tuple[str, int]] = {}  # file -> (fingerprint, segment count) of its last record
+    segments: Dict[Tuple[str, str, int], str] = {}
+    for record in read_records(manifest):
+        latest[record["file"]] = (record["fingerprint"], record["segments"])
+        if "text" in record:
+            segments[record["file"], record["fingerprint"], record["segment"]] = record["text"]
+
+    # Segments of an older version of a file (e.g. split differently) are left out
+    texts = {}
+    for file, (fp, count) in sorted(latest.items()):
+        parts = [segments.get((file, fp, i), "") for i in range(count)]
+        if any(parts):
+            texts[file] = " ".join(part for part in parts if part)
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe a directory of recordings with Whisper")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--manifest", type=Path, help=f"JSONL output (default: <directory>/{MANIFEST_NAME})")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-segment-seconds", type=float, default=MAX_SEGMENT_SECONDS)
+    parser.add_argument("--retries", type=int, default=5, help="Per request, with exponential backoff")
+    parser.add_argument("--model", default="whisper-1")
+    args = parser.parse_args()
+
+    load_dotenv()  # Load OPENAI_API_KEY from .env
+    client = OpenAI(max_retries=args.retries)
+    manifest = args.manifest or args.directory / MANIFEST_NAME
+
+    print(f"🎧 Transcribing {args.directory} → {manifest} ({args.workers} workers)")
+    start = time.time()
+    stats = transcribe_directory(
+        client, args.directory, manifest, args.workers, args.max_segment_seconds, args.model
+    )
+    elapsed = time.time() - start
+
+    print(
+        f"\n✓ {stats['transcribed']} segment(s) transcribed, {stats['silent']} silent, "
+        f"{stats['errors']} error(s) in {elapsed:.1f}s"
+    )
+    if stats["errors"]:
+        print("↻ Run again to retry the failed segments - finished ones are skipped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+In-Memory Audio I/O
+
+Audio goes from the microphone to Whisper, and from TTS to the speakers,
+without touching the disk:
+- encode_wav: NumPy samples → WAV bytes in a BytesIO, ready to upload
+- decode_audio: WAV/MP3/... bytes (e.g. a TTS response) → NumPy samples to play
+
+No temp files means no disk I/O per voice turn, and no two sessions
+overwriting each other's voice_input.wav.
+
+Used by 3_voice.py.
+"""
+
+import io
+from typing import Tuple
+
+import numpy as np
+import soundfile as sf
+
+
+def encode_wav(audio: np.ndarray, sample_rate: int, name: str = "speech.wav") -> io.BytesIO:
+    """Encode samples as 16-bit PCM WAV in memory, as a file-like object the OpenAI client can upload."""
+    buffer = io.BytesIO()
+    sf.write(buffer, audio, sample_rate, format="WAV", subtype="PCM_16")
+    buffer.seek(0)
+    buffer.name = name  # The client takes the upload's filename (and so its format) from .name
+    return buffer
+
+
+def decode_audio(data: bytes) -> Tuple[np.ndarray, int]:
+    """Decode encoded audio bytes into float32 samples and their sample rate."""
+    return sf.read(io.BytesIO(data), dtype="float32")
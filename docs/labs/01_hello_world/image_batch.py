@@ -0,0 +1,179 @@
+"""
+Batch Image Generation with a Local Store
+
+One DALL-E image takes 10-20 seconds and costs money, and its URL expires
+after about an hour. This module makes generated images a reusable asset:
+
+1. Many prompts run CONCURRENTLY (asyncio), under a rate limiter so a batch
+   doesn't trip the images-per-minute limit
+2. Images are downloaded right away, through one pooled HTTP client
+3. Files are stored CONTENT-ADDRESSED (named by the SHA-256 of their bytes);
+   a small index maps (model, prompt, size, quality) → file
+4. The same request again is served from disk instantly, for free
+5. A prompt that fails (rejected, timed out, download error) comes back as a
+   FailedImage - the rest of the batch is still generated and stored
+
+Layout of the store:
+    <root>/index/<request hash>.json   - request → image hash + revised prompt
+    <root>/images/<ab>/<image hash>.png
+
+Used by 4_image.py.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import httpx
+
+IMAGES_PER_MINUTE = 5  # DALL-E 3 at usage tier 1; raise it if your tier allows
+MAX_CONCURRENT = 4  # Requests in flight at once
+
+
+@dataclass
+class StoredImage:
+    prompt: str
+    path: Path
+    sha256: str
+    revised_prompt: Optional[str]
+    cached: bool  # True: served from the store, no API call
+    elapsed: float = 0.0
+
+
+@dataclass
+class FailedImage:
+    prompt: str
+    error: str
+
+
+def request_key(model: str, prompt: str, size: str, quality: str) -> str:
+    return hashlib.sha256(json.dumps([model, prompt, size, quality]).encode()).hexdigest()
+
+
+class ImageStore:
+    """Content-addressed image files plus a request → file index."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        (self.root / "index").mkdir(parents=True, exist_ok=True)
+        (self.root / "images").mkdir(parents=True, exist_ok=True)
+
+    def _index_path(self, key: str) -> Path:
+        return self.root / "index" / f"{key}.json"
+
+    def _image_path(self, sha256: str) -> Path:
+        return self.root / "images" / sha256[:2] / f"{sha256}.png"
+
+    def get(self, key: str, prompt: str) -> Optional[StoredImage]:
+        index_path = self._index_path(key)
+        if not index_path.exists():
+            return None
+        entry = json.loads(index_path.read_text())
+        path = self._image_path(entry["sha256"])
+        if not path.exists():
+            return None  # Image deleted by hand: generate it again
+        return StoredImage(prompt, path, entry["sha256"], entry.get("revised_prompt"), cached=True)
+
+    def put(self, key: str, prompt: str, image: bytes, revised_prompt: Optional[str]) -> StoredImage:
+        sha256 = hashlib.sha256(image).hexdigest()
+        path = self._image_path(sha256)
+        if not path.exists():  # Identical bytes are stored once
+            path.parent.mkdir(exist_ok=True)
+            self._write_atomic(path, image)
+        entry = {"sha256": sha256, "revised_prompt": revised_prompt, "created": time.time()}
+        self._write_atomic(self._index_path(key), json.dumps(entry).encode())
+        return StoredImage(prompt, path, sha256, revised_prompt, cached=False)
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        # Readers never see a half-written file, even with concurrent writers
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+
+class AsyncRateLimiter:
+    """Token bucket for asyncio: at most `per_minute` acquisitions per minute, bursts of `burst`."""
+
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:  # Waiters queue up in order
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+async def generate_images(
+    client,
+    store: ImageStore,
+    prompts: List[str],
+    model: str = "dall-e-3",
+    size: str = "1024x1024",
+    quality: str = "standard",
+    per_minute: float = IMAGES_PER_MINUTE,
+    max_concurrent: int = MAX_CONCURRENT,
+    http: Optional[httpx.AsyncClient] = None,
+) -> List[Union[StoredImage, FailedImage]]:
+    """
+    Generate (or fetch from the store) one image per prompt, concurrently.
+
+    `client` is an AsyncOpenAI. Results come back in the order of `prompts`;
+    duplicate prompts within a batch are generated only once. A prompt that
+    fails comes back as a FailedImage instead of aborting the batch.
+    """
+    limiter = AsyncRateLimiter(per_minute)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    in_flight: Dict[str, asyncio.Task] = {}
+    own_http = http is None
+    http = http or httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=max_concurrent))
+
+    async def one(prompt: str, key: str) -> StoredImage:
+        start = time.time()
+        async with semaphore:
+            await limiter.acquire()
+            response = await client.images.generate(
+                model=model, prompt=prompt, size=size, quality=quality, n=1
+            )
+            image = response.data[0]
+            # The URL expires in about an hour: download now, over the pooled connection
+            download = await http.get(image.url)
+            download.raise_for_status()
+        stored = store.put(key, prompt, download.content, image.revised_prompt)
+        stored.elapsed = time.time() - start
+        return stored
+
+    async def get_or_generate(prompt: str) -> StoredImage:
+        key = request_key(model, prompt, size, quality)
+        cached = store.get(key, prompt)
+        if cached is not None:
+            return cached
+        if key not in in_flight:
+            in_flight[key] = asyncio.create_task(one(prompt, key))
+        return await in_flight[key]
+
+    try:
+        # Every prompt finishes (or fails) before the HTTP client is closed
+        results = await asyncio.gather(*(get_or_generate(p) for p in prompts), return_exceptions=True)
+    finally:
+        if own_http:
+            await http.aclose()
+    return [
+        FailedImage(prompt, f"{type(result).__name__}: {result}") if isinstance(result, BaseException) else result
+        for prompt, result in zip(prompts, results)
+    ]
@@ -0,0 +1,238 @@
+"""
+Response Cache for Chat Completions
+
+The same prompt sent twice costs twice: a paid round-trip of several hundred
+milliseconds each time. This cache sits in front of
+client.chat.completions.create and answers repeats locally.
+
+Two tiers:
+1. EXACT - keyed on (model, messages, temperature, other params) after
+   normalizing line endings and leading/trailing whitespace (indentation
+   and spacing inside a line are kept: they matter in code). A hit is a
+   dictionary lookup.
+2. SEMANTIC (optional) - embeds the last user message and returns a cached
+   response whose prompt is similar enough (cosine >= similarity_threshold)
+   and whose context (model, params, earlier messages) is identical.
+   Vectors live in a small in-memory NumPy index.
+
+Both tiers use LRU eviction (max_entries) and a TTL. By default only
+deterministic calls (temperature=0) are cached - caching a temperature=0.7
+call silently removes the variety you asked for.
+
+Usage:
+    cache = ResponseCache()
+    response = cached_create(client, cache, model="gpt-4.1-mini", messages=[...], temperature=0)
+
+See 5_cached_chat.py for a demo.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+
+def _normalize(content: Any) -> Any:
+    """Normalize text content; anything else (None for tool calls, multi-part lists) is keyed as-is."""
+    if not isinstance(content, str):
+        return content
+    lines = content.replace("\r\n", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip()
+
+
+def _hash(obj: Any) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResponseCache:
+    """Exact + optional semantic cache of chat completion responses."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        similarity_threshold: Optional[float] = None,
+        cache_nondeterministic: bool = False,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold  # None = semantic tier off
+        self.cache_nondeterministic = cache_nondeterministic
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        # Semantic index: one row per cached entry that has an embedding
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._vector_keys: List[str] = []
+        self._vector_contexts: List[str] = []
+
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold is not None
+
+    # ---- Keys ----
+    def cacheable(self, params: Dict) -> bool:
+        """Only plain, single-choice, deterministic calls are cached (by default)."""
+        if params.get("stream") or params.get("n", 1) != 1:
+            return False
+        return self.cache_nondeterministic or params.get("temperature") == 0
+
+    def exact_key(self, params: Dict) -> str:
+        normalized = dict(params)
+        normalized["messages"] = [
+            {**m, "content": _normalize(m.get("content"))} for m in params["messages"]
+        ]
+        return _hash(normalized)
+
+    def context_key(self, params: Dict) -> str:
+        """Everything except the last user message - must match exactly for a semantic hit."""
+        context = dict(params)
+        context["messages"] = self.exact_key({"messages": params["messages"][:-1]})
+        return _hash(context)
+
+    @staticmethod
+    def query_text(params: Dict) -> str:
+        content = params["messages"][-1].get("content")
+        if isinstance(content, list):  # Multi-part: embed the text parts
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        return _normalize(content or "")
+
+    # ---- Lookup / store ----
+    def get(self, params: Dict, embedding: Optional[List[float]] = None) -> Optional[Any]:
+        """Cached response for these params, or None."""
+        key = self.exact_key(params)
+        response = self._get_entry(key)
+        if response is not None:
+            self.exact_hits += 1
+            return response
+
+        if embedding is not None and len(self._vector_keys):
+            match = self._nearest(self.context_key(params), embedding)
+            if match is not None:
+                response = self._get_entry(match)
+                if response is not None:
+                    self.semantic_hits += 1
+                    return response
+
+        self.misses += 1
+        return None
+
+    def put(self, params: Dict, response: Any, embedding: Optional[List[float]] = None) -> None:
+        key = self.exact_key(params)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+
+        if embedding is not None and key not in self._vector_keys:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+            if self._vectors.size == 0:
+                self._vectors = vector[None, :]
+            else:
+                self._vectors = np.vstack([self._vectors, vector])
+            self._vector_keys.append(key)
+            self._vector_contexts.append(self.context_key(params))
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._drop_vector(old_key)
+
+    def has_exact(self, params: Dict) -> bool:
+        """True if an unexpired exact-match entry exists (no stats counted)."""
+        return self._get_entry(self.exact_key(params)) is not None
+
+    def _get_entry(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if time.monotonic() > expires_at:
+            del self._entries[key]
+            self._drop_vector(key)
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _nearest(self, context: str, embedding: List[float]) -> Optional[str]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        # One matrix-vector product scores every cached prompt at once
+        scores = self._vectors @ query
+        same_context = np.array([c == context for c in self._vector_contexts])
+        scores[~same_context] = -1.0
+
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return self._vector_keys[best]
+        return None
+
+    def _drop_vector(self, key: str) -> None:
+        if key in self._vector_keys:
+            row = self._vector_keys.index(key)
+            self._vectors = np.delete(self._vectors, row, axis=0)
+            del self._vector_keys[row]
+            del self._vector_contexts[row]
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,  # Not cacheable (e.g. temperature > 0)
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+# ----------------------------
+# Drop-in wrappers for client.chat.completions.create
+# ----------------------------
+def cached_create(client, cache: ResponseCache, **params):
+    """client.chat.completions.create(**params), answered from cache when possible."""
+    if not cache.cacheable(params):
+        cache.skipped += 1
+        return client.chat.completions.create(**params)
+
+    embedding = None
+    if cache.semantic:
+        if not cache.has_exact(params):  # Don't pay for an embedding on exact hits
+            embedding = client.embeddings.create(
+                model=EMBEDDING_MODEL, input=cache.query_text(params)
+            ).data[0].embedding
+
+    response = cache.get(params, embedding)
+    if response is None:
+        response = client.chat.completions.create(**params)
+        cache.put(params, response, embedding)
+    return response
+
+
+async def acached_create(client, cache: ResponseCache, **params):
+    """Same as cached_create, for AsyncOpenAI clients."""
+    if not cache.cacheable(params):
+        cache.skipped += 1
+        return await client.chat.completions.create(**params)
+
+    embedding = None
+    if cache.semantic:
+        if not cache.has_exact(params):
+            embedding = (await client.embeddings.create(
+                model=EMBEDDING_MODEL, input=cache.query_text(params)
+            )).data[0].embedding
+
+    response = cache.get(params, embedding)
+    if response is None:
+        response = await client.chat.completions.create(**params)
+        cache.put(params, response, embedding)
+    return response
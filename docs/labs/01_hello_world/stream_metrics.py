@@ -0,0 +1,304 @@
+"""
+Streaming Latency Metrics
+
+With streaming, total time isn't what the user feels. What matters is:
+- TTFT (time to first token): how long the screen stays blank
+- Inter-token latency: the gaps between chunks - is the "typing" smooth?
+- Tokens/sec: decode speed once text is flowing
+- Stalls: gaps long enough to look like the answer froze
+
+InstrumentedStream wraps the iterator returned by
+client.chat.completions.create(..., stream=True) and times every chunk
+without changing what you get back. StreamMetrics collects the timings of
+many streams into HDR-style histograms (one set per model), so you can
+compare p50/p99 across models and export them as JSON or Prometheus text.
+
+Usage:
+    metrics = StreamMetrics()
+    stream = instrumented_create(client, metrics, model="gpt-4.1-mini", messages=[...])
+    for chunk in stream:
+        ...
+    print(stream.timing)               # This stream
+    print(metrics.to_json())           # All streams so far
+
+See 2_streaming.py for a demo.
+"""
+
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+PERCENTILES = (50.0, 90.0, 95.0, 99.0, 99.9)
+STALL_THRESHOLD = 1.0  # Seconds without a chunk before we call it a stall
+
+
+# ----------------------------
+# HDR-style histogram
+# ----------------------------
+class Histogram:
+    """
+    Fixed-memory histogram with bounded RELATIVE error, like HdrHistogram.
+
+    Values are scaled to integers (e.g. seconds → microseconds) and bucketed
+    log-linearly: each power-of-two range is split into the same number of
+    linear sub-buckets, so every recorded value is kept to within
+    10^-significant_figures of its true value whether it is 2ms or 20s.
+    Recording is O(1) and a few thousand counters cover the whole range.
+    """
+
+    def __init__(self, highest: float = 600.0, significant_figures: int = 2, scale: float = 1e6):
+        self.scale = scale  # Units per integer step (1e6: record seconds, store microseconds)
+        self.highest = int(highest * scale)
+
+        sub_bucket_count = 2 ** math.ceil(math.log2(2 * 10**significant_figures))
+        self._sub_bucket_bits = int(math.log2(sub_bucket_count))
+        self._sub_bucket_half = sub_bucket_count // 2
+        self.counts: List[int] = [0] * (self._index(self.highest) + 1)
+
+        self.total = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    # ---- Bucketing ----
+    def _index(self, value: int) -> int:
+        bucket = max(0, value.bit_length() - self._sub_bucket_bits)
+        return bucket * self._sub_bucket_half + (value >> bucket)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """Largest integer value that falls in counts[index]."""
+        bucket = max(0, index // self._sub_bucket_half - 1)
+        sub_bucket = index - bucket * self._sub_bucket_half
+        return ((sub_bucket + 1) << bucket) - 1
+
+    # ---- Recording ----
+    def record(self, value: float) -> None:
+        scaled = min(max(int(round(value * self.scale)), 0), self.highest)  # Clamp, don't drop
+        self.counts[self._index(scaled)] += 1
+        self.total += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """Add another histogram's counts (same configuration) into this one."""
+        if len(other.counts) != len(self.counts) or other.scale != self.scale:
+            raise ValueError("Can only merge histograms with the same configuration")
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    # ---- Queries ----
+    def percentile(self, p: float) -> float:
+        if self.total == 0:
+            return 0.0
+        target = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index) / self.scale, self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.total,
+            "min": self.min if self.total else 0.0,
+            "mean": self.mean,
+            "max": self.max,
+            **{f"p{p:g}": self.percentile(p) for p in PERCENTILES},
+        }
+
+
+# ----------------------------
+# Per-stream timing
+# ----------------------------
+@dataclass
+class StreamTiming:
+    """Timings of ONE streamed response (seconds)."""
+
+    ttft: Optional[float] = None  # Request sent → first content chunk
+    total: float = 0.0  # Request sent → stream exhausted
+    chunks: int = 0  # Content-bearing chunks
+    tokens: int = 0  # From usage if the stream reports it, else one per chunk
+    tokens_per_sec: Optional[float] = None  # Decode rate after the first token
+    max_gap: float = 0.0
+    stalls: int = 0  # Gaps longer than the stall threshold
+    gaps: List[float] = field(default_factory=list, repr=False)  # Inter-chunk arrival times
+
+
+class InstrumentedStream:
+    """
+    Pass-through wrapper around a (sync or async) chat completion stream.
+
+    Iterate it exactly like the original; `timing` fills in as chunks arrive
+    and is recorded into `metrics` when the stream ends.
+    """
+
+    def __init__(
+        self,
+        stream,
+        metrics: Optional["StreamMetrics"] = None,
+        model: str = "unknown",
+        start: Optional[float] = None,
+        stall_threshold: float = STALL_THRESHOLD,
+    ):
+        self.stream = stream
+        self.metrics = metrics
+        self.model = model
+        # Pass the time just before create() - the request, not the first read, starts the clock
+        self.start = time.perf_counter() if start is None else start
+        self.stall_threshold = stall_threshold
+        self.timing = StreamTiming()
+        self._last_chunk_at: Optional[float] = None
+        self._usage_tokens: Optional[int] = None
+
+    def _observe(self, chunk) -> None:
+        now = time.perf_counter()
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:  # Only with stream_options={"include_usage": True}
+            self._usage_tokens = usage.completion_tokens
+
+        if not any(choice.delta.content for choice in chunk.choices):
+            return  # Role-only, finish and usage chunks carry no text
+
+        timing = self.timing
+        if self._last_chunk_at is None:
+            timing.ttft = now - self.start
+        else:
+            gap = now - self._last_chunk_at
+            timing.gaps.append(gap)
+            timing.max_gap = max(timing.max_gap, gap)
+            if gap > self.stall_threshold:
+                timing.stalls += 1
+        self._last_chunk_at = now
+        timing.chunks += 1
+
+    def _finish(self) -> None:
+        timing = self.timing
+        timing.total = time.perf_counter() - self.start
+        timing.tokens = self._usage_tokens if self._usage_tokens is not None else timing.chunks
+        decode_time = sum(timing.gaps)
+        if timing.tokens > 1 and decode_time > 0:
+            timing.tokens_per_sec = (timing.tokens - 1) / decode_time
+        if self.metrics is not None:
+            self.metrics.record(timing, self.model)
+
+    def __iter__(self):
+        for chunk in self.stream:
+            self._observe(chunk)
+            yield chunk
+        self._finish()
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self._observe(chunk)
+            yield chunk
+        self._finish()
+
+
+def instrumented_create(client, metrics: Optional["StreamMetrics"] = None, **params) -> InstrumentedStream:
+    """client.chat.completions.create(stream=True, **params), timed."""
+    start = time.perf_counter()
+    stream = client.chat.completions.create(stream=True, **params)
+    return InstrumentedStream(stream, metrics, model=params.get("model", "unknown"), start=start)
+
+
+async def ainstrumented_create(client, metrics: Optional["StreamMetrics"] = None, **params) -> InstrumentedStream:
+    """Same as instrumented_create, for AsyncOpenAI clients (iterate with `async for`)."""
+    start = time.perf_counter()
+    stream = await client.chat.completions.create(stream=True, **params)
+    return InstrumentedStream(stream, metrics, model=params.get("model", "unknown"), start=start)
+
+
+# ----------------------------
+# Aggregation + export
+# ----------------------------
+class StreamMetrics:
+    """Histograms of TTFT, inter-token gaps, tokens/sec and total time, per model."""
+
+    SERIES = {
+        # name: (histogram kwargs, Prometheus help text)
+        "ttft_seconds": ({}, "Time to first content token"),
+        "inter_token_seconds": ({}, "Time between consecutive content chunks"),
+        "total_seconds": ({}, "Time to the end of the stream"),
+        "tokens_per_second": ({"highest": 100_000, "scale": 100}, "Decode rate after the first token"),
+    }
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[str, Histogram]] = {}
+        self.streams: Dict[str, int] = {}
+        self.stalls: Dict[str, int] = {}
+        self.stalled_streams: Dict[str, int] = {}
+
+    def _for_model(self, model: str) -> Dict[str, Histogram]:
+        if model not in self._histograms:
+            self._histograms[model] = {
+                name: Histogram(**kwargs) for name, (kwargs, _) in self.SERIES.items()
+            }
+            self.streams[model] = self.stalls[model] = self.stalled_streams[model] = 0
+        return self._histograms[model]
+
+    def record(self, timing: StreamTiming, model: str = "unknown") -> None:
+        histograms = self._for_model(model)
+        if timing.ttft is not None:
+            histograms["ttft_seconds"].record(timing.ttft)
+        for gap in timing.gaps:
+            histograms["inter_token_seconds"].record(gap)
+        histograms["total_seconds"].record(timing.total)
+        if timing.tokens_per_sec is not None:
+            histograms["tokens_per_second"].record(timing.tokens_per_sec)
+
+        self.streams[model] += 1
+        self.stalls[model] += timing.stalls
+        self.stalled_streams[model] += timing.stalls > 0
+
+    def histogram(self, name: str, model: str) -> Histogram:
+        return self._histograms[model][name]
+
+    def to_dict(self) -> Dict:
+        return {
+            model: {
+                "streams": self.streams[model],
+                "stalls": self.stalls[model],
+                "stalled_streams": self.stalled_streams[model],
+                **{name: h.summary() for name, h in histograms.items()},
+            }
+            for model, histograms in self._histograms.items()
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self, prefix: str = "llm_stream") -> str:
+        """Prometheus text exposition format: one summary per series, labelled by model."""
+        lines = []
+        for name, (_, help_text) in self.SERIES.items():
+            metric = f"{prefix}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} summary"]
+            for model, histograms in self._histograms.items():
+                h = histograms[name]
+                for p in PERCENTILES:
+                    lines.append(f'{metric}{{model="{model}",quantile="{p / 100:g}"}} {h.percentile(p):.6g}')
+                lines.append(f'{metric}_sum{{model="{model}"}} {h.sum:.6g}')
+                lines.append(f'{metric}_count{{model="{model}"}} {h.total}')
+
+        for name, counts, help_text in (
+            ("streams_total", self.streams, "Streams observed"),
+            ("stalls_total", self.stalls, f"Inter-chunk gaps over {STALL_THRESHOLD:g}s"),
+            ("stalled_streams_total", self.stalled_streams, "Streams with at least one stall"),
+        ):
+            metric = f"{prefix}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{model="{model}"}} {count}' for model, count in counts.items()]
+        return "\n".join(lines) + "\n"
+
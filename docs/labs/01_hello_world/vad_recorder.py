@@ -0,0 +1,149 @@
+"""
+Voice-Activity-Detected Recording
+
+Recording a fixed 5 seconds is wrong both ways: a short question waits out
+the clock and uploads seconds of silence; a long one gets cut off.
+
+Instead, listen in short frames and watch the ENERGY (loudness) of each:
+1. Calibrate: the first few hundred ms tell us how loud the room is
+2. Speech starts when frames rise clearly above that noise floor
+3. Speech ends after a stretch of trailing silence (SILENCE_SECONDS)
+4. Trim the silence before and after the speech, keeping a little padding
+
+Frame energies are computed with NumPy for a whole block of frames at once,
+inside sounddevice's callback-driven input stream.
+
+Used by 3_voice.py.
+"""
+
+import queue
+from typing import List, Optional
+
+import numpy as np
+
+FRAME_MS = 30  # Analysis frame; speech energy is roughly stable at this scale
+BLOCK_FRAMES = 4  # Frames per sounddevice callback block
+SILENCE_SECONDS = 0.8  # Trailing silence that ends the utterance
+MIN_SPEECH_SECONDS = 0.1  # Ignore clicks and bumps shorter than this
+CALIBRATION_SECONDS = 0.3
+MARGIN_DB = 10.0  # Speech must be this much louder than the noise floor...
+FLOOR_DB = -50.0  # ...and never quieter than this (dBFS), even in a silent room
+PAD_SECONDS = 0.2  # Silence kept around the speech so words aren't clipped
+
+
+def frame_energy_db(audio: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS energy (dBFS) of every complete frame, in one vectorized pass."""
+    n_frames = len(audio) // frame_len
+    frames = audio[: n_frames * frame_len].reshape(n_frames, frame_len).astype(np.float32)
+    rms = np.sqrt(np.mean(frames**2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(
+    audio: np.ndarray,
+    sample_rate: int,
+    threshold_db: float,
+    pad_seconds: float = PAD_SECONDS,
+    frame_ms: int = FRAME_MS,
+) -> np.ndarray:
+    """Cut leading and trailing silence (keeping `pad_seconds`). Empty if there's no speech."""
+    frame_len = sample_rate * frame_ms // 1000
+    loud = np.flatnonzero(frame_energy_db(audio, frame_len) > threshold_db)
+    if loud.size == 0:
+        return audio[:0]
+    pad = int(pad_seconds * sample_rate)
+    start = max(0, loud[0] * frame_len - pad)
+    end = min(len(audio), (loud[-1] + 1) * frame_len + pad)
+    return audio[start:end]
+
+
+class Endpointer:
+    """Decides, frame by frame, when an utterance has started and when it has ended."""
+
+    def __init__(
+        self,
+        frame_ms: int = FRAME_MS,
+        silence_seconds: float = SILENCE_SECONDS,
+        min_speech_seconds: float = MIN_SPEECH_SECONDS,
+        calibration_seconds: float = CALIBRATION_SECONDS,
+        threshold_db: Optional[float] = None,  # Fixed threshold; None = calibrate from the room
+    ):
+        self.silence_frames = round(silence_seconds * 1000 / frame_ms)
+        self.min_speech_frames = max(1, round(min_speech_seconds * 1000 / frame_ms))
+        self.calibration_frames = round(calibration_seconds * 1000 / frame_ms)
+        self.threshold_db = threshold_db
+
+        self.speech_started = False
+        self.done = False
+        self._calibration: List[float] = []
+        self._loud_run = 0
+        self._quiet_run = 0
+
+    def process(self, energies_db: np.ndarray) -> bool:
+        """Feed frame energies; returns True once the utterance is over."""
+        for energy in energies_db:
+            if self.threshold_db is None:
+                self._calibration.append(float(energy))
+                if len(self._calibration) < self.calibration_frames:
+                    continue
+                # A low percentile, so speaking right away doesn't inflate the noise floor
+                noise_db = float(np.percentile(self._calibration, 20))
+                self.threshold_db = max(FLOOR_DB, noise_db + MARGIN_DB)
+
+            if energy > self.threshold_db:
+                self._loud_run += 1
+                self._quiet_run = 0
+                if self._loud_run >= self.min_speech_frames:
+                    self.speech_started = True
+            else:
+                self._loud_run = 0
+                self._quiet_run += 1
+                if self.speech_started and self._quiet_run >= self.silence_frames:
+                    self.done = True
+                    return True
+        return False
+
+
+def record_utterance(
+    sample_rate: int = 16000,
+    max_seconds: float = 15.0,
+    no_speech_timeout: float = 5.0,
+    endpointer: Optional[Endpointer] = None,
+) -> np.ndarray:
+    """
+    Record from the microphone until the speaker stops, then trim the silence.
+
+    Returns float32 mono samples; empty if nobody spoke within `no_speech_timeout`.
+    """
+    import sounddevice as sd  # Only needed when actually recording
+
+    endpointer = endpointer or Endpointer()
+    frame_len = sample_rate * FRAME_MS // 1000
+    blocks: "queue.Queue[np.ndarray]" = queue.Queue()
+
+    def callback(indata, frames, time_info, status):
+        blocks.put(indata[:, 0].copy())  # The audio thread only copies; analysis happens here
+
+    recorded = []
+    n_samples = 0
+    with sd.InputStream(
+        samplerate=sample_rate,
+        channels=1,
+        dtype="float32",
+        blocksize=frame_len * BLOCK_FRAMES,
+        callback=callback,
+    ):
+        while True:
+            block = blocks.get()
+            recorded.append(block)
+            n_samples += len(block)
+            if endpointer.process(frame_energy_db(block, frame_len)):
+                break
+            elapsed = n_samples / sample_rate
+            if elapsed >= max_seconds or (not endpointer.speech_started and elapsed >= no_speech_timeout):
+                break
+
+    audio = np.concatenate(recorded)
+    if not endpointer.speech_started:
+        return audio[:0]
+    return trim_silence(audio, sample_rate, endpointer.threshold_db)
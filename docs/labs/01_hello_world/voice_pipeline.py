@@ -0,0 +1,190 @@
+"""
+Pipelined Voice Output
+
+The sequential pipeline in 3_voice.py waits for each stage to finish:
+
+    full LLM reply → full TTS file → play
+
+so the user hears nothing until ALL of it is done. Pipelined, the stages overlap:
+
+    LLM streams tokens → cut into sentences as each one completes
+    → every sentence goes to TTS right away (raw PCM, streamed)
+    → audio chunks play from memory as they arrive
+
+Time to first audio drops to roughly: first sentence + one short TTS call.
+While sentence 1 plays, sentence 2 is already being synthesized.
+
+Used by 3_voice.py.
+"""
+
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional, Tuple
+
+TTS_SAMPLE_RATE = 24000  # response_format="pcm" is 24kHz, 16-bit signed, mono
+TTS_CHUNK_BYTES = 4800  # 0.1s of audio
+MIN_SENTENCE_CHARS = 20  # Shorter pieces ("Sure!") are merged with the next sentence
+
+# End of sentence: . ! ? (plus closing quotes/brackets) followed by whitespace, or a line break.
+# Requiring the whitespace means "3.5" is never cut, even if "3." and "5" arrive in separate chunks.
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n+")
+
+
+class SentenceSplitter:
+    """Cuts streamed text into sentences as soon as each one is complete."""
+
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add a chunk of text; return the sentences it completed (maybe none)."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if len(sentence) >= self.min_chars:
+                sentences.append(sentence)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Whatever is left when the stream ends."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return rest or None
+
+
+def stream_sentences(
+    client,
+    messages: List[dict],
+    model: str = "gpt-4.1-mini",
+    on_text: Optional[Callable[[str], None]] = None,
+) -> Iterator[str]:
+    """Stream a chat completion, yielding each sentence as soon as it is complete."""
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+    splitter = SentenceSplitter()
+    for chunk in stream:
+        content = chunk.choices[0].delta.content if chunk.choices else None
+        if content:
+            if on_text:
+                on_text(content)
+            yield from splitter.feed(content)
+    rest = splitter.flush()
+    if rest:
+        yield rest
+
+
+def synthesize_pcm(client, text: str, voice: str = "nova", model: str = "tts-1") -> Iterator[bytes]:
+    """Stream TTS audio for `text` as raw PCM chunks - no file, no decoding."""
+    with client.audio.speech.with_streaming_response.create(
+        model=model,
+        voice=voice,
+        input=text,
+        response_format="pcm",
+    ) as response:
+        yield from response.iter_bytes(TTS_CHUNK_BYTES)
+
+
+class PcmPlayer:
+    """Plays raw 16-bit mono PCM chunks, in order, on a background thread."""
+
+    def __init__(self, sample_rate: int = TTS_SAMPLE_RATE):
+        import sounddevice as sd  # Only needed when actually playing
+
+        self.first_audio_at: Optional[float] = None
+        self._output = sd.RawOutputStream(samplerate=sample_rate, channels=1, dtype="int16")
+        self._output.start()
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def play(self, chunk: bytes) -> None:
+        self._queue.put(chunk)
+
+    def close(self) -> None:
+        """Wait until everything queued has been played."""
+        self._queue.put(None)
+        self._thread.join()
+        self._output.stop()  # stop() (unlike abort()) lets the device buffer drain
+        self._output.close()
+
+    def _run(self) -> None:
+        carry = b""  # HTTP chunks can split a 2-byte sample in half
+        while (chunk := self._queue.get()) is not None:
+            chunk = carry + chunk
+            usable = len(chunk) - len(chunk) % 2
+            carry = chunk[usable:]
+            if self.first_audio_at is None:
+                self.first_audio_at = time.perf_counter()
+            self._output.write(chunk[:usable])  # Blocks while the device buffer is full
+
+
+@dataclass
+class PipelineTiming:
+    """Seconds from the start of respond_and_speak."""
+
+    first_sentence: Optional[float] = None
+    first_audio: Optional[float] = None
+    total: float = 0.0
+    sentences: int = 0
+
+
+def respond_and_speak(
+    client,
+    messages: List[dict],
+    model: str = "gpt-4.1-mini",
+    voice: str = "nova",
+    player=None,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> Tuple[str, PipelineTiming]:
+    """
+    Stream the reply, synthesize it sentence by sentence, play as it arrives.
+
+    `player` is anything with play(bytes), close() and first_audio_at;
+    defaults to a PcmPlayer on the default output device.
+    Returns the full reply text and the timings.
+    """
+    start = time.perf_counter()
+    timing = PipelineTiming()
+    player = PcmPlayer() if player is None else player
+    sentences: "queue.Queue[Optional[str]]" = queue.Queue()
+
+    def tts_worker() -> None:
+        # One sentence at a time keeps the audio in order; TTS runs faster than playback
+        while (sentence := sentences.get()) is not None:
+            for chunk in synthesize_pcm(client, sentence, voice):
+                player.play(chunk)
+
+    reply = []  # The streamed text as-is: sentences are only how it's cut up for TTS
+
+    def collect(delta: str) -> None:
+        reply.append(delta)
+        if on_text:
+            on_text(delta)
+
+    try:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            tts = executor.submit(tts_worker)
+            try:
+                for sentence in stream_sentences(client, messages, model, collect):
+                    if timing.first_sentence is None:
+                        timing.first_sentence = time.perf_counter() - start
+                    timing.sentences += 1
+                    sentences.put(sentence)
+            finally:
+                sentences.put(None)
+            tts.result()  # Re-raise TTS errors here
+    finally:
+        player.close()  # Even on an error: stops the playback thread and releases the audio device
+
+    if player.first_audio_at is not None:
+        timing.first_audio = player.first_audio_at - start
+    timing.total = time.perf_counter() - start
+    return "".join(reply), timing
@@ -6,30 +6,19 @@ This is the simplest possible agent.
 
 Run: uv run python docs/labs/02_standalone_agents/1_stateless_agent.py
 """
+import asyncio
 import time
 from dotenv import load_dotenv
-from openai import OpenAI
 
-load_dotenv()
-client = OpenAI()
-
-print("=" * 50)
-print("STATELESS AGENT")
-print("Each turn is independent. No memory of previous turns.")
-print("Type 'exit' to quit.")
-print("=" * 50)
-print()
+from async_runtime import ainput, get_client
 
-while True:
-    user_input = input("You: ").strip()
-    if user_input.lower() == "exit":
-        break
-    if not user_input:
-        continue
+load_dotenv()
+client = get_client()
 
-    start = time.time()
 
-    response = client.chat.completions.create(
+async def respond(user_input: str):
+    """One stateless turn: only the current message is sent."""
+    return await client.chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "user", "content": user_input}  # Only current message
@@ -37,11 +26,35 @@ while True:
         temperature=0.7,
     )
 
-    elapsed = time.time() - start
-    reply = response.choices[0].message.content
-    usage = response.usage
 
-    print(f"\nAssistant ({elapsed:.2f}s):")
-    print(reply)
-    print(f"\n[Tokens: {usage.prompt_tokens} in, {usage.completion_tokens} out]")
+async def main():
+    print("=" * 50)
+    print("STATELESS AGENT")
+    print("Each turn is independent. No memory of previous turns.")
+    print("Type 'exit' to quit.")
+    print("=" * 50)
     print()
+
+    while True:
+        user_input = (await ainput("You: ")).strip()
+        if user_input.lower() == "exit":
+            break
+        if not user_input:
+            continue
+
+        start = time.time()
+
+        response = await respond(user_input)
+
+        elapsed = time.time() - start
+        reply = response.choices[0].message.content
+        usage = response.usage
+
+        print(f"\nAssistant ({elapsed:.2f}s):")
+        print(reply)
+        print(f"\n[Tokens: {usage.prompt_tokens} in, {usage.completion_tokens} out]")
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,64 +4,129 @@ Stateful Agent - Maintains full conversation history
 Every turn includes all previous messages.
 Watch how token counts grow with each turn.
 
+With --server-state the OpenAI Responses API keeps the history instead:
+each turn sends only the new message plus the id of the previous response
+(previous_response_id). Less goes over the wire - but the model still reads
+the whole conversation, so input tokens are still billed for all of it
+(mostly as cached tokens). See 6_state_benchmark.py for the comparison.
+
 Run: uv run python docs/labs/02_standalone_agents/2_stateful_agent.py
+     uv run python docs/labs/02_standalone_agents/2_stateful_agent.py --server-state
 """
+import argparse
+import asyncio
 import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from async_runtime import ainput, get_client
 
 load_dotenv()
-client = OpenAI()
-
-# ---- AGENT STATE ----
-conversation = []
-turn_number = 0
-cumulative_input_tokens = 0
-
-print("=" * 50)
-print("STATEFUL AGENT")
-print("Full conversation history sent with every turn.")
-print("Watch the token counts grow!")
-print("Type 'exit' to quit.")
-print("=" * 50)
-print()
-
-while True:
-    user_input = input("You: ").strip()
-    if user_input.lower() == "exit":
-        break
-    if not user_input:
-        continue
-
-    turn_number += 1
+client = get_client()
 
+
+async def run_turn(conversation: List[Dict], user_input: str):
+    """Send the FULL history plus the new message; record both sides."""
     # Add user message to history
     conversation.append({"role": "user", "content": user_input})
 
-    start = time.time()
-
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model="gpt-4.1-mini",
         messages=conversation,  # Send FULL history
         temperature=0.7,
     )
 
-    elapsed = time.time() - start
-    reply = response.choices[0].message.content
-    usage = response.usage
-
     # Add assistant message to history
-    conversation.append({"role": "assistant", "content": reply})
+    conversation.append({"role": "assistant", "content": response.choices[0].message.content})
+    return response
 
-    # Track cumulative tokens
-    cumulative_input_tokens += usage.prompt_tokens
 
-    print(f"\nAssistant ({elapsed:.2f}s):")
-    print(reply)
-    print()
-    print(f"--- Turn {turn_number} Stats ---")
-    print(f"Messages in history: {len(conversation)}")
-    print(f"Input tokens this turn: {usage.prompt_tokens}")
-    print(f"Output tokens: {usage.completion_tokens}")
-    print(f"Cumulative input tokens: {cumulative_input_tokens}")
+@dataclass
+class ServerConversation:
+    """All we keep locally when the server holds the history: a pointer to it."""
+    previous_response_id: Optional[str] = None
+    turns: int = 0
+
+
+async def run_chained_turn(conversation: ServerConversation, user_input: str):
+    """Send ONLY the new message; the server chains it onto the previous response."""
+    response = await client.responses.create(
+        model="gpt-4.1-mini",
+        input=user_input,
+        previous_response_id=conversation.previous_response_id,  # None on the first turn
+        temperature=0.7,
+    )
+    conversation.previous_response_id = response.id
+    conversation.turns += 1
+    return response
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Stateful agent")
+    parser.add_argument(
+        "--server-state", action="store_true",
+        help="Keep the history on the server (Responses API previous_response_id)",
+    )
+    args = parser.parse_args()
+
+    # ---- AGENT STATE ----
+    conversation = ServerConversation() if args.server_state else []
+    turn_number = 0
+    cumulative_input_tokens = 0
+
+    print("=" * 50)
+    print("STATEFUL AGENT")
+    if args.server_state:
+        print("History kept on the server: only the new message is sent.")
+    else:
+        print("Full conversation history sent with every turn.")
+    print("Watch the token counts grow!")
+    print("Type 'exit' to quit.")
+    print("=" * 50)
     print()
+
+    while True:
+        user_input = (await ainput("You: ")).strip()
+        if user_input.lower() == "exit":
+            break
+        if not user_input:
+            continue
+
+        turn_number += 1
+
+        start = time.time()
+
+        if args.server_state:
+            response = await run_chained_turn(conversation, user_input)
+            reply = response.output_text
+            input_tokens = response.usage.input_tokens
+            output_tokens = response.usage.output_tokens
+            history = f"{conversation.turns * 2} messages (on the server)"
+        else:
+            response = await run_turn(conversation, user_input)
+            reply = response.choices[0].message.content
+            input_tokens = response.usage.prompt_tokens
+            output_tokens = response.usage.completion_tokens
+            history = len(conversation)
+
+        elapsed = time.time() - start
+
+        # Track cumulative tokens
+        cumulative_input_tokens += input_tokens
+
+        print(f"\nAssistant ({elapsed:.2f}s):")
+        print(reply)
+        print()
+        print(f"--- Turn {turn_number} Stats ---")
+        print(f"Messages in history: {history}")
+        print(f"Input tokens this turn: {input_tokens}")
+        if args.server_state:
+            print(f"  ...of which cached: {response.usage.input_tokens_details.cached_tokens}")
+        print(f"Output tokens: {output_tokens}")
+        print(f"Cumulative input tokens: {cumulative_input_tokens}")
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
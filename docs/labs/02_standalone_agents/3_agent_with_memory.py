@@ -10,14 +10,27 @@ Run: uv run python docs/labs/02_standalone_agents/3_agent_with_memory.py
 Configuration:
 - WINDOW_TURNS: How many recent turns to keep verbatim
 - SUMMARY_STYLE: How to format the memory (BULLETS, JSON, TLDR)
+- CONTEXT_BUDGET_TOKENS: Hard ceiling on input tokens per request
+- BACKGROUND_COMPRESSION: Summarize in a background task instead of before the reply
+- CACHE_FRIENDLY_LAYOUT: Put the memory after the history, so a new summary
+  doesn't invalidate the provider's prompt-prefix cache (see context_builder.py)
+
+Each conversation is a MemorySession and each turn is a coroutine
+(run_turn), so one process can serve many conversations at once
+(see 5_concurrent_sessions.py).
 """
+import asyncio
 import time
+from dataclasses import dataclass, field
 from typing import List, Dict
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from async_runtime import ainput, get_client
+from background_summary import BackgroundSummarizer
+from context_builder import TokenCounter, cached_tokens, pack_context
 
 load_dotenv()
-client = OpenAI()
+client = get_client()  # Shared AsyncOpenAI with a pooled HTTP client
 
 # ----------------------------
 # Configuration
@@ -25,10 +38,16 @@ client = OpenAI()
 MODEL = "gpt-4.1-mini"
 WINDOW_TURNS = 6  # Keep last N turns verbatim (turn = user + assistant)
 TEMPERATURE = 0.7
+CONTEXT_BUDGET_TOKENS = 3000  # Max input tokens per request (system + memory + window + input)
+SUMMARY_MESSAGE_TOKENS = 125  # Max tokens per message sent to the summarizer
+BACKGROUND_COMPRESSION = True  # Keep summarization off the user's critical path
+CACHE_FRIENDLY_LAYOUT = True  # Stable instructions first, the volatile memory last
 
 # Choose summary style: "BULLETS", "JSON", or "TLDR"
 SUMMARY_STYLE = "BULLETS"
 
+counter = TokenCounter(MODEL)
+
 # ----------------------------
 # Summary Prompts
 # ----------------------------
@@ -67,14 +86,14 @@ Return ONLY the updated MEMORY.""",
 }
 
 
-def summarize_turns(turns: List[Dict], existing_memory: str) -> str:
+async def summarize_turns(turns: List[Dict], existing_memory: str) -> str:
     """Compress conversation turns into a memory summary."""
     transcript = "\n".join([
-        f"{m['role'].title()}: {m['content'][:500]}"  # Truncate long messages
+        f"{m['role'].title()}: {counter.truncate(m['content'], SUMMARY_MESSAGE_TOKENS)}"  # Truncate long messages
         for m in turns
     ])
 
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=MODEL,
         messages=[
             {"role": "system", "content": SUMMARY_PROMPTS[SUMMARY_STYLE]},
@@ -103,8 +122,19 @@ def trim_to_window(conversation: List[Dict], window_turns: int) -> List[Dict]:
     return list(reversed(kept))
 
 
+SYSTEM_PROMPT = """You are a helpful assistant.
+
+You may be given a LONG-TERM MEMORY (summary of earlier conversation).
+Use this memory as context when relevant. Focus on the recent conversation."""
+
+
 def build_messages(memory: str, window: List[Dict], user_input: str) -> List[Dict]:
-    """Build the message array for the API call."""
+    """Build the message array for the API call, packed to CONTEXT_BUDGET_TOKENS."""
+    if CACHE_FRIENDLY_LAYOUT:
+        # [instructions, ...window..., memory, user]: only the tail changes when memory does
+        memory_content = f"LONG-TERM MEMORY (summary of earlier conversation):\n{memory}" if memory else None
+        return pack_context(counter, SYSTEM_PROMPT, window, user_input, CONTEXT_BUDGET_TOKENS, memory=memory_content)
+
     system_content = f"""You are a helpful assistant.
 
 LONG-TERM MEMORY (summary of earlier conversation):
@@ -112,76 +142,133 @@ LONG-TERM MEMORY (summary of earlier conversation):
 
 Use this memory as context when relevant. Focus on the recent conversation."""
 
-    messages = [{"role": "system", "content": system_content}]
-    messages.extend(window)
-    messages.append({"role": "user", "content": user_input})
-    return messages
+    return pack_context(counter, system_content, window, user_input, CONTEXT_BUDGET_TOKENS)
+
+
+@dataclass
+class MemorySession:
+    """Everything one conversation needs - one of these per concurrent user."""
+    conversation: List[Dict] = field(default_factory=list)
+    memory_summary: str = ""
+    turn_number: int = 0
+    prompt_tokens_total: int = 0
+    cached_tokens_total: int = 0  # Prompt tokens served from the provider's prefix cache
+    summarizer: BackgroundSummarizer = field(
+        default_factory=lambda: BackgroundSummarizer(summarize_turns)
+    )
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        return self.cached_tokens_total / self.prompt_tokens_total if self.prompt_tokens_total else 0.0
+
+
+@dataclass
+class TurnResult:
+    reply: str
+    elapsed: float
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    local_tokens: int  # Our own count of the request, before sending
+    compressing: bool  # A summary was started this turn
+
+
+async def run_turn(session: MemorySession, user_input: str) -> TurnResult:
+    """Answer one user message, compressing older turns as needed."""
+    session.turn_number += 1
 
+    # Swap in a summary that finished in the background
+    done = session.summarizer.poll()
+    if done:
+        session.memory_summary, folded = done
+        session.conversation = session.conversation[folded:]  # Drop turns now covered by memory
 
-def main():
+    # Check if we need to compress older turns
+    window = trim_to_window(session.conversation, WINDOW_TURNS)
+    older = session.conversation[:max(0, len(session.conversation) - len(window))]
+
+    compressing = bool(older) and session.summarizer.submit(older, session.memory_summary, len(older))
+    if compressing and not BACKGROUND_COMPRESSION:
+        session.memory_summary, folded = await session.summarizer.wait()
+        session.conversation = session.conversation[folded:]
+
+    # Build messages: system + window + memory + new user input
+    # (or memory inside the system prompt without CACHE_FRIENDLY_LAYOUT)
+    # (turns still being summarized stay in the window until memory catches up)
+    messages = build_messages(session.memory_summary, session.conversation, user_input)
+
+    start = time.time()
+    response = await client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=TEMPERATURE,
+    )
+    elapsed = time.time() - start
+
+    reply = response.choices[0].message.content
+    usage = response.usage
+
+    # Update conversation history
+    session.conversation.append({"role": "user", "content": user_input})
+    session.conversation.append({"role": "assistant", "content": reply})
+    session.prompt_tokens_total += usage.prompt_tokens
+    session.cached_tokens_total += cached_tokens(usage)
+
+    return TurnResult(
+        reply=reply,
+        elapsed=elapsed,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cached_tokens=cached_tokens(usage),
+        local_tokens=counter.count_messages(messages),
+        compressing=compressing,
+    )
+
+
+async def main():
     print("=" * 60)
     print("AGENT WITH MEMORY")
-    print(f"Window: last {WINDOW_TURNS} turns | Summary style: {SUMMARY_STYLE}")
+    print(f"Window: last {WINDOW_TURNS} turns, max {CONTEXT_BUDGET_TOKENS} tokens | Summary style: {SUMMARY_STYLE}")
+    print(f"Layout: {'cache-friendly (memory after history)' if CACHE_FRIENDLY_LAYOUT else 'memory in system prompt'}")
     print("Older turns are compressed into memory.")
     print("Type 'exit' to quit.")
     print("=" * 60)
     print()
 
-    conversation: List[Dict] = []
-    memory_summary: str = ""
-    turn_number = 0
+    session = MemorySession()
 
     while True:
-        user_input = input("You: ").strip()
+        user_input = (await ainput("You: ")).strip()
         if user_input.lower() == "exit":
             break
         if not user_input:
             continue
 
-        turn_number += 1
-
-        # Check if we need to compress older turns
-        window = trim_to_window(conversation, WINDOW_TURNS)
-        older = conversation[:max(0, len(conversation) - len(window))]
-
-        if older:
-            print("\n[Compressing older turns into memory...]")
-            memory_summary = summarize_turns(older, memory_summary)
-            conversation = window  # Drop older turns from active conversation
-
-        # Build messages: system (with memory) + window + new user input
-        messages = build_messages(memory_summary, conversation, user_input)
+        result = await run_turn(session, user_input)
 
-        start = time.time()
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=TEMPERATURE,
-        )
-        elapsed = time.time() - start
+        if result.compressing:
+            mode = "in the background" if BACKGROUND_COMPRESSION else "before replying"
+            print(f"\n[Compressing older turns into memory {mode}...]")
 
-        reply = response.choices[0].message.content
-        usage = response.usage
-
-        # Update conversation history
-        conversation.append({"role": "user", "content": user_input})
-        conversation.append({"role": "assistant", "content": reply})
-
-        print(f"\nAssistant ({elapsed:.2f}s):")
-        print(reply)
+        print(f"\nAssistant ({result.elapsed:.2f}s):")
+        print(result.reply)
         print()
-        print(f"--- Turn {turn_number} Stats ---")
-        print(f"Window messages: {len(conversation)}")
-        print(f"Memory length: {len(memory_summary)} chars")
-        print(f"Input tokens: {usage.prompt_tokens}")
-        print(f"Output tokens: {usage.completion_tokens}")
-
+        print(f"--- Turn {session.turn_number} Stats ---")
+        print(f"Window messages: {len(session.conversation)}")
+        print(f"Memory length: {len(session.memory_summary)} chars")
+        print(f"Input tokens: {result.prompt_tokens} (local count: {result.local_tokens}, budget: {CONTEXT_BUDGET_TOKENS})")
+        print(f"Output tokens: {result.completion_tokens}")
+        print(f"Cached input tokens: {result.cached_tokens} (session cache hit ratio: {session.cache_hit_ratio:.0%})")
+
+        memory_summary = session.memory_summary
         if memory_summary:
             print(f"\n[Current Memory Preview]")
             preview = memory_summary[:300] + "..." if len(memory_summary) > 300 else memory_summary
             print(preview)
         print()
 
+    await session.summarizer.shutdown()
+
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -3,11 +3,24 @@ Agent with Short-Term AND Long-Term Memory
 
 Short-term: Within this conversation (window + summary)
 Long-term: Across conversations, persisted to disk (user facts, preferences)
+           in a SQLite store with one row per user (see memory_store.py)
 
 This demonstrates the two types of memory AI systems need:
 - Short-term for conversation coherence
 - Long-term for user personalization
 
+MEMORY_MODE = "retrieval" keeps long-term memories in a per-user vector
+index instead (see vector_memory.py): each memory is embedded once when
+saved, and each turn only the RETRIEVAL_TOP_K most relevant to the user's
+message go into the prompt - so a user can have thousands of memories while
+the prompt stays the same size.
+
+At the end of a session the LLM only extracts NEW candidate facts from the
+transcript; merging them into what's stored (dropping duplicates and
+near-duplicates) happens locally and deterministically (see fact_merge.py).
+In prompt mode only the newest MAX_MEMORY_ITEMS of each kind are kept, since
+every one of them is in every prompt; retrieval mode keeps them all.
+
 Run: uv run python docs/labs/02_standalone_agents/4_agent_with_long_term_memory.py
 
 The agent will:
@@ -15,79 +28,154 @@ The agent will:
 2. Load any existing long-term memory for you
 3. Maintain short-term memory during the conversation
 4. Extract and save long-term facts when you exit
+
+checkpoint() saves long-term facts from the turns since the last save
+without ending the session - 7_memory_server.py calls it periodically, so a
+crash loses at most one checkpoint interval.
+
+Each conversation is a LongTermSession and each turn is a coroutine
+(run_turn), so one process can serve many users at once
+(see 5_concurrent_sessions.py).
 """
 
+import asyncio
 import json
 import time
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, List, Optional
 
+import numpy as np
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from async_runtime import ainput, get_client
+from background_summary import BackgroundSummarizer
+from context_builder import TokenCounter, cached_tokens, pack_context
+from fact_merge import FactIndex, merge_memory
+from memory_store import (
+    CachedMemoryStore,
+    JsonFileMemoryStore,
+    MemoryStore,
+    SqliteMemoryStore,
+    migrate_json_to_sqlite,
+)
+from vector_memory import EMBEDDING_DIMENSIONS, VectorMemoryStore, group_by_kind
 
 load_dotenv()
-client = OpenAI()
+client = get_client()  # Shared AsyncOpenAI with a pooled HTTP client
 
 # ----------------------------
 # Configuration
 # ----------------------------
 MODEL = "gpt-4.1-mini"
+MEMORY_BACKEND = "sqlite"  # "sqlite" (one row per user) or "json" (original single file)
 MEMORY_FILE = Path(__file__).parent / "user_memories.json"
+MEMORY_DB = Path(__file__).parent / "user_memories.db"
+MEMORY_CACHE_BYTES = 8 * 1024 * 1024  # In-process LRU cache of user memories
+MEMORY_MODE = "prompt"  # "prompt" (every memory in every prompt) or "retrieval" (top-k relevant)
+VECTOR_DIR = Path(__file__).parent / "user_vectors"  # Per-user vector indexes (retrieval mode)
+EMBEDDING_MODEL = "text-embedding-3-small"
+RETRIEVAL_TOP_K = 8  # Long-term memories injected per turn (retrieval mode)
+MAX_MEMORY_ITEMS = 20  # Prompt mode: newest facts / preferences kept per user (all go in every prompt)
 WINDOW_TURNS = 4  # Keep last N turns as short-term memory
+BACKGROUND_COMPRESSION = True  # Summarize in a background task, off the critical path
+CACHE_FRIENDLY_LAYOUT = True  # Stable content first, the volatile summary last (see context_builder.py)
+CONTEXT_BUDGET_TOKENS = 3000  # Max input tokens per request (system + memory + window + input)
+TRANSCRIPT_MESSAGE_TOKENS = 75  # Max tokens per message sent to summarization/extraction
+
+counter = TokenCounter(MODEL)
 
 
 # ----------------------------
 # Long-Term Memory (Persistent)
 # ----------------------------
-def load_all_memories() -> Dict:
-    """Load all user memories from disk."""
-    if MEMORY_FILE.exists():
-        with open(MEMORY_FILE) as f:
-            return json.load(f)
-    return {}
+_memory_store: Optional[CachedMemoryStore] = None
 
 
-def save_all_memories(memories: Dict) -> None:
-    """Save all user memories to disk."""
-    with open(MEMORY_FILE, "w") as f:
-        json.dump(memories, f, indent=2)
+def get_memory_store() -> CachedMemoryStore:
+    """Open the configured memory backend (once), migrating the old JSON file if needed."""
+    global _memory_store
+    if _memory_store is None:
+        backing: MemoryStore
+        if MEMORY_BACKEND == "json":
+            backing = JsonFileMemoryStore(MEMORY_FILE)
+        else:
+            backing = SqliteMemoryStore(MEMORY_DB)
+            if MEMORY_FILE.exists() and backing.count() == 0:
+                migrated = migrate_json_to_sqlite(MEMORY_FILE, backing)
+                print(f"[Migrated {migrated} users from {MEMORY_FILE.name} to {MEMORY_DB.name}]")
+        _memory_store = CachedMemoryStore(backing, max_bytes=MEMORY_CACHE_BYTES)
+    return _memory_store
 
 
 def get_user_memory(user_id: str) -> Dict:
     """Get long-term memory for a specific user."""
-    memories = load_all_memories()
-    return memories.get(user_id.lower(), {"facts": [], "preferences": []})
+    memory = get_memory_store().get(user_id.lower())
+    return memory or {"facts": [], "preferences": []}
 
 
 def save_user_memory(user_id: str, memory: Dict) -> None:
     """Save long-term memory for a specific user."""
-    memories = load_all_memories()
-    memories[user_id.lower()] = memory
-    save_all_memories(memories)
+    get_memory_store().save(user_id.lower(), memory)
+
+
+# ----------------------------
+# Retrieval Memory (MEMORY_MODE = "retrieval")
+# ----------------------------
+_vector_store: Optional[VectorMemoryStore] = None
+
+
+def get_vector_store() -> VectorMemoryStore:
+    global _vector_store
+    if _vector_store is None:
+        _vector_store = VectorMemoryStore(VECTOR_DIR)
+    return _vector_store
+
+
+async def embed(texts: List[str]) -> np.ndarray:
+    response = await client.embeddings.create(
+        model=EMBEDDING_MODEL, input=texts, dimensions=EMBEDDING_DIMENSIONS
+    )
+    return np.array([d.embedding for d in response.data], dtype=np.float32)
+
+
+async def remember(user_id: str, memory: Dict) -> int:
+    """Embed and index the memories not stored yet. Returns how many were added."""
+    index = await asyncio.to_thread(get_vector_store().index, user_id)
+    new = [(kind, text) for kind in ("facts", "preferences") for text in memory.get(kind, []) if text not in index]
+    if not new:
+        return 0
+    vectors = await embed([text for _, text in new])  # Embedded once, here - never per turn
+    return await asyncio.to_thread(index.add, [text for _, text in new], [kind for kind, _ in new], vectors)
+
+
+async def recall(user_id: str, query: str, k: int = RETRIEVAL_TOP_K) -> Dict:
+    """The k long-term memories most relevant to `query`, as a memory dict."""
+    index = await asyncio.to_thread(get_vector_store().index, user_id)
+    if len(index) == 0:
+        return {"facts": [], "preferences": []}
+    query_vector = (await embed([query]))[0]
+    return group_by_kind(await asyncio.to_thread(index.search, query_vector, k))
 
 
 # ----------------------------
 # Memory Extraction (LLM)
 # ----------------------------
-def extract_long_term_facts(
-    conversation: List[Dict],
-    existing_memory: Dict
-) -> Dict:
+async def extract_long_term_facts(conversation: List[Dict]) -> Dict:
     """
     Ask the LLM to extract facts worth remembering long-term.
 
     This is the key insight: the LLM itself decides what's important
-    enough to persist across conversations.
+    enough to persist across conversations. It only sees the transcript -
+    merging with what's already stored is done locally (merge_memory), so
+    the request doesn't grow with the user's memory.
     """
     transcript = "\n".join([
-        f"{m['role'].title()}: {m['content'][:300]}"
+        f"{m['role'].title()}: {counter.truncate(m['content'], TRANSCRIPT_MESSAGE_TOKENS)}"
         for m in conversation
     ])
 
-    existing_facts = existing_memory.get("facts", [])
-    existing_prefs = existing_memory.get("preferences", [])
-
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=MODEL,
         messages=[{
             "role": "system",
@@ -110,46 +198,64 @@ Return valid JSON with this structure:
   "preferences": ["pref1", "pref2", ...]
 }
 
-Keep each list to max 10 items. Merge with existing memory, removing duplicates."""
+Keep each item short and self-contained. Return empty lists if nothing is worth remembering."""
         }, {
             "role": "user",
-            "content": f"""EXISTING LONG-TERM MEMORY:
-Facts: {existing_facts}
-Preferences: {existing_prefs}
-
-NEW CONVERSATION TO ANALYZE:
+            "content": f"""CONVERSATION TO ANALYZE:
 {transcript}
 
-Extract updated long-term memory:"""
+Extract long-term memory:"""
         }],
         temperature=0,
         response_format={"type": "json_object"}
     )
 
-    try:
-        return json.loads(response.choices[0].message.content)
-    except json.JSONDecodeError:
-        return existing_memory
+    return parse_candidates(response.choices[0].message.content)
+
 
+def parse_candidates(content: Optional[str]) -> Dict:
+    """The extractor's JSON as {"facts": [...], "preferences": [...]} of strings.
 
-def summarize_short_term(conversation: List[Dict]) -> str:
-    """Compress older turns into short-term summary."""
-    if len(conversation) < 4:
-        return ""
+    Anything else - not JSON, not an object, a list that isn't a list of
+    strings - counts as nothing new, so stored memory is left untouched.
+    """
+    empty = {"facts": [], "preferences": []}
+    try:
+        candidates = json.loads(content or "")
+    except json.JSONDecodeError:
+        return empty
+    if not isinstance(candidates, dict):
+        return empty
+    parsed = {}
+    for kind in ("facts", "preferences"):
+        items = candidates.get(kind, [])
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            return empty
+        parsed[kind] = [item.strip() for item in items if item.strip()]
+    return parsed
+
+
+async def summarize_short_term(new_turns: List[Dict], existing_summary: str) -> str:
+    """
+    Fold turns that just left the window into the running short-term summary.
 
+    Only the new turns and the previous summary are sent, never the whole
+    conversation prefix, so the cost per compression stays constant no matter
+    how long the session runs (same idea as summarize_turns in 3_agent_with_memory.py).
+    """
     transcript = "\n".join([
-        f"{m['role'].title()}: {m['content'][:200]}"
-        for m in conversation[:-4]  # Everything except last 4 messages
+        f"{m['role'].title()}: {counter.truncate(m['content'], TRANSCRIPT_MESSAGE_TOKENS)}"
+        for m in new_turns
     ])
 
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=MODEL,
         messages=[{
             "role": "system",
-            "content": "Summarize this conversation in 2-3 sentences. Focus on what was discussed and any decisions made."
+            "content": "You maintain a running summary of a conversation. Update the EXISTING SUMMARY with the NEW TURNS in 2-3 sentences. Focus on what was discussed and any decisions made."
         }, {
             "role": "user",
-            "content": transcript
+            "content": f"EXISTING SUMMARY:\n{existing_summary or '(empty)'}\n\nNEW TURNS:\n{transcript}"
         }],
         temperature=0,
     )
@@ -164,9 +270,10 @@ def build_messages(
     long_term_memory: Dict,
     short_term_summary: str,
     recent_conversation: List[Dict],
-    user_input: str
+    user_input: str,
+    retrieved: bool = False,  # long_term_memory was retrieved for THIS message
 ) -> List[Dict]:
-    """Build the message array with both memory types."""
+    """Build the message array with both memory types, packed to CONTEXT_BUDGET_TOKENS."""
 
     # Format long-term memory
     facts = long_term_memory.get("facts", [])
@@ -178,6 +285,31 @@ def build_messages(
     if prefs:
         long_term_str += "\n\nUser preferences:\n" + "\n".join(f"- {p}" for p in prefs)
 
+    if CACHE_FRIENDLY_LAYOUT:
+        # Long-term memory loaded for the session is fixed, so it can stay in the
+        # cached prefix; retrieved memories and the summary change, so they go last
+        tail = []
+        if retrieved and long_term_str:
+            tail.append(f"=== LONG-TERM MEMORY (relevant to this message) ===\n{long_term_str}")
+        if short_term_summary:
+            tail.append(f"=== SHORT-TERM MEMORY (this conversation only) ===\n{short_term_summary}")
+
+        if retrieved:
+            long_term_section = "You may be given LONG-TERM MEMORY (persists across conversations) relevant to each message."
+        else:
+            long_term_section = f"""=== LONG-TERM MEMORY (persists across conversations) ===
+{long_term_str or "(No long-term memory yet for this user)"}"""
+        system_content = f"""You are a helpful assistant with memory.
+
+{long_term_section}
+
+You may also be given a SHORT-TERM MEMORY (this conversation only).
+Use this memory naturally. Don't explicitly mention "my memory says" - just know these things about the user."""
+        return pack_context(
+            counter, system_content, recent_conversation, user_input, CONTEXT_BUDGET_TOKENS,
+            memory="\n\n".join(tail) or None,
+        )
+
     system_content = f"""You are a helpful assistant with memory.
 
 === LONG-TERM MEMORY (persists across conversations) ===
@@ -188,14 +320,156 @@ def build_messages(
 
 Use this memory naturally. Don't explicitly mention "my memory says" - just know these things about the user."""
 
-    messages = [{"role": "system", "content": system_content}]
-    messages.extend(recent_conversation)
-    messages.append({"role": "user", "content": user_input})
+    return pack_context(counter, system_content, recent_conversation, user_input, CONTEXT_BUDGET_TOKENS)
 
-    return messages
 
+@dataclass
+class LongTermSession:
+    """Everything one user's conversation needs - one of these per concurrent user."""
+    user_id: str
+    long_term_memory: Dict
+    conversation: List[Dict] = field(default_factory=list)
+    short_term_summary: str = ""
+    summarized_upto: int = 0  # High-water mark: conversation[:summarized_upto] is in the summary
+    checkpointed_upto: int = 0  # High-water mark: conversation[:checkpointed_upto] is in long-term memory
+    turn_number: int = 0
+    prompt_tokens_total: int = 0
+    cached_tokens_total: int = 0  # Prompt tokens served from the provider's prefix cache
+    summarizer: BackgroundSummarizer = field(
+        default_factory=lambda: BackgroundSummarizer(summarize_short_term)
+    )
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        return self.cached_tokens_total / self.prompt_tokens_total if self.prompt_tokens_total else 0.0
+
+
+@dataclass
+class TurnResult:
+    reply: str
+    elapsed: float
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int
+    compressing: bool  # A summary was started this turn
+
+
+async def start_session(user_id: str) -> LongTermSession:
+    """Load a user's long-term memory and open a new conversation."""
+    long_term_memory = await asyncio.to_thread(get_user_memory, user_id)
+    if MEMORY_MODE == "retrieval":
+        await remember(user_id, long_term_memory)  # Index memories saved in prompt mode (no-op once indexed)
+    return LongTermSession(user_id=user_id, long_term_memory=long_term_memory)
+
+
+async def run_turn(session: LongTermSession, user_input: str) -> TurnResult:
+    """Answer one user message, compressing older turns as needed."""
+    session.turn_number += 1
+    conversation = session.conversation
+
+    # Swap in a summary that finished in the background
+    done = session.summarizer.poll()
+    if done:
+        session.short_term_summary, session.summarized_upto = done
+
+    # Fold turns that left the window (and aren't summarized yet) into the summary
+    window_start = max(0, len(conversation) - WINDOW_TURNS * 2)
+    compressing = window_start > session.summarized_upto and session.summarizer.submit(
+        conversation[session.summarized_upto:window_start],
+        session.short_term_summary,
+        window_start,
+    )
+    if compressing and not BACKGROUND_COMPRESSION:
+        session.short_term_summary, session.summarized_upto = await session.summarizer.wait()
+
+    long_term_memory = session.long_term_memory
+    if MEMORY_MODE == "retrieval":
+        long_term_memory = await recall(session.user_id, user_input)
+
+    # Build messages with both memory types
+    # (turns still being summarized stay verbatim until the summary lands)
+    messages = build_messages(
+        long_term_memory,
+        session.short_term_summary,
+        conversation[session.summarized_upto:],
+        user_input,
+        retrieved=MEMORY_MODE == "retrieval",
+    )
+
+    start = time.time()
+    response = await client.chat.completions.create(
+        model=MODEL,
+        messages=messages,
+        temperature=0.7,
+    )
+    elapsed = time.time() - start
+
+    reply = response.choices[0].message.content
+    usage = response.usage
+
+    # Update conversation history
+    conversation.append({"role": "user", "content": user_input})
+    conversation.append({"role": "assistant", "content": reply})
+    session.prompt_tokens_total += usage.prompt_tokens
+    session.cached_tokens_total += cached_tokens(usage)
+
+    return TurnResult(
+        reply=reply,
+        elapsed=elapsed,
+        prompt_tokens=usage.prompt_tokens,
+        completion_tokens=usage.completion_tokens,
+        cached_tokens=cached_tokens(usage),
+        compressing=compressing,
+    )
+
+
+async def save_turns(session: LongTermSession, turns: List[Dict]) -> Dict:
+    """
+    Extract long-term memory from `turns` and save it (the session itself is not changed).
+
+    Returns what was saved: the user's whole memory in prompt mode, the newly
+    indexed memories in retrieval mode.
+    """
+    candidates = await extract_long_term_facts(turns)
+
+    if MEMORY_MODE == "retrieval":
+        # Only candidates that aren't (near-)duplicates of an indexed memory get embedded
+        index = await asyncio.to_thread(get_vector_store().index, session.user_id)
+        known = await asyncio.to_thread(FactIndex, index.texts)
+        saved = {
+            kind: [text for text in candidates[kind] if known.add(text) == "added"]
+            for kind in ("facts", "preferences")
+        }
+        await remember(session.user_id, saved)
+    else:
+        # Merge into what's stored NOW (not what this session loaded), atomically:
+        # other sessions of the same user may have saved in the meantime
+        def merge(stored: Optional[Dict]) -> Dict:
+            merged, _ = merge_memory(stored or {"facts": [], "preferences": []}, candidates)
+            # Oldest go first: past the cap they'd only crowd the history out of the context budget
+            return {kind: items[-MAX_MEMORY_ITEMS:] for kind, items in merged.items()}
+
+        saved = await asyncio.to_thread(get_memory_store().update, session.user_id.lower(), merge)
+    return saved
 
-def main():
+
+async def checkpoint(session: LongTermSession) -> Optional[Dict]:
+    """Save long-term memory from the turns since the last checkpoint. None if there were none."""
+    upto = len(session.conversation)
+    if upto == session.checkpointed_upto:
+        return None
+    saved = await save_turns(session, session.conversation[session.checkpointed_upto:upto])
+    session.checkpointed_upto = upto
+    return saved
+
+
+async def end_session(session: LongTermSession) -> Optional[Dict]:
+    """Extract and save long-term memory. Returns the saved memory, if any."""
+    await session.summarizer.shutdown()
+    return await checkpoint(session)
+
+
+async def main():
     print("=" * 60)
     print("AGENT WITH SHORT-TERM AND LONG-TERM MEMORY")
     print("=" * 60)
@@ -206,14 +480,19 @@ def main():
     print()
 
     # Get user identity
-    user_id = input("What's your name? ").strip()
+    user_id = (await ainput("What's your name? ")).strip()
     if not user_id:
         user_id = "anonymous"
 
     # Load long-term memory
-    long_term_memory = get_user_memory(user_id)
-
-    if long_term_memory.get("facts") or long_term_memory.get("preferences"):
+    session = await start_session(user_id)
+    long_term_memory = session.long_term_memory
+
+    if MEMORY_MODE == "retrieval":
+        indexed = len(get_vector_store().index(user_id))
+        print(f"\n[{indexed} long-term memories indexed for '{user_id}' - "
+              f"the {RETRIEVAL_TOP_K} most relevant go into each prompt]")
+    elif long_term_memory.get("facts") or long_term_memory.get("preferences"):
         print(f"\n[Loaded long-term memory for '{user_id}']")
         if long_term_memory.get("facts"):
             print(f"  Facts: {long_term_memory['facts'][:3]}...")
@@ -225,68 +504,45 @@ def main():
     print("-" * 60)
     print()
 
-    conversation: List[Dict] = []
-    short_term_summary: str = ""
-    turn_number = 0
-
     while True:
-        user_input = input("You: ").strip()
+        user_input = (await ainput("You: ")).strip()
         if user_input.lower() == "exit":
             break
         if not user_input:
             continue
 
-        turn_number += 1
+        result = await run_turn(session, user_input)
 
-        # Update short-term memory if conversation is getting long
-        if len(conversation) > WINDOW_TURNS * 2:
-            print("\n[Compressing older turns to short-term memory...]")
-            short_term_summary = summarize_short_term(conversation)
-            conversation = conversation[-(WINDOW_TURNS * 2):]
+        if result.compressing:
+            mode = "in the background" if BACKGROUND_COMPRESSION else "before replying"
+            print(f"\n[Compressing older turns to short-term memory {mode}...]")
 
-        # Build messages with both memory types
-        messages = build_messages(
-            long_term_memory,
-            short_term_summary,
-            conversation,
-            user_input
-        )
-
-        start = time.time()
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=messages,
-            temperature=0.7,
-        )
-        elapsed = time.time() - start
-
-        reply = response.choices[0].message.content
-        usage = response.usage
-
-        # Update conversation history
-        conversation.append({"role": "user", "content": user_input})
-        conversation.append({"role": "assistant", "content": reply})
-
-        print(f"\nAssistant ({elapsed:.2f}s):")
-        print(reply)
+        print(f"\nAssistant ({result.elapsed:.2f}s):")
+        print(result.reply)
         print()
-        print(f"[Turn {turn_number} | Tokens: {usage.prompt_tokens} in, {usage.completion_tokens} out]")
+        print(
+            f"[Turn {session.turn_number} | Tokens: {result.prompt_tokens} in ({result.cached_tokens} cached), "
+            f"{result.completion_tokens} out | Cache hit ratio: {session.cache_hit_ratio:.0%}]"
+        )
         print()
 
     # Save long-term memory on exit
-    if conversation:
+    if session.conversation:
         print("\n[Extracting long-term memories from this conversation...]")
-        updated_memory = extract_long_term_facts(conversation, long_term_memory)
-        save_user_memory(user_id, updated_memory)
-
+    updated_memory = await end_session(session)
+    if updated_memory is not None:
         print(f"[Saved long-term memory for '{user_id}']")
         if updated_memory.get("facts"):
             print(f"  Facts: {updated_memory['facts']}")
         if updated_memory.get("preferences"):
             print(f"  Preferences: {updated_memory['preferences']}")
 
+    store = get_memory_store()
+    stats = store.stats()
+    store.close()  # Flushes any pending write-behind saves
+    print(f"[Memory cache: {stats['hits']} hits, {stats['misses']} misses]")
     print("\n[Goodbye! Your memories are saved for next time.]")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
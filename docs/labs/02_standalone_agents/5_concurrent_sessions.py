@@ -0,0 +1,117 @@
+"""
+Concurrent Sessions - One process, many conversations
+
+The agents in this folder are coroutines sharing ONE pooled AsyncOpenAI
+client (see async_runtime.py). While one conversation waits on the network,
+the others keep going - so a single process can serve hundreds of users.
+
+This script simulates N users chatting with one of the agents at the same
+time and reports throughput and latency percentiles.
+
+Run: uv run python docs/labs/02_standalone_agents/5_concurrent_sessions.py --agent memory --sessions 100
+
+Options:
+- --agent: stateless | stateful | memory | long_term
+- --sessions: how many simulated users
+- --turns: messages per user
+"""
+import argparse
+import asyncio
+import importlib
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+# The agent scripts start with a digit, so we load them by name
+AGENTS = {
+    "stateless": "1_stateless_agent",
+    "stateful": "2_stateful_agent",
+    "memory": "3_agent_with_memory",
+    "long_term": "4_agent_with_long_term_memory",
+}
+
+SCRIPT = [
+    "Hi! My name is {name} and I'm taking the AI Design course.",
+    "I'm building a voice assistant for my course project.",
+    "What are three ways to keep LLM API costs down?",
+    "Which of those would you start with, and why?",
+    "Can you turn that into a short checklist?",
+    "Remind me - what's my name and what am I building?",
+]
+
+
+async def simulate_user(agent, kind: str, user_number: int, turns: int) -> List[float]:
+    """Play one scripted conversation. Returns per-turn latencies (seconds)."""
+    name = f"User{user_number}"
+    messages = [SCRIPT[i % len(SCRIPT)].format(name=name) for i in range(turns)]
+    latencies = []
+
+    if kind == "long_term":
+        session = await agent.start_session(f"sim-{name}")
+    elif kind == "memory":
+        session = agent.MemorySession()
+    else:
+        session = []  # stateful: the conversation list IS the state
+
+    for message in messages:
+        start = time.time()
+        if kind == "stateless":
+            await agent.respond(message)
+        else:
+            await agent.run_turn(session, message)
+        latencies.append(time.time() - start)
+
+    if kind == "long_term":
+        await agent.end_session(session)
+    elif kind == "memory":
+        await session.summarizer.shutdown()
+
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--agent", choices=AGENTS, default="memory")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=4)
+    args = parser.parse_args()
+
+    agent = importlib.import_module(AGENTS[args.agent])
+    if args.agent == "long_term":
+        # Keep simulated users out of the real memory store
+        agent.MEMORY_DB = Path(tempfile.mkdtemp()) / "simulated_memories.db"
+        agent.MEMORY_FILE = agent.MEMORY_DB.with_suffix(".json")
+        agent.VECTOR_DIR = agent.MEMORY_DB.parent / "simulated_vectors"
+
+    print("=" * 60)
+    print("CONCURRENT SESSIONS")
+    print(f"Agent: {args.agent} | Sessions: {args.sessions} | Turns each: {args.turns}")
+    print("=" * 60)
+
+    start = time.time()
+    results = await asyncio.gather(*[
+        simulate_user(agent, args.agent, i, args.turns)
+        for i in range(args.sessions)
+    ])
+    wall = time.time() - start
+
+    latencies = sorted(latency for user in results for latency in user)
+    if len(latencies) >= 2:
+        p50, p95, p99 = (statistics.quantiles(latencies, n=100)[q - 1] for q in (50, 95, 99))
+    else:  # quantiles() needs two points; a single turn is every percentile
+        p50 = p95 = p99 = latencies[0] if latencies else 0.0
+
+    print(f"\nTurns served: {len(latencies)} in {wall:.2f}s")
+    print(f"Throughput:   {len(latencies) / wall:.1f} turns/s")
+    print(f"Latency:      p50 {p50:.2f}s | p95 {p95:.2f}s | p99 {p99:.2f}s")
+    print(f"Sequential would take ~{sum(latencies):.1f}s")
+
+    if args.agent == "long_term":
+        agent.get_memory_store().close()
+    await agent.client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
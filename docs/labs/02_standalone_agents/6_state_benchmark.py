@@ -0,0 +1,120 @@
+"""
+State Benchmark - Full history vs. server-side state
+
+Plays the same scripted conversation through 2_stateful_agent.py twice:
+1. history: Chat Completions, the FULL conversation uploaded every turn
+2. server:  Responses API, only the new message + previous_response_id
+
+and compares, turn by turn, what each costs:
+- bytes uploaded (request bodies, measured on the HTTP client)
+- latency
+- billed input tokens (and how many of them were cached)
+
+Expect the upload to stay flat in server mode while it grows in history
+mode. Billed input tokens grow in BOTH: the model still reads the whole
+conversation - the server just already has it.
+
+Run: uv run python docs/labs/02_standalone_agents/6_state_benchmark.py --turns 12
+"""
+import argparse
+import asyncio
+import importlib
+import time
+from dataclasses import dataclass
+from typing import List
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+load_dotenv()
+
+agent = importlib.import_module("2_stateful_agent")
+SCRIPT = importlib.import_module("5_concurrent_sessions").SCRIPT
+
+MODES = ("history", "server")
+
+
+class UploadCounter:
+    """httpx request hook that adds up the bytes of every request body."""
+
+    def __init__(self):
+        self.bytes = 0
+
+    async def __call__(self, request) -> None:
+        self.bytes += len(request.content)
+
+
+@dataclass
+class TurnStats:
+    uploaded: int  # Request body bytes
+    latency: float
+    input_tokens: int
+    cached_tokens: int
+    output_tokens: int
+
+
+def measured_client(counter: UploadCounter) -> AsyncOpenAI:
+    return AsyncOpenAI(http_client=DefaultAsyncHttpxClient(event_hooks={"request": [counter]}))
+
+
+async def run_conversation(mode: str, messages: List[str], counter: UploadCounter) -> List[TurnStats]:
+    """One conversation through the agent in the given mode, measured turn by turn."""
+    conversation = agent.ServerConversation() if mode == "server" else []
+    stats = []
+    for message in messages:
+        uploaded_before, start = counter.bytes, time.time()
+        if mode == "server":
+            response = await agent.run_chained_turn(conversation, message)
+            usage = response.usage
+            input_tokens, output_tokens = usage.input_tokens, usage.output_tokens
+            details = usage.input_tokens_details
+        else:
+            response = await agent.run_turn(conversation, message)
+            usage = response.usage
+            input_tokens, output_tokens = usage.prompt_tokens, usage.completion_tokens
+            details = usage.prompt_tokens_details
+        stats.append(TurnStats(
+            uploaded=counter.bytes - uploaded_before,
+            latency=time.time() - start,
+            input_tokens=input_tokens,
+            cached_tokens=(details.cached_tokens or 0) if details else 0,
+            output_tokens=output_tokens,
+        ))
+    return stats
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Full history vs. server-side conversation state")
+    parser.add_argument("--turns", type=int, default=12)
+    args = parser.parse_args()
+
+    messages = [SCRIPT[i % len(SCRIPT)].format(name="Ada") for i in range(args.turns)]
+    counter = UploadCounter()
+    agent.client = measured_client(counter)
+
+    results = {}
+    for mode in MODES:
+        print(f"⏳ Running {args.turns} turns in {mode} mode...")
+        results[mode] = await run_conversation(mode, messages, counter)
+    await agent.client.close()
+
+    print()
+    print(f"{'':6}| {'HISTORY (chat completions)':^32} | {'SERVER STATE (previous_response_id)':^38}")
+    print(f"{'Turn':6}| {'sent':>9} {'input tok':>10} {'latency':>9} | "
+          f"{'sent':>9} {'input tok':>10} {'cached':>8} {'latency':>7}")
+    print("-" * 84)
+    for turn, (h, s) in enumerate(zip(results["history"], results["server"]), start=1):
+        print(f"{turn:<6}| {h.uploaded:>8,}B {h.input_tokens:>10,} {h.latency:>8.2f}s | "
+              f"{s.uploaded:>8,}B {s.input_tokens:>10,} {s.cached_tokens:>8,} {s.latency:>6.2f}s")
+    print("-" * 84)
+
+    for mode in MODES:
+        turns = results[mode]
+        print(f"📊 {mode:8} uploaded {sum(t.uploaded for t in turns):>9,} bytes | "
+              f"billed input {sum(t.input_tokens for t in turns):>7,} tokens "
+              f"({sum(t.cached_tokens for t in turns):,} cached) | "
+              f"total latency {sum(t.latency for t in turns):.2f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
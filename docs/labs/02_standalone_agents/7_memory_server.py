@@ -0,0 +1,342 @@
+"""
+Memory Agent Server - Many users, one process, memory that survives crashes
+
+4_agent_with_long_term_memory.py talks to ONE user through input() and
+saves what it learned only on exit: a crash (or a closed laptop lid) loses
+the whole session. This server hosts the same agent for many users at once
+over HTTP:
+
+- One LongTermSession per user, created on their first message: each user
+  has their own short-term window; the long-term memory store is shared
+- Per-user locking: a user's messages are answered one at a time, in order
+  (different users never wait on each other)
+- Idle eviction: sessions quiet for IDLE_TIMEOUT seconds are ended - their
+  long-term memory saved - and dropped, so memory use tracks ACTIVE users
+- Periodic checkpoints: every CHECKPOINT_INTERVAL seconds, every session
+  with new turns saves its long-term memory (agent.checkpoint) and the
+  memory cache is flushed to disk - a crash loses at most one interval
+
+Standard library only (asyncio streams): no web framework to install.
+
+Run: uv run python docs/labs/02_standalone_agents/7_memory_server.py --port 8000
+
+    curl -s localhost:8000/chat -d '{"user_id": "ada", "message": "Hi, I am Ada"}'
+    curl -s localhost:8000/end -d '{"user_id": "ada"}'     # Save now and close the session
+    curl -s localhost:8000/stats
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import time
+import traceback
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+agent = importlib.import_module("4_agent_with_long_term_memory")
+
+IDLE_TIMEOUT = 15 * 60  # Seconds without a message before a session is ended
+CHECKPOINT_INTERVAL = 60  # Seconds between long-term memory checkpoints
+MAX_BODY_BYTES = 64 * 1024  # Largest request body accepted
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class UserSlot:
+    """One user's session and the lock that serializes everything done to it."""
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    session: Optional["agent.LongTermSession"] = None
+    last_active: float = field(default_factory=time.monotonic)
+    closed: bool = False  # Ended and removed: whoever waited on the lock must start over
+    saving: Optional[Tuple[int, asyncio.Task]] = None  # In-flight checkpoint: (turns it covers, task)
+
+
+class MemoryAgentServer:
+    """Routes users to their own LongTermSession, checkpointing and evicting in the background."""
+
+    def __init__(self, idle_timeout: float = IDLE_TIMEOUT, checkpoint_interval: float = CHECKPOINT_INTERVAL):
+        self.idle_timeout = idle_timeout
+        self.checkpoint_interval = checkpoint_interval
+        self.slots: Dict[str, UserSlot] = {}
+        self.turns_served = 0
+        self.checkpoints = 0
+        self.evictions = 0
+
+    @asynccontextmanager
+    async def _user(self, user_id: str) -> AsyncIterator[UserSlot]:
+        """Hold the user's lock; their session stays put until we let go."""
+        key = user_id.lower()
+        while True:
+            slot = self.slots.setdefault(key, UserSlot())
+            async with slot.lock:
+                if slot.closed:
+                    continue  # Evicted while we waited - a fresh slot is next
+                yield slot
+                return
+
+    async def _close(self, key: str, slot: UserSlot) -> Optional[Dict]:
+        """End the session (saving its memory) and drop the slot. Needs the slot's lock."""
+        slot.closed = True
+        if self.slots.get(key) is slot:
+            del self.slots[key]
+        if slot.session is None:
+            return None
+        if slot.saving is not None:
+            # Let the running checkpoint finish rather than extract the same turns twice
+            upto, task = slot.saving
+            try:
+                await task
+                slot.session.checkpointed_upto = max(slot.session.checkpointed_upto, upto)
+            except Exception:
+                pass  # end_session extracts those turns again
+        return await agent.end_session(slot.session)
+
+    # ----------------------------
+    # Endpoints
+    # ----------------------------
+    async def chat(self, user_id: str, message: str) -> Dict:
+        async with self._user(user_id) as slot:
+            if slot.session is None:
+                slot.session = await agent.start_session(user_id)
+            result = await agent.run_turn(slot.session, message)
+            slot.last_active = time.monotonic()
+            self.turns_served += 1
+            return {
+                "reply": result.reply,
+                "turn": slot.session.turn_number,
+                "prompt_tokens": result.prompt_tokens,
+                "cached_tokens": result.cached_tokens,
+                "completion_tokens": result.completion_tokens,
+                "elapsed": round(result.elapsed, 3),
+            }
+
+    async def end(self, user_id: str) -> Dict:
+        async with self._user(user_id) as slot:
+            saved = await self._close(user_id.lower(), slot)
+        return {"saved": saved}
+
+    def stats(self) -> Dict:
+        return {
+            "sessions": len(self.slots),
+            "turns_served": self.turns_served,
+            "checkpoints": self.checkpoints,
+            "evictions": self.evictions,
+            "memory_cache": agent.get_memory_store().stats(),
+        }
+
+    # ----------------------------
+    # Background maintenance
+    # ----------------------------
+    async def checkpoint_all(self) -> int:
+        """Save long-term memory for every session with new turns. Returns sessions saved."""
+
+        async def save(key: str) -> bool:
+            slot = self.slots.get(key)
+            if slot is None:
+                return False  # Ended since we listed it
+            # The lock is held only to snapshot the new turns and, later, to record them as
+            # saved: the LLM extraction in between mustn't hold up the user's next message
+            async with slot.lock:
+                session = slot.session
+                if slot.closed or slot.saving or session is None:
+                    return False
+                upto = len(session.conversation)
+                if upto == session.checkpointed_upto:
+                    return False
+                turns = session.conversation[session.checkpointed_upto:upto]
+                task = asyncio.create_task(agent.save_turns(session, turns))
+                slot.saving = (upto, task)
+            try:
+                await task
+            finally:
+                async with slot.lock:
+                    slot.saving = None
+                    if task.done() and not task.cancelled() and task.exception() is None:
+                        session.checkpointed_upto = max(session.checkpointed_upto, upto)
+            return True
+
+        keys = list(self.slots)
+        results = await asyncio.gather(*[save(key) for key in keys], return_exceptions=True)
+        saved = 0
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):  # One failed save mustn't cost the others theirs
+                print(f"⚠️  Checkpoint failed for {key}: {result!r}")
+            else:
+                saved += result
+        await asyncio.to_thread(agent.get_memory_store().flush)
+        self.checkpoints += saved
+        return saved
+
+    async def evict_idle(self) -> int:
+        """End sessions idle for longer than idle_timeout. Returns sessions evicted."""
+        now = time.monotonic()
+        idle = [key for key, slot in self.slots.items() if now - slot.last_active > self.idle_timeout]
+
+        async def evict(key: str) -> bool:
+            if key not in self.slots:
+                return False
+            async with self._user(key) as slot:
+                if time.monotonic() - slot.last_active <= self.idle_timeout:
+                    return False  # A message arrived while we waited for the lock
+                await self._close(key, slot)
+                return True
+
+        evicted = sum(await asyncio.gather(*[evict(key) for key in idle]))
+        self.evictions += evicted
+        return evicted
+
+    async def maintain(self) -> None:
+        """Checkpoint and evict forever (run as a background task)."""
+        interval = min(self.checkpoint_interval, self.idle_timeout)
+        last_checkpoint = time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.evict_idle()
+                if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    await self.checkpoint_all()
+                    last_checkpoint = time.monotonic()
+            except Exception as e:  # One failed save must not stop all future ones
+                print(f"⚠️  Maintenance failed: {e!r}")
+
+    async def shutdown(self) -> None:
+        """End every session, saving its memory, and flush the store."""
+        await asyncio.gather(*[self.end(key) for key in list(self.slots)])
+        await asyncio.to_thread(agent.get_memory_store().flush)
+
+    # ----------------------------
+    # HTTP
+    # ----------------------------
+    async def route(self, method: str, path: str, body: bytes) -> Dict:
+        if method == "GET" and path == "/stats":
+            return self.stats()
+        if method != "POST" or path not in ("/chat", "/end"):
+            raise HttpError(404, f"No route for {method} {path}")
+
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            raise HttpError(400, "Body must be JSON")
+        user_id = str(request.get("user_id") or "").strip() if isinstance(request, dict) else ""
+        if not user_id:
+            raise HttpError(400, "Missing user_id")
+
+        if path == "/end":
+            return await self.end(user_id)
+        message = str(request.get("message") or "").strip()
+        if not message:
+            raise HttpError(400, "Missing message")
+        return await self.chat(user_id, message)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """One HTTP/1.1 request per connection, JSON in and out."""
+        try:
+            status, payload = 200, None
+            try:
+                method, path, body = await read_request(reader)
+                payload = await self.route(method, path, body)
+            except HttpError as e:
+                status, payload = e.status, {"error": str(e)}
+            except Exception:
+                traceback.print_exc()  # Details stay in the server log, not in the response
+                status, payload = 500, {"error": "Internal server error"}
+            writer.write(http_response(status, payload))
+            await writer.drain()
+        except ConnectionError:
+            pass  # Client went away
+        finally:
+            writer.close()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+        raise HttpError(400, "Malformed request")
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    parts = request_line.split(" ")
+    if len(parts) != 3:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise HttpError(400, "Malformed request")
+    if length < 0:
+        raise HttpError(400, "Malformed request")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, "Request body too large")
+    try:
+        body = await reader.readexactly(length) if length else b""
+    except asyncio.IncompleteReadError:  # Shorter than its Content-Length
+        raise HttpError(400, "Malformed request")
+    return parts[0], parts[1].split("?")[0], body
+
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+def http_response(status: int, payload: Dict) -> bytes:
+    body = json.dumps(payload).encode()
+    head = (
+        f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Multi-user HTTP server for the long-term memory agent")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT)
+    parser.add_argument("--checkpoint-interval", type=float, default=CHECKPOINT_INTERVAL)
+    args = parser.parse_args()
+
+    server = MemoryAgentServer(args.idle_timeout, args.checkpoint_interval)
+    http = await asyncio.start_server(server.handle, args.host, args.port)
+    maintenance = asyncio.create_task(server.maintain())
+
+    print("=" * 60)
+    print("MEMORY AGENT SERVER")
+    print(f"Listening on http://{args.host}:{args.port} | Memory mode: {agent.MEMORY_MODE}")
+    print(f"Idle timeout: {args.idle_timeout:.0f}s | Checkpoint every {args.checkpoint_interval:.0f}s")
+    print("Ctrl+C to stop (open sessions are saved)")
+    print("=" * 60)
+
+    try:
+        async with http:
+            await http.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        maintenance.cancel()
+        print("\n⏳ Saving open sessions...")
+        await server.shutdown()
+        print(f"✅ Saved. {server.turns_served} turns served, {server.checkpoints} checkpoints, "
+              f"{server.evictions} idle sessions evicted")
+        agent.get_memory_store().close()
+        await agent.client.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
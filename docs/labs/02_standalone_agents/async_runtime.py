@@ -0,0 +1,55 @@
+"""
+Async Agent Runtime
+
+A synchronous OpenAI() client plus a blocking input() loop means one process
+serves one user: while we wait on the network, nothing else happens.
+
+This module provides the pieces the agents in this folder share to run as
+coroutines instead:
+- ONE AsyncOpenAI client per process, backed by a pooled HTTP client with
+  keep-alive, so hundreds of conversations reuse a handful of connections
+- ainput(): input() that doesn't block the event loop
+
+See 5_concurrent_sessions.py for many conversations served by one process.
+"""
+
+import asyncio
+import os
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# Connection pool (override with environment variables)
+MAX_CONNECTIONS = int(os.getenv("AGENT_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("AGENT_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("AGENT_KEEPALIVE_EXPIRY", "30"))  # seconds
+
+_client: Optional[AsyncOpenAI] = None
+
+
+def create_async_client(
+    max_connections: int = MAX_CONNECTIONS,
+    max_keepalive_connections: int = MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = KEEPALIVE_EXPIRY,
+) -> AsyncOpenAI:
+    """Build an AsyncOpenAI client with an explicitly sized connection pool."""
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return AsyncOpenAI(http_client=DefaultAsyncHttpxClient(limits=limits))
+
+
+def get_client() -> AsyncOpenAI:
+    """The process-wide shared client (created on first use)."""
+    global _client
+    if _client is None:
+        _client = create_async_client()
+    return _client
+
+
+async def ainput(prompt: str = "") -> str:
+    """input() on a worker thread, so other sessions keep running while we wait."""
+    return await asyncio.to_thread(input, prompt)
@@ -0,0 +1,78 @@
+"""
+Background Memory Compression
+
+Summarizing old turns costs a full extra LLM round-trip. Done inline, the
+user waits for it before their own reply is even requested.
+
+BackgroundSummarizer runs that call as a separate asyncio task instead:
+- The current turn uses the last COMPLETED summary, plus the not-yet-summarized
+  turns verbatim (a slightly larger window for a turn or two).
+- When the new summary is ready, the agent swaps it in at the start of the
+  next turn via poll().
+
+Used by 3_agent_with_memory.py and 4_agent_with_long_term_memory.py.
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class BackgroundSummarizer:
+    """Run one summarization at a time as a background task."""
+
+    def __init__(self, summarize: Callable[[List[Dict], str], Awaitable[str]]):
+        self._summarize = summarize
+        self._task: Optional[asyncio.Task] = None
+        self._upto = 0
+
+    @property
+    def busy(self) -> bool:
+        """True while a summary is being computed."""
+        return self._task is not None and not self._task.done()
+
+    def submit(self, turns: List[Dict], existing_summary: str, upto: int) -> bool:
+        """
+        Start folding `turns` into `existing_summary` in the background.
+
+        `upto` is the caller's marker for how far the new summary reaches;
+        it is handed back with the summary. Returns False (and does nothing)
+        if a summary is already in flight or waiting to be collected.
+        """
+        if self._task is not None:
+            return False
+        self._upto = upto
+        self._task = asyncio.create_task(self._summarize(turns, existing_summary))
+        return True
+
+    def poll(self) -> Optional[Tuple[str, int]]:
+        """
+        Return (summary, upto) if a background summary finished, else None.
+
+        A failed summary is logged and dropped (None): its turns stay verbatim
+        and are submitted again, instead of failing the unrelated turn that polls.
+        """
+        if self._task is None or not self._task.done():
+            return None
+        task, self._task = self._task, None
+        try:
+            return task.result(), self._upto
+        except Exception as e:
+            print(f"⚠️  Background summary failed: {e!r}")
+            return None
+
+    async def wait(self) -> Optional[Tuple[str, int]]:
+        """Wait for the in-flight summary (if any) to finish and return it."""
+        if self._task is None:
+            return None
+        task, self._task = self._task, None
+        return await task, self._upto
+
+    async def shutdown(self) -> None:
+        """Drop any in-flight summary (the session is ending)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
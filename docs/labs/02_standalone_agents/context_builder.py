@@ -0,0 +1,146 @@
+"""
+Token-Budget Context Builder
+
+Budgeting by turn count ("keep the last 6 turns") or by characters
+("[:500]") makes prompt size unpredictable: one long paste blows the budget.
+
+This module budgets in TOKENS instead:
+- TokenCounter counts tokens locally (tiktoken) and caches the count per text,
+  so re-packing the same history every turn costs almost nothing.
+- pack_context() assembles system prompt + memory + the newest turns so the
+  whole request stays under a hard token ceiling.
+
+Providers cache prompt PREFIXES: if a request starts exactly like a recent
+one, that part is cheaper and faster (OpenAI reports it as
+usage.prompt_tokens_details.cached_tokens). Memory that changes every few
+turns at the top of the system prompt invalidates everything after it.
+Pass it as `memory` instead and it goes right before the new message, so
+the instructions and the history in front of it stay cacheable.
+
+tiktoken is optional: `uv pip install tiktoken` for exact counts. Without it
+every UTF-8 byte counts as a token. A BPE token never covers less than one
+byte, so that's an upper bound for any text - CJK and emoji included - and
+the ceiling still holds. English gets ~4x less context than it could, though:
+install tiktoken.
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Chat format overhead: each message costs a few tokens beyond its content,
+# and the reply is primed with a few more (see OpenAI's token counting guide)
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+
+class _ByteEncoding:
+    """Fallback 'tokenizer': every UTF-8 byte counts as one token (never an undercount)."""
+
+    def encode(self, text: str) -> List[bytes]:
+        data = text.encode("utf-8")
+        return [data[i:i + 1] for i in range(len(data))]
+
+    def decode(self, tokens: List[bytes]) -> str:
+        return b"".join(tokens).decode("utf-8", errors="ignore")  # A character cut in half is dropped
+
+
+def _load_encoding(model: str):
+    if tiktoken is None:
+        return _ByteEncoding()
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")  # Encoding of the GPT-4o/4.1 family
+
+
+class TokenCounter:
+    """Count and truncate text in tokens, caching counts per distinct text."""
+
+    def __init__(self, model: str, cache_size: int = 4096):
+        self.encoding = _load_encoding(model)
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        return len(self.encoding.encode(text))
+
+    def count_message(self, message: Dict) -> int:
+        """Tokens a chat message costs, including per-message overhead."""
+        return MESSAGE_OVERHEAD_TOKENS + self.count(message["content"])
+
+    def count_messages(self, messages: List[Dict]) -> int:
+        """Tokens a whole request costs."""
+        return REPLY_PRIMING_TOKENS + sum(self.count_message(m) for m in messages)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cut text to at most max_tokens tokens."""
+        if self.count(text) <= max_tokens:
+            return text
+        return self.encoding.decode(self.encoding.encode(text)[:max(0, max_tokens)])
+
+
+def cached_tokens(usage) -> int:
+    """Prompt tokens the provider served from its prefix cache (0 if not reported)."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (getattr(details, "cached_tokens", None) or 0) if details else 0
+
+
+def pack_context(
+    counter: TokenCounter,
+    system_content: str,
+    history: List[Dict],
+    user_input: str,
+    budget: int,
+    memory: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Build [system, ...newest history..., user] within `budget` tokens.
+
+    The system prompt (instructions + memory) and the new user message always
+    go in, truncated if they alone exceed the budget. History is then added
+    newest first, whole messages only, until the next one would not fit.
+
+    With `memory`, the layout is cache-friendly: [system, ...history...,
+    memory, user], where memory is a second system message that can change
+    without invalidating the cached prefix in front of it.
+    """
+    fixed = REPLY_PRIMING_TOKENS + 2 * MESSAGE_OVERHEAD_TOKENS
+    if memory is not None:
+        fixed += MESSAGE_OVERHEAD_TOKENS
+    system_tokens = counter.count(system_content)
+
+    # A single huge paste is cut down rather than blowing the budget
+    user_budget = max(0, budget - fixed - system_tokens)
+    user_input = counter.truncate(user_input, user_budget)
+    system_content = counter.truncate(system_content, budget - fixed - counter.count(user_input))
+    if memory is not None:
+        memory = counter.truncate(
+            memory, budget - fixed - counter.count(system_content) - counter.count(user_input)
+        )
+
+    remaining = budget - fixed - counter.count(system_content) - counter.count(user_input)
+    if memory is not None:
+        remaining -= counter.count(memory)
+
+    kept: List[Dict] = []
+    for message in reversed(history):
+        cost = counter.count_message(message)
+        if cost > remaining:
+            break
+        kept.append(message)
+        remaining -= cost
+
+    # Don't start the window halfway through a turn
+    while kept and kept[-1]["role"] != "user":
+        kept.pop()
+
+    messages = [{"role": "system", "content": system_content}]
+    messages.extend(reversed(kept))
+    if memory is not None:
+        messages.append({"role": "system", "content": memory})
+    messages.append({"role": "user", "content": user_input})
+    return messages
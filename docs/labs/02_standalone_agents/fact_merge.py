@@ -0,0 +1,192 @@
+"""
+Local Merge of Long-Term Memories
+
+Asking the LLM to "merge with existing memory, removing duplicates" means
+sending every stored fact on every save, paying for the round-trip, and
+trusting it not to drop anything. Deduplication doesn't need a model:
+
+1. NORMALIZE - case, punctuation and spacing don't make two facts different
+   ("Works at UniTN." == "works at unitn"): exact duplicates by hash.
+2. SHINGLE - a fact becomes its set of character 4-grams. Two phrasings of
+   the same fact share most of them (Jaccard similarity).
+3. MINHASH + LSH - each shingle set is summarized by NUM_PERM min-hashes,
+   split into bands. Facts that agree on a whole band land in the same
+   bucket, so near-duplicate candidates are found without comparing every
+   pair - thousands of facts stay fast.
+4. VERIFY - candidates are confirmed with the exact Jaccard similarity, so
+   the result never depends on hash luck. Facts mentioning different numbers
+   ("Has 2 kids" vs "Has 3 kids") or of opposite polarity ("Likes Python" vs
+   "Dislikes Python", "Is allergic" vs "Is not allergic") are never
+   duplicates, however similar.
+
+A near-duplicate keeps the more detailed (longer) phrasing, in the older
+one's position. Same input, same output: the merge is deterministic.
+Contradictions ("Lives in Rome" vs "Lives in Milan") are NOT duplicates -
+both are kept. Stored facts are never merged with each other, only with
+new candidates.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+SHINGLE_SIZE = 4  # Characters per shingle
+NUM_PERM = 64  # Min-hashes per fact
+BANDS = 16  # LSH bands (NUM_PERM / BANDS rows each): more bands = more candidates
+THRESHOLD = 0.6  # Jaccard similarity at which two facts count as the same
+
+# Words whose presence on one side only flips a fact's meaning ("don't" normalizes to "don t")
+NEGATIONS = {"not", "no", "never", "nor", "none", "nothing", "nobody", "neither", "cannot", "without", "t"}
+NEGATING_PREFIXES = ("dis", "un", "non", "in", "im", "ir", "il")
+
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_rng = np.random.default_rng(20240601)  # Fixed: signatures are stable across runs
+_A = _rng.integers(1, 2**32, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def numbers(text: str) -> FrozenSet[str]:
+    return frozenset(re.findall(r"\d+", text))
+
+
+def opposite_polarity(a: Set[str], b: Set[str]) -> bool:
+    """Do two facts' word sets differ by a negation ("not", "n't") or a negated word ("dislikes" vs "likes")?"""
+    only_a, only_b = a - b, b - a
+    if (only_a | only_b) & NEGATIONS:
+        return True
+    for words, others in ((only_a, only_b), (only_b, only_a)):
+        for word in words:
+            if any(word.startswith(prefix) and word[len(prefix):] in others for prefix in NEGATING_PREFIXES):
+                return True
+    return False
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def minhash(shingle_set: Iterable[str]) -> np.ndarray:
+    """NUM_PERM min-hashes: (a·x + b) mod p over 32-bit shingle hashes, minimized per permutation."""
+    x = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little") for s in shingle_set],
+        dtype=np.uint64,
+    )
+    hashed = ((_A[:, None] * x[None, :]) % _PRIME + _B[:, None]) % _PRIME  # NUM_PERM × shingles
+    return hashed.min(axis=1)
+
+
+@dataclass
+class MergeStats:
+    added: int = 0
+    duplicates: int = 0  # Dropped: the stored phrasing already said it
+    replaced: int = 0  # A more detailed phrasing took the stored one's place
+
+
+class FactIndex:
+    """An ordered list of facts with exact (hash) and near-duplicate (MinHash LSH) lookup."""
+
+    def __init__(self, facts: Iterable[str] = (), threshold: float = THRESHOLD, bands: int = BANDS):
+        self.threshold = threshold
+        self.bands = bands
+        self.facts: List[str] = []
+        self._shingles: List[Set[str]] = []
+        self._numbers: List[FrozenSet[str]] = []
+        self._words: List[Set[str]] = []
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = defaultdict(list)
+        for fact in facts:
+            self._append(fact.strip())
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = len(signature) // self.bands
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def find(self, text: str) -> Optional[int]:
+        """Position of the stored fact this one duplicates, or None."""
+        exact = self._exact.get(normalize(text))
+        if exact is not None:
+            return exact
+        candidate_shingles, candidate_numbers = shingles(text), numbers(text)
+        candidate_words = set(normalize(text).split())
+        keys = self._band_keys(minhash(candidate_shingles))
+        candidates = sorted({i for key in keys for i in self._buckets.get(key, [])})
+        best, best_similarity = None, self.threshold
+        for i in candidates:
+            if self._numbers[i] != candidate_numbers or opposite_polarity(self._words[i], candidate_words):
+                continue
+            similarity = jaccard(candidate_shingles, self._shingles[i])
+            if similarity >= best_similarity:
+                best, best_similarity = i, similarity
+        return best
+
+    def _index(self, position: int) -> None:
+        fact = self.facts[position]
+        self._shingles[position] = shingles(fact)
+        self._numbers[position] = numbers(fact)
+        self._words[position] = set(normalize(fact).split())
+        self._exact[normalize(fact)] = position
+        for key in self._band_keys(minhash(self._shingles[position])):
+            self._buckets[key].append(position)
+
+    def _append(self, text: str) -> None:
+        self.facts.append(text)
+        self._shingles.append(set())
+        self._numbers.append(frozenset())
+        self._words.append(set())
+        self._index(len(self.facts) - 1)
+
+    def add(self, text: str) -> str:
+        """Add a fact. Returns "added", "duplicate" or "replaced"."""
+        text = text.strip()
+        position = self.find(text)
+        if position is None:
+            self._append(text)
+            return "added"
+        if len(normalize(text)) <= len(normalize(self.facts[position])):
+            return "duplicate"
+        # The old phrasing stays findable too: re-adding it is still a duplicate
+        self.facts[position] = text
+        self._index(position)
+        return "replaced"
+
+
+def merge_facts(existing: List[str], candidates: List[str], threshold: float = THRESHOLD) -> Tuple[List[str], MergeStats]:
+    """existing + candidates without duplicates, in order. Nothing in `existing` is lost."""
+    index = FactIndex(existing, threshold)
+    stats = MergeStats()
+    for candidate in candidates:
+        outcome = index.add(candidate)
+        if outcome == "added":
+            stats.added += 1
+        elif outcome == "replaced":
+            stats.replaced += 1
+        else:
+            stats.duplicates += 1
+    return index.facts, stats
+
+
+def merge_memory(existing: Dict, candidates: Dict, threshold: float = THRESHOLD) -> Tuple[Dict, MergeStats]:
+    """Merge every list in a memory dict ({"facts": [...], "preferences": [...]})."""
+    merged = dict(existing)
+    total = MergeStats()
+    for kind in sorted(set(existing) | set(candidates)):
+        merged[kind], stats = merge_facts(existing.get(kind, []), candidates.get(kind, []), threshold)
+        total.added += stats.added
+        total.duplicates += stats.duplicates
+        total.replaced += stats.replaced
+    return merged, total
@@ -0,0 +1,349 @@
+"""
+Long-Term Memory Stores
+
+Pluggable backends for the per-user memory of 4_agent_with_long_term_memory.py.
+
+- JsonFileMemoryStore: the original single JSON file. Every save re-reads and
+  rewrites ALL users, so one save costs O(total users) and two sessions saving
+  at the same time overwrite each other.
+- SqliteMemoryStore: one row per user (primary-key index). Reads and writes
+  touch only that user's row, and SQLite's file locking makes concurrent
+  writers (threads or processes) safe.
+- CachedMemoryStore: an in-process LRU cache in front of either backend, so
+  hot users are served without touching disk and saves are batched.
+
+Migrate an existing JSON file:
+    uv run python docs/labs/02_standalone_agents/memory_store.py user_memories.json user_memories.db
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+
+class MemoryStore(ABC):
+    """Interface every long-term memory backend implements."""
+
+    @abstractmethod
+    def get(self, user_id: str) -> Optional[Dict]:
+        """Return the memory dict for a user, or None if unknown."""
+
+    def save(self, user_id: str, memory: Dict) -> None:
+        """Replace the memory dict for a user."""
+        self.save_many({user_id: memory})
+
+    @abstractmethod
+    def save_many(self, memories: Dict[str, Dict]) -> None:
+        """Replace the memory dicts for several users in one write."""
+
+    @abstractmethod
+    def update(self, user_id: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        """Atomically read a user's memory, apply fn, and write the result."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Number of users with stored memory."""
+
+    def close(self) -> None:
+        pass
+
+
+# ----------------------------
+# Original: one JSON file for everyone
+# ----------------------------
+class JsonFileMemoryStore(MemoryStore):
+    """All users in a single JSON file (the original lab behavior)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def _load_all(self) -> Dict:
+        if self.path.exists():
+            with open(self.path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_all(self, memories: Dict) -> None:
+        # Write to a temp file and swap it in, so a crash never leaves half a file
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(memories, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        return self._load_all().get(user_id)
+
+    def save_many(self, memories: Dict[str, Dict]) -> None:
+        with self._lock:
+            all_memories = self._load_all()
+            all_memories.update(memories)
+            self._save_all(all_memories)
+
+    def update(self, user_id: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        with self._lock:
+            all_memories = self._load_all()
+            all_memories[user_id] = fn(all_memories.get(user_id))
+            self._save_all(all_memories)
+            return all_memories[user_id]
+
+    def count(self) -> int:
+        return len(self._load_all())
+
+
+# ----------------------------
+# Indexed: one SQLite row per user
+# ----------------------------
+_UPSERT_SQL = """INSERT INTO memories (user_id, data, updated_at) VALUES (?, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at"""
+
+
+class SqliteMemoryStore(MemoryStore):
+    """
+    One row per user in a SQLite database.
+
+    WAL journaling lets readers run while a writer commits, and writes use
+    BEGIN IMMEDIATE so concurrent writers queue up (busy timeout) instead of
+    losing each other's updates.
+    """
+
+    def __init__(self, path: Path, timeout: float = 30.0):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path,
+            timeout=timeout,
+            isolation_level=None,  # We manage transactions explicitly
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS memories (
+                user_id    TEXT PRIMARY KEY,
+                data       TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM memories WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, memories: Dict[str, Dict]) -> None:
+        if not memories:
+            return
+        now = time.time()
+        rows = [(user_id, json.dumps(memory), now) for user_id, memory in memories.items()]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(_UPSERT_SQL, rows)
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def update(self, user_id: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        with self._lock:
+            # Take the write lock BEFORE reading, so no other process can
+            # slip a write in between our read and our write
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM memories WHERE user_id = ?", (user_id,)
+                ).fetchone()
+                memory = fn(json.loads(row[0]) if row else None)
+                self._conn.execute(_UPSERT_SQL, (user_id, json.dumps(memory), time.time()))
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return memory
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ----------------------------
+# Cache: LRU + write-behind in front of any store
+# ----------------------------
+class CachedMemoryStore(MemoryStore):
+    """
+    Bounded LRU cache of per-user memory dicts in front of a backing store.
+
+    - Reads: served from memory after the first load (no disk, no JSON parse).
+    - Writes: update the cache and mark the user dirty; dirty users are written
+      to the backing store in one batch every `flush_every` saves, on eviction,
+      on flush()/close(), and - by a timer thread - at most `flush_interval`
+      seconds after a save, even if no other write comes along.
+    - Unknown users are not cached, so a user another process creates is
+      seen on the next get().
+    - Eviction: least recently used users go first once the cached memories
+      exceed `max_bytes` (measured as their serialized JSON size).
+
+    Returned dicts are shared with the cache - treat them as read-only and
+    call save() with a new dict to change a user's memory.
+    """
+
+    def __init__(
+        self,
+        backing: MemoryStore,
+        max_bytes: int = 8 * 1024 * 1024,
+        flush_every: int = 32,
+        flush_interval: float = 5.0,
+    ):
+        self.backing = backing
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict], int]]" = OrderedDict()
+        self._bytes = 0
+        self._dirty: Dict[str, Dict] = {}
+        self._last_flush = time.monotonic()
+        self._timer: Optional[threading.Timer] = None  # Pending timed flush, while anything is dirty
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+
+    def _put(self, user_id: str, memory: Optional[Dict]) -> None:
+        size = len(json.dumps(memory)) if memory is not None else 0
+        if user_id in self._entries:
+            self._bytes -= self._entries[user_id][1]
+        self._entries[user_id] = (memory, size)
+        self._entries.move_to_end(user_id)
+        self._bytes += size
+
+        # Evict least recently used users; dirty ones are written out first
+        evicted = {}
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_id, (old_memory, old_size) = self._entries.popitem(last=False)
+            self._bytes -= old_size
+            self.evictions += 1
+            if old_id in self._dirty:
+                evicted[old_id] = self._dirty.pop(old_id)
+        if evicted:
+            self.backing.save_many(evicted)
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            if user_id in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(user_id)
+                return self._entries[user_id][0]
+
+            self.misses += 1
+            memory = self.backing.get(user_id)
+            if memory is not None:
+                self._put(user_id, memory)
+            return memory
+
+    def save_many(self, memories: Dict[str, Dict]) -> None:
+        with self._lock:
+            for user_id, memory in memories.items():
+                self._dirty[user_id] = memory
+                self._put(user_id, memory)
+
+            overdue = time.monotonic() - self._last_flush >= self.flush_interval
+            if len(self._dirty) >= self.flush_every or overdue:
+                self.flush()
+            elif self._dirty and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._timed_flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            self.flush()
+
+    def update(self, user_id: str, fn: Callable[[Optional[Dict]], Dict]) -> Dict:
+        with self._lock:
+            # Push our pending write first so the backing store sees it
+            if user_id in self._dirty:
+                self.backing.save_many({user_id: self._dirty.pop(user_id)})
+            memory = self.backing.update(user_id, fn)
+            self._put(user_id, memory)
+            return memory
+
+    def flush(self) -> int:
+        """Write all dirty users to the backing store in one batch. Returns users written."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            if dirty:
+                try:
+                    self.backing.save_many(dirty)
+                except Exception:
+                    self._dirty = dirty  # Still pending: retried by the next flush
+                    raise
+                self.flushes += 1
+            self._last_flush = time.monotonic()
+            return len(dirty)
+
+    def count(self) -> int:
+        self.flush()
+        return self.backing.count()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current cache occupancy."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "flushes": self.flushes,
+                "cached_users": len(self._entries),
+                "cached_bytes": self._bytes,
+                "dirty_users": len(self._dirty),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.flush()
+        self.backing.close()
+
+
+# ----------------------------
+# Migration
+# ----------------------------
+def migrate_json_to_sqlite(json_path: Path, store: MemoryStore) -> int:
+    """Copy every user from an old user_memories.json into a store. Returns user count."""
+    with open(json_path) as f:
+        memories = json.load(f)
+    store.save_many(memories)
+    return len(memories)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: memory_store.py <user_memories.json> <user_memories.db>")
+        sys.exit(1)
+
+    store = SqliteMemoryStore(Path(sys.argv[2]))
+    migrated = migrate_json_to_sqlite(Path(sys.argv[1]), store)
+    store.close()
+    print(f"✓ Migrated {migrated} users to {sys.argv[2]}")
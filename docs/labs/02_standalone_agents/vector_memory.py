@@ -0,0 +1,171 @@
+"""
+Retrieval Memory: a per-user vector index
+
+Putting EVERY remembered fact into every prompt caps how much an agent can
+remember: 10 facts are cheap, 5,000 are not. Retrieval memory instead:
+- embeds each fact ONCE, when it is saved
+- stores the vectors in a compact per-user index on disk
+- per turn, embeds only the user's message and injects the top-k most
+  similar facts - so the prompt stays the same size however much is stored
+
+Each user's index is two append-only files:
+    <user>.f32    float32 unit vectors, one row per memory (memory-mapped for search)
+    <user>.jsonl  the memory texts and kinds ("facts" / "preferences"), same order
+
+Appending never rewrites what's there. A crash between the two writes leaves
+an extra (possibly partial) vector, which is ignored on load and cut off by
+the next append. Every VectorIndex for the same files in this process shares
+one lock, and picks up rows appended by the others before it searches or
+writes.
+
+Search is one matrix-vector product over the memory-mapped rows: thousands of
+memories take well under a millisecond.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EMBEDDING_DIMENSIONS = 256  # text-embedding-3 models can return shortened vectors
+
+
+_file_locks: Dict[Path, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+
+def _lock_for(path: Path) -> threading.Lock:
+    with _file_locks_guard:
+        return _file_locks.setdefault(path.resolve(), threading.Lock())
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class VectorIndex:
+    """One user's memories: texts + unit-length embeddings, appended to disk."""
+
+    def __init__(self, directory: Path, user_id: str, dimensions: int = EMBEDDING_DIMENSIONS):
+        name = hashlib.sha256(user_id.lower().encode()).hexdigest()[:24]  # Safe file name for any id
+        self.vectors_path = Path(directory) / f"{name}.f32"
+        self.texts_path = Path(directory) / f"{name}.jsonl"
+        self.dimensions = dimensions
+        self._lock = _lock_for(self.texts_path)
+        self._vectors: Optional[np.ndarray] = None  # Memory-mapped, reopened after appends
+        self._offset = 0  # Bytes of the texts file read so far
+
+        self.texts: List[str] = []
+        self.kinds: List[str] = []
+        self._known = set()
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        """Read memories appended since we last looked (by us or another index). Needs the lock."""
+        if not self.texts_path.exists():
+            return
+        with open(self.texts_path, "rb") as f:
+            f.seek(self._offset)
+            new = f.read()
+        complete = new[:new.rfind(b"\n") + 1]  # Ignore a half-written last line
+        for line in complete.splitlines():
+            entry = json.loads(line)
+            self.texts.append(entry["text"])
+            self.kinds.append(entry["kind"])
+            self._known.add(_normalize_text(entry["text"]))
+        if complete:
+            self._offset += len(complete)
+            self._vectors = None
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __contains__(self, text: str) -> bool:
+        return _normalize_text(text) in self._known
+
+    def _matrix(self) -> np.ndarray:
+        if self._vectors is None:
+            if not self.texts:
+                return np.zeros((0, self.dimensions), dtype=np.float32)
+            # Exactly the rows with a text: a torn or stray row after them is never read
+            self._vectors = np.memmap(
+                self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.texts), self.dimensions)
+            )
+        return self._vectors
+
+    def add(self, texts: Sequence[str], kinds: Sequence[str], vectors: np.ndarray) -> int:
+        """Append memories (skipping texts already stored). Returns how many were added."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimensions)
+        with self._lock:
+            self._sync()
+            keep = []
+            for i, text in enumerate(texts):
+                key = _normalize_text(text)
+                if key not in self._known:
+                    self._known.add(key)
+                    keep.append(i)
+            if not keep:
+                return 0
+
+            rows = vectors[keep]
+            rows /= np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)
+            self.vectors_path.parent.mkdir(parents=True, exist_ok=True)
+            # Vectors first: texts never point past the end of the vector file
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(len(self.texts) * self.dimensions * 4)  # Drop vectors whose text never got written
+                f.write(rows.tobytes())
+            with open(self.texts_path, "a") as f:
+                for i in keep:
+                    f.write(json.dumps({"text": texts[i], "kind": kinds[i]}) + "\n")
+            self._sync()
+            return len(keep)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, str, float]]:
+        """The k memories most similar to the query vector: (text, kind, cosine similarity)."""
+        with self._lock:
+            self._sync()
+            matrix = self._matrix()
+            if len(matrix) == 0 or k <= 0:
+                return []
+            query = np.asarray(query, dtype=np.float32)
+            scores = matrix @ (query / max(float(np.linalg.norm(query)), 1e-12))
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.texts[i], self.kinds[i], float(scores[i])) for i in top]
+
+
+class VectorMemoryStore:
+    """Per-user VectorIndex files in one directory, with the most recently used kept open."""
+
+    def __init__(self, directory: Path, dimensions: int = EMBEDDING_DIMENSIONS, max_open: int = 256):
+        self.directory = Path(directory)
+        self.dimensions = dimensions
+        self.max_open = max_open
+        self._lock = threading.Lock()
+        self._open: "OrderedDict[str, VectorIndex]" = OrderedDict()
+
+    def index(self, user_id: str) -> VectorIndex:
+        key = user_id.lower()
+        with self._lock:
+            if key in self._open:
+                self._open.move_to_end(key)
+                return self._open[key]
+            index = VectorIndex(self.directory, key, self.dimensions)
+            self._open[key] = index
+            while len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+            return index
+
+
+def group_by_kind(hits: List[Tuple[str, str, float]]) -> Dict[str, List[str]]:
+    """Search hits as a memory dict: {"facts": [...], "preferences": [...]}."""
+    memory: Dict[str, List[str]] = {"facts": [], "preferences": []}
+    for text, kind, _ in hits:
+        memory.setdefault(kind, []).append(text)
+    return memory
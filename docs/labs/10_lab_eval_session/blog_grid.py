@@ -0,0 +1,147 @@
+"""
+Blogify Grid Runner
+
+Comparing guideline versions fairly means many generations:
+N articles × M guideline versions × K samples each (the samples show how
+much the SAME setup varies from run to run). One at a time, that's a long wait.
+
+run_grid() runs the whole grid concurrently with a bounded number of calls in
+flight, and appends every result to a JSONL store the moment it finishes.
+Combinations already in the store are skipped, so you can:
+- stop and resume at any time
+- add an article, a guideline version or more samples and only pay for the new cells
+- change your prompt (new prompt_id) and regenerate just what it affects
+
+Usage (in the notebook):
+    from blog_grid import run_grid, load_results, prompt_fingerprint
+
+    results = run_grid(
+        blogify,
+        articles={"article_1": article_1, "article_2": article_2},
+        guidelines={"v1": guidelines_v1, "v2": guidelines_v2},
+        samples=3,
+        prompt_id=prompt_fingerprint(SYSTEM_PROMPT, USER_PROMPT),
+    )
+"""
+
+import hashlib
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+
+STORE_PATH = Path(__file__).parent / "blog_grid.jsonl"
+MAX_CONCURRENT = 8  # Calls in flight; stay under your API rate limit
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:12]
+
+
+def prompt_fingerprint(*prompt_parts: str) -> str:
+    """A short id for a prompt design: change any part and it changes."""
+    return fingerprint("\x00".join(prompt_parts))
+
+
+Cell = Tuple[str, str, str, str, str, int]  # article, its hash, guidelines, their hash, prompt_id, sample
+
+
+def _key(record: Dict) -> Cell:
+    return (
+        record["article"],
+        record["article_hash"],
+        record["guidelines"],
+        record["guidelines_hash"],
+        record["prompt_id"],
+        record["sample"],
+    )
+
+
+def load_results(store_path: Path = STORE_PATH) -> List[Dict]:
+    """Successful results in the store (the latest one per grid cell)."""
+    results: Dict[Cell, Dict] = {}
+    if store_path.exists():
+        with open(store_path) as f:
+            for line in f:
+                record = json.loads(line)
+                if "blog" in record:
+                    results[_key(record)] = record
+    return list(results.values())
+
+
+def _cells(
+    articles: Dict[str, str], guidelines: Dict[str, str], samples: int, prompt_id: str
+) -> Iterator[Cell]:
+    for article_name, article in articles.items():
+        for guidelines_name, guideline_text in guidelines.items():
+            for sample in range(samples):
+                yield (
+                    article_name,
+                    fingerprint(article),
+                    guidelines_name,
+                    fingerprint(guideline_text),
+                    prompt_id,
+                    sample,
+                )
+
+
+def run_grid(
+    blogify: Callable[[str, str], str],
+    articles: Dict[str, str],
+    guidelines: Dict[str, str],
+    samples: int = 1,
+    prompt_id: str = "default",
+    store_path: Path = STORE_PATH,
+    max_concurrent: int = MAX_CONCURRENT,
+) -> List[Dict]:
+    """
+    Run blogify(article, guidelines) for every cell of the grid not yet in the store.
+
+    Cells are identified by (article, guidelines, prompt_id, sample) - with the
+    article and guideline TEXT hashed in, so editing either one reruns its cells.
+    Returns every stored result for this grid, old and new.
+    """
+    done: Set[Cell] = {_key(r) for r in load_results(store_path)}
+    todo = [cell for cell in _cells(articles, guidelines, samples, prompt_id) if cell not in done]
+    total = len(articles) * len(guidelines) * samples
+    print(f"📋 {total} cells: {total - len(todo)} already in the store, {len(todo)} to generate")
+
+    def generate(cell: Cell) -> Dict:
+        article_name, article_hash, guidelines_name, guidelines_hash, _, sample = cell
+        record = {
+            "article": article_name,
+            "article_hash": article_hash,
+            "guidelines": guidelines_name,
+            "guidelines_hash": guidelines_hash,
+            "prompt_id": prompt_id,
+            "sample": sample,
+        }
+        start = time.time()
+        try:
+            record["blog"] = blogify(articles[article_name], guidelines[guidelines_name])
+        except Exception as e:  # Recorded, not raised: the rest of the grid keeps going
+            record["error"] = f"{type(e).__name__}: {e}"
+        record["elapsed"] = round(time.time() - start, 2)
+        return record
+
+    def write(futures, out) -> None:
+        for future in futures:
+            record = future.result()
+            out.write(json.dumps(record) + "\n")
+            out.flush()  # Stored the moment it finishes: safe to interrupt
+            status = "✓" if "blog" in record else f"✗ {record['error']}"
+            print(f"  {status} {record['article']} × {record['guidelines']} #{record['sample']} ({record['elapsed']}s)")
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool, open(store_path, "a") as out:
+        pending = set()
+        for cell in todo:
+            if len(pending) >= max_concurrent:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write(finished, out)
+            pending.add(pool.submit(generate, cell))
+        write(wait(pending).done, out)
+
+    grid = set(_cells(articles, guidelines, samples, prompt_id))
+    return [r for r in load_results(store_path) if _key(r) in grid]
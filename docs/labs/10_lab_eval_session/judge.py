@@ -0,0 +1,244 @@
+"""
+LLM-as-Judge Engine
+
+Rating blogs by hand doesn't scale past a few dozen. An LLM judge applies
+YOUR rubric to thousands of outputs - noisily, like any rater, but fast.
+
+What this engine does to make that a minutes-long batch job:
+1. BATCHING - several (input, output) items go into one judge call when the
+   rubric scores each item on its own (absolute scores). Fewer calls, and the
+   rubric is sent once per batch instead of once per item.
+2. CONCURRENCY - batches run in parallel, with a bound on calls in flight.
+3. STRUCTURED SCORES - the judge answers in JSON; every score is checked
+   against the rubric's dimensions and scale. Items missing from a batch
+   answer are retried on their own.
+4. CACHING - judgments are stored by a hash of (judge, rubric, input, output).
+   Re-judging the same content costs nothing; change the rubric and it re-runs.
+
+The engine doesn't care which API you use: pass a `complete(system, user) -> str`
+function (see openai_complete, or wrap client.messages.create in the notebook).
+
+Usage:
+    rubric = Rubric("blog", {"accuracy": "Faithful to the source", "clarity": "..."})
+    engine = JudgeEngine(openai_complete(OpenAI()), judge_id="gpt-4.1-mini")
+    judgments = engine.judge([JudgeItem("blog_1", article_1, blog_1), ...], rubric)
+"""
+
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+CACHE_PATH = Path(__file__).parent / "judge_cache.jsonl"
+MAX_CONCURRENT = 8
+MAX_BATCH_ITEMS = 5  # Items per judge call (when the rubric allows batching)
+MAX_BATCH_CHARS = 40_000  # ...and roughly how much text, so long articles go in smaller batches
+
+Complete = Callable[[str, str], str]  # (system prompt, user prompt) → response text
+
+
+@dataclass(frozen=True)
+class Rubric:
+    name: str
+    dimensions: Dict[str, str]  # Dimension → what it measures (and what its levels mean)
+    scale: Tuple[int, int] = (1, 5)
+    instructions: str = ""
+    # Absolute per-item scores can share a call. A rubric that compares items,
+    # or where seeing other items would bias the score, should set this False.
+    batchable: bool = True
+
+    def fingerprint(self) -> str:
+        return _hash([self.name, self.dimensions, list(self.scale), self.instructions])
+
+
+@dataclass(frozen=True)
+class JudgeItem:
+    id: str
+    input: str  # What the system was given (e.g. the source article)
+    output: str  # What it produced (e.g. the blog post)
+
+
+@dataclass
+class Judgment:
+    item_id: str
+    scores: Dict[str, int] = field(default_factory=dict)
+    rationale: str = ""
+    cached: bool = False
+    error: Optional[str] = None
+
+    @property
+    def mean(self) -> Optional[float]:
+        return sum(self.scores.values()) / len(self.scores) if self.scores else None
+
+
+def _hash(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode()).hexdigest()
+
+
+def openai_complete(client, model: str = "gpt-4.1-mini") -> Complete:
+    """A `complete` function backed by OpenAI chat completions in JSON mode."""
+
+    def complete(system: str, user: str) -> str:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+            response_format={"type": "json_object"},
+            temperature=0,  # As deterministic as the judge gets
+        )
+        return response.choices[0].message.content
+
+    return complete
+
+
+# ----------------------------
+# Prompts + parsing
+# ----------------------------
+def system_prompt(rubric: Rubric) -> str:
+    low, high = rubric.scale
+    dimensions = "\n".join(f"- {name}: {description}" for name, description in rubric.dimensions.items())
+    example = {name: low for name in rubric.dimensions}
+    return f"""You are an expert evaluator. Score each item on every dimension of this rubric,
+using whole numbers from {low} (worst) to {high} (best).
+
+Rubric "{rubric.name}":
+{dimensions}
+{rubric.instructions}
+
+Judge each item INDEPENDENTLY - do not compare items with each other.
+Answer with JSON only, one entry per item, using the item ids given:
+{{"judgments": [{{"id": "<item id>", "scores": {json.dumps(example)}, "rationale": "<one sentence>"}}]}}"""
+
+
+def user_prompt(items: List[JudgeItem]) -> str:
+    blocks = [
+        f'<item id="{item.id}">\n<input>\n{item.input}\n</input>\n<output>\n{item.output}\n</output>\n</item>'
+        for item in items
+    ]
+    return "\n\n".join(blocks)
+
+
+def parse_judgments(text: str, items: List[JudgeItem], rubric: Rubric) -> Dict[str, Judgment]:
+    """Valid judgments by item id; anything malformed or out of range is left out."""
+    match = re.search(r"\{.*\}", text, re.DOTALL)  # Tolerate prose or code fences around the JSON
+    if not match:
+        return {}
+    try:
+        entries = json.loads(match.group()).get("judgments", [])
+    except (json.JSONDecodeError, AttributeError):
+        return {}
+
+    low, high = rubric.scale
+    wanted = {item.id for item in items}
+    judgments = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or entry.get("id") not in wanted:
+            continue
+        scores = entry.get("scores") or {}
+        try:
+            scores = {name: int(scores[name]) for name in rubric.dimensions}
+        except (KeyError, TypeError, ValueError):
+            continue
+        if all(low <= score <= high for score in scores.values()):
+            judgments[entry["id"]] = Judgment(entry["id"], scores, str(entry.get("rationale", "")))
+    return judgments
+
+
+# ----------------------------
+# Engine
+# ----------------------------
+class JudgeEngine:
+    """Concurrent, batched, cached rubric scoring."""
+
+    def __init__(
+        self,
+        complete: Complete,
+        judge_id: str = "judge",  # Part of the cache key: a different judge model re-judges
+        cache_path: Optional[Path] = CACHE_PATH,
+        max_concurrent: int = MAX_CONCURRENT,
+        max_batch_items: int = MAX_BATCH_ITEMS,
+        max_batch_chars: int = MAX_BATCH_CHARS,
+    ):
+        self.complete = complete
+        self.judge_id = judge_id
+        self.cache_path = cache_path
+        self.max_concurrent = max_concurrent
+        self.max_batch_items = max_batch_items
+        self.max_batch_chars = max_batch_chars
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+        self._cache: Dict[str, Dict] = {}
+        if cache_path is not None and cache_path.exists():
+            with open(cache_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self._cache[entry["key"]] = entry
+
+    def cache_key(self, item: JudgeItem, rubric: Rubric) -> str:
+        # Content, not item.id: the same blog under another name is still a cache hit
+        return _hash([self.judge_id, rubric.fingerprint(), item.input, item.output])
+
+    def batches(self, items: List[JudgeItem], rubric: Rubric) -> List[List[JudgeItem]]:
+        if not rubric.batchable:
+            return [[item] for item in items]
+        batches, current, chars = [], [], 0
+        for item in items:
+            size = len(item.input) + len(item.output)
+            if current and (len(current) >= self.max_batch_items or chars + size > self.max_batch_chars):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(item)
+            chars += size
+        if current:
+            batches.append(current)
+        return batches
+
+    def _judge_batch(self, batch: List[JudgeItem], rubric: Rubric) -> Dict[str, Judgment]:
+        with self._calls_lock:
+            self.calls += 1
+        try:
+            text = self.complete(system_prompt(rubric), user_prompt(batch))
+        except Exception as e:
+            return {item.id: Judgment(item.id, error=f"{type(e).__name__}: {e}") for item in batch}
+        judgments = parse_judgments(text, batch, rubric)
+
+        missing = [item for item in batch if item.id not in judgments]
+        if len(batch) > 1:
+            for item in missing:  # Retried alone: a smaller prompt is easier to get right
+                judgments.update(self._judge_batch([item], rubric))
+        else:
+            for item in missing:
+                judgments[item.id] = Judgment(item.id, error=f"Unparseable judgment: {text[:200]}")
+        return judgments
+
+    def judge(self, items: List[JudgeItem], rubric: Rubric) -> List[Judgment]:
+        """Judgments for `items` (unique ids), in order. Failed items carry `error` and are not cached."""
+        results: Dict[str, Judgment] = {}
+        todo = []
+        for item in items:
+            entry = self._cache.get(self.cache_key(item, rubric))
+            if entry is not None:
+                results[item.id] = Judgment(item.id, entry["scores"], entry["rationale"], cached=True)
+            else:
+                todo.append(item)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent) as pool:
+            for judgments in pool.map(lambda b: self._judge_batch(b, rubric), self.batches(todo, rubric)):
+                results.update(judgments)
+
+        self._store([item for item in todo if results[item.id].error is None], results, rubric)
+        return [results[item.id] for item in items]
+
+    def _store(self, items: List[JudgeItem], results: Dict[str, Judgment], rubric: Rubric) -> None:
+        entries = []
+        for item in items:
+            judgment = results[item.id]
+            entry = {"key": self.cache_key(item, rubric), "scores": judgment.scores, "rationale": judgment.rationale}
+            self._cache[entry["key"]] = entry
+            entries.append(entry)
+        if self.cache_path is not None and entries:
+            with open(self.cache_path, "a") as f:
+                f.writelines(json.dumps(entry) + "\n" for entry in entries)
@@ -0,0 +1,192 @@
+"""
+Self-Consistency Sampling
+
+Ask the same question K times and you get K answers (see test_exact_match_fails
+in Lesson 01). How MUCH they vary is the noise you're fighting in an eval.
+
+Measuring it naively costs K round-trips, each re-sending the whole prompt.
+With OpenAI's `n` parameter one request returns several completions: the
+prompt is sent - and billed - once. sample() asks for K samples in as few
+requests as possible (at most `per_request` each), sends those requests
+concurrently, and does the same for many prompts at once with sample_many().
+
+APIs without `n` (Anthropic, or your own blogify chain) fall back to
+sample_callable(): K concurrent calls of any function.
+
+consistency() then summarizes a set of samples: how often the most common
+answer comes up, how many distinct answers there are, how similar they are
+to each other, and - if they're numbers - their spread.
+
+Usage:
+    samples = sample(client, [{"role": "user", "content": "What is 2+2?"}], k=10)
+    consistency(samples.samples)   # {"agreement": 0.8, "distinct": 3, ...}
+
+    blogs = sample_callable(blogify, (article_1, guidelines_v1), k=5)
+"""
+
+import math
+import re
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Sequence
+
+MAX_CONCURRENT = 8
+PER_REQUEST = 16  # Completions per request; split larger K so no single request runs too long
+
+
+@dataclass
+class SampleSet:
+    samples: List[str] = field(default_factory=list)
+    requests: int = 0
+    prompt_tokens: int = 0  # Summed over requests: with n > 1 the prompt is counted once per request
+    completion_tokens: int = 0
+    elapsed: float = 0.0
+    errors: List[str] = field(default_factory=list)
+
+
+def _chunks(k: int, per_request: int) -> List[int]:
+    return [min(per_request, k - start) for start in range(0, k, per_request)]
+
+
+def sample_many(
+    client,
+    prompts: Dict[str, List[Dict]],
+    k: int,
+    model: str = "gpt-4.1-mini",
+    temperature: float = 1.0,
+    per_request: int = PER_REQUEST,
+    max_concurrent: int = MAX_CONCURRENT,
+    **params,
+) -> Dict[str, SampleSet]:
+    """K samples for each named prompt (a messages list), all requests in flight together."""
+    results = {name: SampleSet() for name in prompts}
+    jobs = [(name, n) for name in prompts for n in _chunks(k, per_request)]
+
+    def request(job):
+        name, n = job
+        start = time.time()
+        try:
+            response = client.chat.completions.create(
+                model=model, messages=prompts[name], n=n, temperature=temperature, **params
+            )
+        except Exception as e:  # Recorded, not raised: the other requests still count
+            return name, None, f"{type(e).__name__}: {e}", time.time() - start
+        return name, response, None, time.time() - start
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        for name, response, error, _ in pool.map(request, jobs):
+            result = results[name]
+            result.requests += 1
+            if error:
+                result.errors.append(error)
+                continue
+            for choice in response.choices:
+                if choice.message.content is None:  # Refusal or content filter: not an answer
+                    result.errors.append(f"No content (finish_reason={getattr(choice, 'finish_reason', None)})")
+                else:
+                    result.samples.append(choice.message.content)
+            if response.usage:
+                result.prompt_tokens += response.usage.prompt_tokens
+                result.completion_tokens += response.usage.completion_tokens
+    for result in results.values():
+        result.elapsed = time.time() - start
+    return results
+
+
+def sample(client, messages: List[Dict], k: int, **options) -> SampleSet:
+    """K samples of one prompt using n > 1 (see sample_many for the options)."""
+    return sample_many(client, {"prompt": messages}, k, **options)["prompt"]
+
+
+def sample_callable(
+    fn: Callable[..., str], args: Sequence = (), k: int = 5, max_concurrent: int = MAX_CONCURRENT
+) -> SampleSet:
+    """K concurrent calls of fn(*args), for APIs and agents without an `n` parameter."""
+    result = SampleSet(requests=k)
+
+    def call(_):
+        try:
+            return fn(*args), None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_concurrent) as pool:
+        for text, error in pool.map(call, range(k)):
+            if error:
+                result.errors.append(error)
+            elif text is None:
+                result.errors.append("No content")
+            else:
+                result.samples.append(text)
+    result.elapsed = time.time() - start
+    return result
+
+
+# ----------------------------
+# Agreement statistics
+# ----------------------------
+def normalize(text: str) -> str:
+    """Case, spacing and trailing punctuation don't make two answers different."""
+    return re.sub(r"\s+", " ", text.strip().lower()).rstrip(".!")
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _number(text: str) -> Optional[float]:
+    try:
+        value = float(text.strip().rstrip("."))
+    except ValueError:
+        return None
+    return value if math.isfinite(value) else None  # "nan", "inf", "1e999" aren't scores
+
+
+def consistency(samples: List[Optional[str]], normalizer: Callable[[str], str] = normalize) -> Dict:
+    """
+    How much do the samples agree?
+
+    agreement      share of samples equal to the most common answer (1.0 = all identical)
+    distinct       number of different answers
+    entropy_bits   0 when all agree, log2(K) when all differ
+    similarity     mean word-overlap (Jaccard) between pairs - for long texts that never match exactly
+    length_mean / length_stdev   in characters
+    mean / stdev   only when every sample is a number (e.g. a score)
+
+    Missing samples (None: a refusal or filtered completion) are left out.
+    """
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return {"samples": 0}
+    answers = [normalizer(s) for s in samples]
+    counts = Counter(answers)
+    mode, mode_count = counts.most_common(1)[0]
+    k = len(samples)
+
+    pairs = [
+        len(_words(a) & _words(b)) / len(_words(a) | _words(b)) if _words(a) | _words(b) else 1.0
+        for a, b in combinations(samples, 2)
+    ]
+    lengths = [len(s) for s in samples]
+    stats = {
+        "samples": k,
+        "distinct": len(counts),
+        "mode": mode,
+        "agreement": mode_count / k,
+        "entropy_bits": -sum(c / k * math.log2(c / k) for c in counts.values()) + 0.0,
+        "similarity": sum(pairs) / len(pairs) if pairs else 1.0,
+        "length_mean": statistics.mean(lengths),
+        "length_stdev": statistics.pstdev(lengths),
+    }
+
+    numbers = [_number(s) for s in samples]
+    if all(x is not None for x in numbers):
+        stats["mean"] = statistics.mean(numbers)
+        stats["stdev"] = statistics.pstdev(numbers)
+    return stats
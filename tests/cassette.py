@@ -0,0 +1,132 @@
+"""
+Record/replay ("cassette") transport for the OpenAI client.
+
+In record mode, every HTTP exchange the client makes is forwarded to the
+real API and saved. In replay mode, the saved responses are served back
+without touching the network, byte for byte - including streamed SSE bodies
+and binary audio - so the suite runs offline, deterministically, and fast.
+
+One cassette per test, stored as gzipped JSON under tests/cassettes/.
+Requests are stored only as a hash, and responses keep an allowlist of
+headers, so no key, cookie or organization id ends up in a cassette.
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+# Only these response headers are stored. Cassettes are committed, so anything that
+# identifies the account (set-cookie, openai-organization, openai-project,
+# x-request-id) stays out; so do headers describing the ORIGINAL wire encoding
+# (the body we store is already decoded).
+_KEEP_RESPONSE_HEADERS = {"content-type", "retry-after", "openai-processing-ms", "openai-version"}
+_KEEP_RESPONSE_HEADER_PREFIXES = ("x-ratelimit-",)
+
+
+def _keep_header(name: str) -> bool:
+    name = name.lower()
+    return name in _KEEP_RESPONSE_HEADERS or name.startswith(_KEEP_RESPONSE_HEADER_PREFIXES)
+
+
+class CassetteMiss(Exception):
+    """Replay mode got a request that isn't in the cassette."""
+
+
+def request_key(request: httpx.Request) -> str:
+    """Identify a request by method, path and (normalized) body."""
+    body = request.read()
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("application/json") and body:
+        body = json.dumps(json.loads(body), sort_keys=True).encode()
+    elif "boundary=" in content_type:
+        # Multipart boundaries are random per request - blank them out
+        boundary = content_type.split("boundary=")[1].split(";")[0].strip('"').encode()
+        body = body.replace(boundary, b"BOUNDARY")
+
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    return f"{request.method} {request.url.path} {digest}"
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """
+    httpx transport that records to / replays from the current cassette.
+
+    mode:
+    - "record": always call the API and overwrite the cassette
+    - "replay": only serve from the cassette; unknown requests fail
+    - "auto":   replay if the test has a cassette, otherwise record one
+    """
+
+    def __init__(self, mode: str = "auto", inner: Optional[httpx.BaseTransport] = None):
+        self.mode = mode
+        self.inner = inner or httpx.HTTPTransport()
+        self.path: Optional[Path] = None
+        self.recording = False
+        # Same request sent several times → responses replayed in order
+        self._interactions: Dict[str, List[Dict]] = {}
+        self._replay_position: Dict[str, int] = {}
+
+    # ---- Cassette lifecycle (one per test) ----
+    def load(self, path: Path) -> None:
+        self.path = path
+        self._interactions = {}
+        self._replay_position = {}
+        self.recording = self.mode == "record" or (self.mode == "auto" and not path.exists())
+        if not self.recording:
+            if not path.exists():
+                raise CassetteMiss(f"No cassette at {path} - run with --cassettes=record")
+            with gzip.open(path, "rt") as f:
+                self._interactions = json.load(f)
+
+    def save(self) -> None:
+        # Saved even when empty: "this test makes no API calls" is worth replaying too
+        if self.recording:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self.path, "wt") as f:
+                json.dump(self._interactions, f, separators=(",", ":"))
+        self.path = None
+
+    # ---- httpx transport ----
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        if self.recording or self.path is None:
+            return self._record(key, request)
+        return self._replay(key, request)
+
+    def _record(self, key: str, request: httpx.Request) -> httpx.Response:
+        response = self.inner.handle_request(request)
+        body = response.read()
+        headers = {k: v for k, v in response.headers.items() if _keep_header(k)}
+
+        if self.path is not None:
+            self._interactions.setdefault(key, []).append({
+                "status": response.status_code,
+                "headers": headers,
+                "body": base64.b64encode(body).decode(),
+            })
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    def _replay(self, key: str, request: httpx.Request) -> httpx.Response:
+        recorded = self._interactions.get(key)
+        if not recorded:
+            raise CassetteMiss(f"{key} not found in {self.path} - re-record with --cassettes=record")
+
+        position = self._replay_position.get(key, 0)
+        self._replay_position[key] = position + 1
+        interaction = recorded[min(position, len(recorded) - 1)]
+
+        return httpx.Response(
+            interaction["status"],
+            headers=interaction["headers"],
+            content=base64.b64decode(interaction["body"]),
+            request=request,
+        )
+
+    def close(self) -> None:
+        self.inner.close()
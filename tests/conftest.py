@@ -3,25 +3,186 @@ Shared test fixtures for all lessons.
 
 This file is automatically loaded by pytest. Fixtures defined here
 are available to all test files.
+
+API calls made through the `client` fixture go through cassettes
+(tests/cassettes/): recorded once against the real API, then replayed
+offline in well under a second.
+
+    uv run pytest                        # auto: replay if recorded, else record
+    uv run pytest --cassettes=replay     # offline only, fail on unrecorded calls
+    uv run pytest --cassettes=record     # re-record everything against the API
+    uv run pytest --cassettes=live       # no cassettes at all
+
+Or run everything against the local stub server (tests/stub_server.py):
+
+    uv run pytest --stub-server -m "not slow"
+    uv run pytest --stub-server=realistic   # with realistic latency
+
+Tests run in parallel with pytest-xdist; workers share one request budget
+(--rate-limit requests/minute) and compute shared artifacts, like the
+transcription of fixtures/test_audio.wav, once (see parallel.py):
+
+    uv run --with pytest-xdist pytest -n auto
 """
 
+import os
+import re
 from pathlib import Path
 
+import httpx
 import pytest
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import DefaultHttpxClient, OpenAI
+
+from .cassette import CassetteTransport
+from .parallel import RateLimitedTransport, SharedArtifacts, SharedTokenBucket
+from .stub_server import PROFILES, start_stub_server
 
 # Load environment variables from .env
 load_dotenv()
 
+CASSETTES_DIR = Path(__file__).parent / "cassettes"
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--cassettes",
+        choices=["auto", "replay", "record", "live"],
+        default=os.getenv("OPENAI_CASSETTES", "auto"),
+        help="Record/replay mode for API calls made through the client fixture",
+    )
+    parser.addoption(
+        "--stub-server",
+        nargs="?",
+        const="instant",
+        default=None,
+        choices=list(PROFILES),
+        help="Serve the client fixture from a local stub server (optionally: latency profile)",
+    )
+    parser.addoption(
+        "--rate-limit",
+        type=float,
+        default=float(os.getenv("OPENAI_TEST_RPM", "300")),
+        help="Requests per minute to the real API, shared by all workers (0 = unlimited)",
+    )
+
+
+@pytest.fixture(scope="session")
+def shared_dir(tmp_path_factory):
+    """A directory every xdist worker of this run can see."""
+    base = tmp_path_factory.getbasetemp()
+    # Under xdist each worker gets basetemp/popen-gwN; their parent is shared
+    return base.parent if os.getenv("PYTEST_XDIST_WORKER") else base
+
+
+@pytest.fixture(scope="session")
+def api_transport(request, shared_dir):
+    """HTTP transport to the real API, throttled by the cross-worker token bucket."""
+    rate = request.config.getoption("--rate-limit")
+    if rate <= 0:
+        transport = httpx.HTTPTransport()
+        yield transport
+        transport.close()
+        return
+    bucket = SharedTokenBucket(shared_dir / "rate_limit.sqlite", rate_per_minute=rate)
+    transport = RateLimitedTransport(bucket)
+    yield transport
+    transport.close()
+    bucket.close()
+
+
+@pytest.fixture(scope="session")
+def shared_artifacts(shared_dir):
+    artifacts = SharedArtifacts(shared_dir / "artifacts.sqlite")
+    yield artifacts
+    artifacts.close()
+
 
 @pytest.fixture(scope="session")
-def client():
-    """Shared OpenAI client for all tests."""
-    return OpenAI()
+def stub_server(request):
+    """Local OpenAI-compatible server, if --stub-server was given."""
+    profile = request.config.getoption("--stub-server")
+    if profile is None:
+        yield None
+        return
+    server = start_stub_server(PROFILES[profile])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="session")
+def cassette_mode(request):
+    if request.config.getoption("--stub-server"):
+        return "live"  # The stub is already local and deterministic
+    return request.config.getoption("--cassettes")
+
+
+@pytest.fixture(scope="session")
+def cassette_transport(cassette_mode, api_transport):
+    if cassette_mode == "live":
+        return None
+    # Records through the rate-limited transport; replays never reach it
+    return CassetteTransport(mode=cassette_mode, inner=api_transport)
+
+
+@pytest.fixture(scope="session")
+def client(cassette_mode, cassette_transport, api_transport, stub_server):
+    """Shared OpenAI client for all tests (one per xdist worker)."""
+    if stub_server is not None:
+        return OpenAI(base_url=stub_server.base_url, api_key="sk-stub")
+    if cassette_transport is None:
+        return OpenAI(http_client=DefaultHttpxClient(transport=api_transport))
+
+    return OpenAI(
+        # Replaying needs no real key
+        api_key=os.getenv("OPENAI_API_KEY") or "sk-replay",
+        http_client=DefaultHttpxClient(transport=cassette_transport),
+        # A replay miss should fail right away, not be retried with backoff
+        max_retries=0 if cassette_mode == "replay" else 2,
+    )
+
+
+@pytest.fixture(autouse=True)
+def cassette(request, cassette_transport):
+    """Point the transport at this test's cassette for the duration of the test."""
+    if cassette_transport is None or "client" not in request.fixturenames:
+        yield
+        return
+
+    module = request.node.path.stem
+    name = re.sub(r"[^\w.-]+", "_", request.node.nodeid.split("::", 1)[1])
+    cassette_transport.load(CASSETTES_DIR / module / f"{name}.json.gz")
+    if cassette_transport.recording and not os.getenv("OPENAI_API_KEY"):
+        pytest.skip("No cassette recorded for this test and OPENAI_API_KEY is not set")
+    yield
+    cassette_transport.save()
 
 
 @pytest.fixture(scope="session")
 def fixtures_path():
     """Path to the fixtures directory."""
     return Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture(scope="session")
+def audio_transcript(client, cassette_transport, shared_artifacts, fixtures_path):
+    """Transcription of test_audio.wav - made once per run, shared by all workers."""
+    audio_path = fixtures_path / "test_audio.wav"
+    if not audio_path.exists():
+        pytest.skip("test_audio.wav not found - run generate_test_audio.py first")
+
+    def transcribe():
+        # Session-level calls get their own cassette, independent of test order
+        if cassette_transport is not None:
+            cassette_transport.load(CASSETTES_DIR / "session" / "audio_transcript.json.gz")
+            if cassette_transport.recording and not os.getenv("OPENAI_API_KEY"):
+                pytest.skip("No cassette recorded for the transcription and OPENAI_API_KEY is not set")
+        try:
+            with open(audio_path, "rb") as f:
+                return client.audio.transcriptions.create(model="whisper-1", file=f).text
+        finally:
+            if cassette_transport is not None:
+                cassette_transport.save()
+
+    return shared_artifacts.get_or_create("audio_transcript", transcribe)
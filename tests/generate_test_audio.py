@@ -8,13 +8,12 @@ Run once to generate the fixture:
     uv run python tests/generate_test_audio.py
 """
 
+import io
 from pathlib import Path
 
+import soundfile as sf
 from dotenv import load_dotenv
 from openai import OpenAI
-import soundfile as sf
-import numpy as np
-import io
 
 load_dotenv()
 
@@ -38,16 +37,14 @@ def generate_test_audio():
         response_format="wav",
     )
 
-    # Save directly
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Check the audio in memory before anything is written
+    wav_bytes = response.read()
+    info = sf.info(io.BytesIO(wav_bytes))
 
-    with open(OUTPUT_PATH, "wb") as f:
-        f.write(response.read())
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    OUTPUT_PATH.write_bytes(wav_bytes)
 
     print(f"Saved to: {OUTPUT_PATH}")
-
-    # Verify the file
-    info = sf.info(OUTPUT_PATH)
     print(f"Duration: {info.duration:.2f}s, Sample rate: {info.samplerate}Hz")
 
 
@@ -0,0 +1,193 @@
+"""
+Coordination between pytest workers for parallel test runs.
+
+With pytest-xdist (`-n auto`) every worker is its own process with its own
+OpenAI client and connection pool. Two things still have to be shared:
+
+1. SharedTokenBucket - one request budget for ALL workers, so 8 workers
+   don't fire 8x the requests per minute and trip 429s. When any worker does
+   get a 429, every worker pauses for the Retry-After interval.
+2. SharedArtifacts - expensive results (e.g. the transcription of
+   fixtures/test_audio.wav) computed once per run and reused by every worker.
+
+Both are small SQLite files in a directory all workers can see; SQLite's
+write lock does the cross-process locking, so there's no extra dependency.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import httpx
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    # Workers queue on the write lock; a generous timeout makes them wait, not fail
+    conn = sqlite3.connect(path, timeout=600, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+# ----------------------------
+# Rate limiting
+# ----------------------------
+class SharedTokenBucket:
+    """
+    Token bucket whose state lives in SQLite, shared by every process using `path`.
+
+    The bucket refills at `rate_per_minute` tokens per minute up to `burst`;
+    each request takes one token. acquire() blocks until a token is available.
+    """
+
+    def __init__(self, path: Path, rate_per_minute: float, burst: int = 10):
+        self.rate = rate_per_minute / 60.0  # Tokens per second
+        self.burst = burst
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bucket (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                paused_until REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO bucket VALUES (0, ?, ?, 0)", (float(burst), time.time())
+        )
+
+    def _take(self, cost: float) -> float:
+        """Try to take `cost` tokens; return 0 on success, else seconds to wait."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated_at, paused_until = self._conn.execute(
+                    "SELECT tokens, updated_at, paused_until FROM bucket WHERE id = 0"
+                ).fetchone()
+                # Wall clock, not monotonic: it has to agree across processes
+                now = time.time()
+                tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+                if now < paused_until:
+                    wait = paused_until - now
+                elif tokens >= cost:
+                    tokens -= cost
+                    wait = 0.0
+                else:
+                    wait = (cost - tokens) / self.rate
+
+                self._conn.execute(
+                    "UPDATE bucket SET tokens = ?, updated_at = ? WHERE id = 0", (tokens, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, cost: float = 1.0) -> float:
+        """Block until `cost` tokens are available. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._take(cost)
+            if wait == 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float) -> None:
+        """Stop ALL workers for `seconds` (after a 429) and drain the bucket."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "UPDATE bucket SET paused_until = MAX(paused_until, ?), tokens = 0 WHERE id = 0",
+                (time.time() + seconds,),
+            )
+            self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def retry_after_seconds(response: httpx.Response, default: float = 1.0) -> float:
+    """Server-requested backoff from Retry-After(-ms) headers."""
+    if "retry-after-ms" in response.headers:
+        try:
+            return float(response.headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    try:
+        return float(response.headers.get("retry-after", default))
+    except ValueError:
+        return default  # HTTP-date form; not worth parsing here
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that takes a token from the shared bucket before every request."""
+
+    def __init__(self, bucket: SharedTokenBucket, inner: Optional[httpx.BaseTransport] = None):
+        self.bucket = bucket
+        self.inner = inner or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.bucket.acquire()
+        response = self.inner.handle_request(request)
+        if response.status_code == 429:
+            # The client's own retry will queue behind this pause, as will everyone else's
+            self.bucket.pause(retry_after_seconds(response))
+        return response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+# ----------------------------
+# Shared artifacts
+# ----------------------------
+class SharedArtifacts:
+    """
+    Compute-once, JSON-serializable values shared by every process using `path`.
+
+    The first worker to ask computes the value while holding the write lock;
+    the others wait for it, then read it.
+    """
+
+    def __init__(self, path: Path):
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS artifacts (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def get_or_create(self, name: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM artifacts WHERE name = ?", (name,)).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Someone else may have finished while we waited for the lock
+                row = self._conn.execute(
+                    "SELECT value FROM artifacts WHERE name = ?", (name,)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                else:
+                    value = compute()
+                    self._conn.execute(
+                        "INSERT INTO artifacts (name, value) VALUES (?, ?)", (name, json.dumps(value))
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return value
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,456 @@
+"""
+Local OpenAI-compatible stub server.
+
+Speaks just enough of the OpenAI API for the labs and tests - chat
+completions (streaming and not), responses (non-streaming, chained with
+previous_response_id), embeddings, transcription, speech and image
+generation - with configurable latency, throughput and failures.
+Nothing leaves the machine and nothing is billed, so load tests of the
+agents and the memory pipeline are reproducible on a single box.
+
+Run it:
+    uv run python -m tests.stub_server --profile realistic --port 8765
+
+Point any lab script at it (the OpenAI client reads OPENAI_BASE_URL):
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-stub \\
+        uv run python docs/labs/02_standalone_agents/5_concurrent_sessions.py --sessions 300
+
+Or run the test suite against it:
+    uv run pytest --stub-server -m "not slow"
+
+Replies echo the last user message, so they are deterministic.
+Chat completions report prompt-prefix cache hits (usage.prompt_tokens_details)
+at message granularity: the leading messages a recent request already sent
+count as cached. (The real API caches in 128-token blocks past 1024 tokens.)
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import math
+import random
+import struct
+import threading
+import time
+import wave
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class LatencyProfile:
+    ttft: float = 0.0  # Seconds before the first token (or the whole non-chat response)
+    tokens_per_sec: float = 0.0  # Generation speed; 0 = infinitely fast
+    jitter: float = 0.0  # Random ±fraction applied to every delay
+    error_rate: float = 0.0  # Fraction of requests answered with 429/500
+    seed: Optional[int] = None  # Fix for reproducible jitter and errors
+
+
+PROFILES: Dict[str, LatencyProfile] = {
+    "instant": LatencyProfile(),
+    "fast": LatencyProfile(ttft=0.05, tokens_per_sec=500),
+    "realistic": LatencyProfile(ttft=0.4, tokens_per_sec=80, jitter=0.3),
+    "slow": LatencyProfile(ttft=1.5, tokens_per_sec=20, jitter=0.5),
+    "flaky": LatencyProfile(ttft=0.4, tokens_per_sec=80, jitter=0.3, error_rate=0.1),
+}
+
+EMBEDDING_DIMENSIONS = 256
+PREFIX_CACHE_ENTRIES = 100_000  # Message prefixes remembered for cache hits
+TRANSCRIPT = "What is the capital of France?"
+
+
+# ----------------------------
+# Fake model outputs
+# ----------------------------
+def count_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+def reply_for(body: Dict) -> str:
+    """Deterministic reply: JSON for JSON mode, otherwise an echo of the user."""
+    if body.get("response_format", {}).get("type") == "json_object":
+        return json.dumps({"facts": [], "preferences": []})
+    user_messages = [m for m in body.get("messages", []) if m.get("role") == "user"]
+    last = user_messages[-1]["content"] if user_messages else ""
+    if not isinstance(last, str):  # Multi-part content
+        last = " ".join(part.get("text", "") for part in last)
+    return f"Stub reply: {last}"
+
+
+def split_tokens(text: str) -> List[str]:
+    """Chunk text the way a stream would arrive: roughly word by word."""
+    words = text.split(" ")
+    return [w + (" " if i < len(words) - 1 else "") for i, w in enumerate(words)]
+
+
+def embed(text: str) -> List[float]:
+    """Hashed bag-of-words vector: similar texts get similar vectors."""
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in text.lower().split():
+        digest = hashlib.md5(word.strip(".,!?\"'").encode()).digest()
+        vector[int.from_bytes(digest[:4], "little") % EMBEDDING_DIMENSIONS] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def silent_wav(seconds: float, sample_rate: int = 24000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b"\x00\x00" * int(seconds * sample_rate))
+    return buffer.getvalue()
+
+
+def silent_mp3(seconds: float) -> bytes:
+    # MPEG-1 Layer III, 128 kbps, 44.1 kHz: 417-byte frames of 1152 samples
+    frame = b"\xff\xfb\x90\x00" + b"\x00" * 413
+    return frame * max(1, int(seconds * 44100 / 1152))
+
+
+def tiny_png(seed: str) -> bytes:
+    """A 1x1 PNG whose color depends on the prompt."""
+    r, g, b = hashlib.md5(seed.encode()).digest()[:3]
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(bytes([0, r, g, b]))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+
+# ----------------------------
+# HTTP handler
+# ----------------------------
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+    server: "StubServer"
+
+    def log_message(self, format, *args):
+        pass  # Quiet; load tests make thousands of requests
+
+    # ---- helpers ----
+    def _delay(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(self.server.jittered(seconds))
+
+    def _send_json(self, payload: Dict, status: int = 200, headers: Optional[Dict] = None) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_bytes(self, data: bytes, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _maybe_fail(self) -> bool:
+        """Inject a 429 or 500 according to the profile's error rate."""
+        status = self.server.roll_error()
+        if status is None:
+            return False
+        kind = "rate_limit_error" if status == 429 else "server_error"
+        self._send_json(
+            {"error": {"message": f"Injected {status} from stub server", "type": kind, "code": None}},
+            status=status,
+            headers={"retry-after-ms": "50"},
+        )
+        return True
+
+    # ---- routing ----
+    def do_GET(self):
+        if self.path.startswith("/v1/stub-images/"):
+            name = self.path.rsplit("/", 1)[-1]
+            self._send_bytes(tiny_png(name), "image/png")
+        else:
+            self._send_json({"error": {"message": "Not found"}}, status=404)
+
+    def do_POST(self):
+        raw = self._read_body()
+        self.server.count_request(self.path)
+        if self._maybe_fail():
+            return
+
+        if self.path == "/v1/chat/completions":
+            self._chat(json.loads(raw))
+        elif self.path == "/v1/responses":
+            self._responses(json.loads(raw))
+        elif self.path == "/v1/embeddings":
+            self._embeddings(json.loads(raw))
+        elif self.path == "/v1/audio/transcriptions":
+            self._delay(self.server.profile.ttft)
+            self._send_json({"text": TRANSCRIPT})
+        elif self.path == "/v1/audio/speech":
+            self._speech(json.loads(raw))
+        elif self.path == "/v1/images/generations":
+            self._images(json.loads(raw))
+        else:
+            self._send_json({"error": {"message": f"Stub has no {self.path}"}}, status=404)
+
+    # ---- endpoints ----
+    def _chat(self, body: Dict) -> None:
+        profile = self.server.profile
+        model = body.get("model", "stub-model")
+        n = body.get("n", 1) or 1
+        text = reply_for(body)
+        tokens = split_tokens(text)
+        message_tokens = [count_tokens(str(m.get("content", ""))) + 4 for m in body.get("messages", [])]
+        prompt_tokens = sum(message_tokens)
+        cached = self.server.cached_prefix(body.get("messages", []), message_tokens)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+            "completion_tokens": len(tokens) * n,
+            "total_tokens": prompt_tokens + len(tokens) * n,
+        }
+        per_token = 1.0 / profile.tokens_per_sec if profile.tokens_per_sec else 0.0
+        completion_id = f"chatcmpl-stub{random.getrandbits(32):08x}"
+        created = int(time.time())
+
+        self._delay(profile.ttft)
+
+        if not body.get("stream"):
+            self._delay(per_token * len(tokens))
+            self._send_json({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": i, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}
+                    for i in range(n)
+                ],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta: Dict, finish_reason=None, index: int = 0, chunk_usage=None) -> None:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": index, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            }
+            if chunk_usage is not None:
+                payload["usage"] = chunk_usage
+            self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode())
+
+        for i, token in enumerate(tokens):
+            if i:
+                self._delay(per_token)
+            for index in range(n):
+                event({"content": token} if i else {"role": "assistant", "content": token}, index=index)
+        for index in range(n):
+            event({}, finish_reason="stop", index=index)
+        if body.get("stream_options", {}).get("include_usage"):
+            event(None, chunk_usage=usage)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")  # Terminating zero-length chunk
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _responses(self, body: Dict) -> None:
+        previous_id = body.get("previous_response_id")
+        history = self.server.stored_responses.get(previous_id, []) if previous_id else []
+        if previous_id and previous_id not in self.server.stored_responses:
+            self._send_json(
+                {"error": {"message": f"Previous response with id '{previous_id}' not found.",
+                           "type": "invalid_request_error", "param": "previous_response_id", "code": None}},
+                status=400,
+            )
+            return
+
+        new_input = body.get("input", "")
+        if isinstance(new_input, str):
+            new_input = [{"role": "user", "content": new_input}]
+        if body.get("instructions"):
+            new_input = [{"role": "developer", "content": body["instructions"]}] + new_input
+        text = reply_for({"messages": new_input})
+        tokens = split_tokens(text)
+
+        # Like the real API: the whole chain is billed as input, the stored part is cached
+        cached_tokens = sum(count_tokens(str(m.get("content", ""))) + 4 for m in history)
+        input_tokens = cached_tokens + sum(count_tokens(str(m.get("content", ""))) + 4 for m in new_input)
+        response_id = f"resp_stub{random.getrandbits(48):012x}"
+        if body.get("store", True):
+            self.server.stored_responses[response_id] = history + new_input + [{"role": "assistant", "content": text}]
+
+        profile = self.server.profile
+        self._delay(profile.ttft)
+        self._delay(len(tokens) / profile.tokens_per_sec if profile.tokens_per_sec else 0.0)
+        self._send_json({
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model", "stub-model"),
+            "previous_response_id": previous_id,
+            "output": [{
+                "type": "message",
+                "id": f"msg_stub{random.getrandbits(48):012x}",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": cached_tokens},
+                "output_tokens": len(tokens),
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + len(tokens),
+            },
+        })
+
+    def _embeddings(self, body: Dict) -> None:
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        self._delay(self.server.profile.ttft / 4)
+        self._send_json({
+            "object": "list",
+            "model": body.get("model", "stub-embedding"),
+            "data": [{"object": "embedding", "index": i, "embedding": embed(text)} for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": sum(map(count_tokens, inputs)), "total_tokens": sum(map(count_tokens, inputs))},
+        })
+
+    def _speech(self, body: Dict) -> None:
+        seconds = max(0.5, len(body.get("input", "")) / 15)  # ~15 characters per spoken second
+        self._delay(self.server.profile.ttft)
+        if body.get("response_format") == "wav":
+            self._send_bytes(silent_wav(seconds), "audio/wav")
+        elif body.get("response_format") == "pcm":  # Raw 24kHz 16-bit mono, no header
+            self._send_bytes(b"\x00\x00" * int(seconds * 24000), "audio/pcm")
+        else:
+            self._send_bytes(silent_mp3(seconds), "audio/mpeg")
+
+    def _images(self, body: Dict) -> None:
+        prompt = body.get("prompt", "")
+        name = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+        self._delay(self.server.profile.ttft * 10)  # Image generation is slow
+        if body.get("response_format") == "b64_json":
+            image = {"b64_json": base64.b64encode(tiny_png(name)).decode()}
+        else:
+            host, port = self.server.server_address[:2]
+            image = {"url": f"http://{host}:{port}/v1/stub-images/{name}.png"}
+        image["revised_prompt"] = f"A detailed rendering of: {prompt}"
+        self._send_json({"created": int(time.time()), "data": [image] * (body.get("n", 1) or 1)})
+
+
+# ----------------------------
+# Server
+# ----------------------------
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # Many concurrent clients connecting at once
+
+    def __init__(self, address: Tuple[str, int], profile: LatencyProfile):
+        super().__init__(address, StubHandler)
+        self.profile = profile
+        self._random = random.Random(profile.seed)
+        self._lock = threading.Lock()
+        self.requests: Dict[str, int] = {}
+        self.stored_responses: Dict[str, List[Dict]] = {}  # Response id → its whole conversation
+        self._prefixes: "OrderedDict[str, None]" = OrderedDict()  # LRU of message-prefix hashes
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def jittered(self, seconds: float) -> float:
+        with self._lock:
+            return seconds * (1 + self._random.uniform(-self.profile.jitter, self.profile.jitter))
+
+    def roll_error(self) -> Optional[int]:
+        with self._lock:
+            if self._random.random() >= self.profile.error_rate:
+                return None
+            return self._random.choice([429, 500])
+
+    def cached_prefix(self, messages: List[Dict], message_tokens: List[int]) -> int:
+        """Tokens in the longest leading run of messages seen before; remembers this request's."""
+        digest = hashlib.sha256()
+        cached, broken = 0, False
+        with self._lock:
+            for message, tokens in zip(messages, message_tokens):
+                digest.update(json.dumps(message, sort_keys=True).encode())
+                key = digest.hexdigest()  # Hash of messages[:i + 1]
+                if not broken and key in self._prefixes:
+                    self._prefixes.move_to_end(key)
+                    cached += tokens
+                else:
+                    broken = True  # Once the prefix differs, nothing after it can be a hit
+                    self._prefixes[key] = None
+            while len(self._prefixes) > PREFIX_CACHE_ENTRIES:
+                self._prefixes.popitem(last=False)
+        return cached
+
+    def count_request(self, path: str) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+
+def start_stub_server(
+    profile: LatencyProfile = PROFILES["instant"], host: str = "127.0.0.1", port: int = 0
+) -> StubServer:
+    """Start a stub server on a background thread (port 0 = any free port)."""
+    server = StubServer((host, port), profile)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", choices=PROFILES, default="realistic")
+    parser.add_argument("--ttft", type=float, help="Seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, help="Streaming speed")
+    parser.add_argument("--jitter", type=float, help="Random ±fraction on every delay")
+    parser.add_argument("--error-rate", type=float, help="Fraction of requests failing with 429/500")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible jitter and errors")
+    args = parser.parse_args()
+
+    overrides = {
+        field: getattr(args, field)
+        for field in ("ttft", "tokens_per_sec", "jitter", "error_rate", "seed")
+        if getattr(args, field) is not None
+    }
+    profile = replace(PROFILES[args.profile], **overrides)
+
+    server = StubServer((args.host, args.port), profile)
+    print(f"🧪 Stub OpenAI API on {server.base_url}")
+    print(f"   Profile: {profile}")
+    print(f"   export OPENAI_BASE_URL={server.base_url} OPENAI_API_KEY=sk-stub")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Requests served: {server.requests}")
+
+
+if __name__ == "__main__":
+    main()
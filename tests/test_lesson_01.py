@@ -13,12 +13,43 @@ Run tests:
 
 Run only fast tests (skip image generation):
     uv run pytest tests/test_lesson_01.py -v -m "not slow"
+
+Run offline from recorded cassettes (see conftest.py):
+    uv run pytest tests/test_lesson_01.py -v --cassettes=replay
+
+Run in parallel (workers share a rate limit, see conftest.py):
+    uv run --with pytest-xdist pytest tests/test_lesson_01.py -v -n auto
 """
 
+import asyncio
+import contextlib
+import gzip
+import importlib
+import json
+import shutil
+import sys
 import time
 from pathlib import Path
+from types import SimpleNamespace
 
+import httpx
+import numpy as np
 import pytest
+import soundfile as sf
+
+LAB_DIR = Path(__file__).parent.parent / "docs" / "labs" / "01_hello_world"
+sys.path.insert(0, str(LAB_DIR))
+
+from audio_io import decode_audio, encode_wav  # noqa: E402
+from image_batch import FailedImage, ImageStore, StoredImage, generate_images  # noqa: E402
+from response_cache import ResponseCache, cached_create  # noqa: E402
+from stream_metrics import Histogram, StreamMetrics, instrumented_create  # noqa: E402
+from vad_recorder import FRAME_MS, Endpointer, frame_energy_db, trim_silence  # noqa: E402
+from voice_pipeline import SentenceSplitter, respond_and_speak  # noqa: E402
+
+from tests.cassette import CassetteTransport  # noqa: E402
+
+batch = importlib.import_module("6_batch_transcribe")
 
 
 # =============================================================================
@@ -87,6 +118,101 @@ class TestChatCompletion:
         assert content == "4"  # This will likely fail!
 
 
+class TestResponseCache:
+    """Tests for response_cache.py - caching repeated prompts."""
+
+    def test_repeated_deterministic_prompt_is_served_from_cache(self, client):
+        """PROPERTY: The second identical temperature=0 call never reaches the API."""
+        cache = ResponseCache()
+        params = dict(
+            model="gpt-4.1-mini",
+            messages=[{"role": "user", "content": "Say hello."}],
+            temperature=0,
+        )
+
+        first = cached_create(client, cache, **params)
+
+        start = time.time()
+        second = cached_create(client, cache, **params)
+        elapsed = time.time() - start
+
+        assert second is first
+        assert elapsed < 0.01, f"Cache hit too slow: {elapsed:.4f}s"
+        assert cache.stats()["exact_hits"] == 1
+
+    def test_nondeterministic_prompt_is_not_cached(self, client):
+        """PROPERTY: temperature > 0 asks for variety, so it is never cached."""
+        cache = ResponseCache()
+        params = dict(
+            model="gpt-4.1-mini",
+            messages=[{"role": "user", "content": "Say hello."}],
+            temperature=0.7,
+        )
+
+        cached_create(client, cache, **params)
+        cached_create(client, cache, **params)
+
+        assert cache.stats()["skipped"] == 2
+        assert cache.stats()["entries"] == 0
+
+    def test_keys_handle_any_message_content(self):
+        """PROPERTY: Tool-call (None) and multi-part content are keyable; code formatting is not erased (no API call)."""
+        cache = ResponseCache()
+        tool_call = {"model": "m", "temperature": 0, "messages": [
+            {"role": "user", "content": "Weather?"},
+            {"role": "assistant", "content": None, "tool_calls": [{"id": "call_1"}]},
+            {"role": "tool", "tool_call_id": "call_1", "content": "Sunny"},
+        ]}
+        vision = {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": [
+            {"type": "text", "text": "What is this?"},
+            {"type": "image_url", "image_url": {"url": "https://example.com/cat.png"}},
+        ]}]}
+        cache.put(tool_call, "sunny")
+        cache.put(vision, "a cat")
+        assert cache.get(tool_call) == "sunny" and cache.get(vision) == "a cat"
+        assert ResponseCache.query_text(vision) == "What is this?"
+
+        def ask(content):
+            return {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": content}]}
+
+        assert cache.exact_key(ask("Fix:\r\nif x:\n    y()  \n")) == cache.exact_key(ask("Fix:\nif x:\n    y()"))
+        assert cache.exact_key(ask("if x:\n    y()")) != cache.exact_key(ask("if x:\n y()"))
+
+    def test_lru_and_ttl_eviction(self):
+        """PROPERTY: The least recently used entry goes first; expired entries are never served (no API call)."""
+        cache = ResponseCache(max_entries=2)
+
+        def ask(text):
+            return {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": text}]}
+
+        cache.put(ask("a"), "A")
+        cache.put(ask("b"), "B")
+        assert cache.get(ask("a")) == "A"  # Now "b" is the least recently used
+        cache.put(ask("c"), "C")
+        assert cache.get(ask("b")) is None
+        assert cache.get(ask("a")) == "A" and cache.get(ask("c")) == "C"
+
+        short_lived = ResponseCache(ttl_seconds=0.01)
+        short_lived.put(ask("a"), "A")
+        time.sleep(0.02)
+        assert short_lived.get(ask("a")) is None
+        assert short_lived.stats()["entries"] == 0
+
+    def test_semantic_tier_needs_similar_prompt_and_same_context(self):
+        """PROPERTY: A near-identical embedding hits only if model, params and earlier messages match (no API call)."""
+        cache = ResponseCache(similarity_threshold=0.95)
+        params = {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": "Capital of France?"}]}
+        rephrased = {**params, "messages": [{"role": "user", "content": "What's France's capital?"}]}
+        other_model = {**rephrased, "model": "other"}
+
+        cache.put(params, "Paris", embedding=[1.0, 0.0, 0.1])
+
+        assert cache.get(rephrased, embedding=[1.0, 0.02, 0.1]) == "Paris"
+        assert cache.get(rephrased, embedding=[0.0, 1.0, 0.0]) is None  # Not similar
+        assert cache.get(other_model, embedding=[1.0, 0.02, 0.1]) is None  # Different context
+        assert cache.stats()["semantic_hits"] == 1 and cache.stats()["misses"] == 2
+
+
 # =============================================================================
 # TEST 2: STREAMING
 # =============================================================================
@@ -128,6 +254,37 @@ class TestStreaming:
         # Should contain hello in some form
         assert "hello" in full_response.lower() or "hi" in full_response.lower()
 
+    def test_stream_timing_is_consistent(self, client):
+        """PROPERTY: First token arrives before the stream ends; one gap between each pair of chunks."""
+        metrics = StreamMetrics()
+        stream = instrumented_create(
+            client,
+            metrics,
+            model="gpt-4.1-mini",
+            messages=[{"role": "user", "content": "Count from 1 to 5."}],
+        )
+        text = "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+
+        timing = stream.timing
+        assert len(text) > 0
+        assert 0 < timing.ttft <= timing.total
+        assert len(timing.gaps) == timing.chunks - 1
+        assert metrics.streams["gpt-4.1-mini"] == 1
+        assert metrics.histogram("ttft_seconds", "gpt-4.1-mini").total == 1
+
+    def test_histogram_percentiles_within_precision(self):
+        """PROPERTY: HDR-style percentiles stay within 1% of the exact value (no API call)."""
+        histogram = Histogram(significant_figures=2)
+        values = [ms / 1000 for ms in range(1, 10_001)]  # 1ms .. 10s
+        for value in values:
+            histogram.record(value)
+
+        for p in (50, 90, 99, 99.9):
+            exact = values[int(len(values) * p / 100) - 1]
+            assert abs(histogram.percentile(p) - exact) / exact < 0.01
+        assert histogram.total == len(values)
+        assert histogram.max == 10.0
+
 
 # =============================================================================
 # TEST 3: VOICE (LLM-AS-JUDGE)
@@ -146,21 +303,11 @@ class TestVoice:
     We use LLM-AS-JUDGE to evaluate if the response is sensible.
     """
 
-    def test_transcription_works(self, client, fixtures_path):
+    def test_transcription_works(self, audio_transcript):
         """STRUCTURAL: Whisper should transcribe audio to text."""
-        audio_path = fixtures_path / "test_audio.wav"
-
-        if not audio_path.exists():
-            pytest.skip("test_audio.wav not found - run generate_test_audio.py first")
-
-        with open(audio_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f,
-            )
-
-        assert transcript.text is not None
-        assert len(transcript.text) > 0
+        # Transcribed once per run by the audio_transcript fixture (conftest.py)
+        assert audio_transcript is not None
+        assert len(audio_transcript) > 0
 
     def test_tts_produces_audio(self, client):
         """STRUCTURAL: TTS should produce audio bytes."""
@@ -178,7 +325,143 @@ class TestVoice:
         is_frame_sync = audio_bytes[0] == 0xFF and audio_bytes[1] in (0xFB, 0xF3, 0xF2, 0xFA)
         assert is_id3 or is_frame_sync, f"Not a valid MP3: starts with {audio_bytes[:4]}"
 
-    def test_voice_pipeline_coherent_llm_judge(self, client, fixtures_path):
+    def test_sentence_splitter_cuts_streamed_text(self):
+        """STRUCTURAL: Sentences come out as soon as they end, whatever the chunking (no API call)."""
+        text = "Sure! The capital of France is Paris. It has about 2.1 million people.\nAnything else?"
+        splitter = SentenceSplitter(min_chars=20)
+
+        sentences = []
+        for char in text:  # Worst case: one character per chunk
+            sentences += splitter.feed(char)
+        sentences.append(splitter.flush())
+
+        assert sentences == [
+            "Sure! The capital of France is Paris.",  # "Sure!" alone is too short to speak
+            "It has about 2.1 million people.",  # No cut inside "2.1"
+            "Anything else?",
+        ]
+
+    def test_in_memory_wav_round_trip(self):
+        """STRUCTURAL: Samples survive encode → upload-ready buffer → decode without a file (no API call)."""
+        sample_rate = 16000
+        t = np.arange(sample_rate) / sample_rate
+        audio = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+        buffer = encode_wav(audio, sample_rate)
+        assert buffer.name.endswith(".wav")  # Whisper infers the format from the name
+        assert buffer.read(4) == b"RIFF"
+
+        decoded, decoded_rate = decode_audio(buffer.getvalue())
+        assert decoded_rate == sample_rate
+        assert np.max(np.abs(decoded - audio)) < 1e-3  # 16-bit quantization only
+
+    def test_endpointing_stops_on_silence_and_trims(self):
+        """PROPERTY: Recording ends after trailing silence; silence around the speech is trimmed (no API call)."""
+        sample_rate = 16000
+        rng = np.random.default_rng(0)
+
+        def noise(seconds):
+            return rng.normal(0, 0.001, int(seconds * sample_rate))
+
+        t = np.arange(int(1.0 * sample_rate)) / sample_rate
+        speech = 0.3 * np.sin(2 * np.pi * 220 * t)
+        audio = np.concatenate([noise(1.0), speech, noise(2.0)]).astype(np.float32)
+
+        # Feed it in blocks, like the microphone callback would
+        frame_len = sample_rate * FRAME_MS // 1000
+        endpointer = Endpointer(silence_seconds=0.8)
+        block = frame_len * 4
+        stopped_at = None
+        for offset in range(0, len(audio) - block + 1, block):
+            if endpointer.process(frame_energy_db(audio[offset:offset + block], frame_len)):
+                stopped_at = (offset + block) / sample_rate
+                break
+
+        assert endpointer.speech_started
+        assert stopped_at is not None and 2.7 <= stopped_at <= 3.0, "Should stop ~0.8s after speech ends at 2.0s"
+
+        trimmed = trim_silence(audio, sample_rate, endpointer.threshold_db, pad_seconds=0.2)
+        assert 1.3 <= len(trimmed) / sample_rate <= 1.5  # 1s of speech + 2 x 0.2s padding
+
+    def test_pipelined_reply_produces_audio(self, client):
+        """PROPERTY: The pipelined path speaks every sentence, and the first one before the end."""
+
+        class RecordingPlayer:
+            first_audio_at = None
+
+            def __init__(self):
+                self.audio = b""
+
+            def play(self, chunk):
+                if self.first_audio_at is None:
+                    self.first_audio_at = time.perf_counter()
+                self.audio += chunk
+
+            def close(self):
+                pass
+
+        player = RecordingPlayer()
+        reply, timing = respond_and_speak(
+            client,
+            [{"role": "user", "content": "In two short sentences, what is an API?"}],
+            player=player,
+        )
+
+        assert len(reply) > 0
+        assert timing.sentences >= 1
+        assert len(player.audio) > 0
+        assert len(player.audio) % 2 == 0, "PCM is 16-bit: whole samples only"
+        assert timing.first_sentence <= timing.first_audio <= timing.total
+
+    def test_player_is_closed_when_the_reply_fails(self):
+        """STRUCTURAL: A failed stream still closes the player, so the audio device is released (no API call)."""
+
+        class FailingClient:
+            class chat:
+                class completions:
+                    @staticmethod
+                    def create(**params):
+                        raise ConnectionError("stream dropped")
+
+        class ClosingPlayer:
+            first_audio_at = None
+            closed = False
+
+            def play(self, chunk):
+                pass
+
+            def close(self):
+                self.closed = True
+
+        player = ClosingPlayer()
+        with pytest.raises(ConnectionError):
+            respond_and_speak(FailingClient(), [{"role": "user", "content": "Hi"}], player=player)
+        assert player.closed
+
+    def test_reply_keeps_the_streamed_formatting(self):
+        """STRUCTURAL: Sentences are cut only for TTS; the returned reply keeps newlines and lists (no API call)."""
+        deltas = ["Steps:\n", "- Boil the water.\n", "- Add the tea.", "\n\nEnjoy!"]
+        spoken = []
+
+        def speak(**params):
+            spoken.append(params["input"])
+            return contextlib.nullcontext(SimpleNamespace(iter_bytes=lambda size: [b"\x00\x00"]))
+
+        def chunk(text):
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+        fake = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **params: [chunk(d) for d in deltas])),
+            audio=SimpleNamespace(speech=SimpleNamespace(with_streaming_response=SimpleNamespace(create=speak))),
+        )
+        player = SimpleNamespace(first_audio_at=None, play=lambda chunk: None, close=lambda: None)
+        reply, timing = respond_and_speak(fake, [{"role": "user", "content": "Tea?"}], player=player)
+
+        assert reply == "Steps:\n- Boil the water.\n- Add the tea.\n\nEnjoy!"
+        assert timing.sentences == len(spoken) > 1
+        assert "Boil the water" in " ".join(spoken) and "Enjoy!" in spoken[-1]
+
+    def test_voice_pipeline_coherent_llm_judge(self, client, audio_transcript):
         """
         LLM-AS-JUDGE: Evaluate if the voice pipeline produces sensible responses.
 
@@ -190,18 +473,8 @@ class TestVoice:
         This introduces the concept of LLM-as-judge, which we'll explore
         deeply in Phase 2 (Evaluation).
         """
-        audio_path = fixtures_path / "test_audio.wav"
-
-        if not audio_path.exists():
-            pytest.skip("test_audio.wav not found - run generate_test_audio.py first")
-
-        # Step 1: Transcribe
-        with open(audio_path, "rb") as f:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f,
-            )
-        user_input = transcript.text
+        # Step 1: Transcribe (shared with test_transcription_works)
+        user_input = audio_transcript
 
         # Step 2: Get response
         response = client.chat.completions.create(
@@ -298,3 +571,172 @@ class TestImageGeneration:
         assert revised is not None
         # DALL-E typically expands short prompts significantly
         assert len(revised) > len("A cat")
+
+    def test_repeated_prompt_is_served_from_store(self, tmp_path):
+        """STRUCTURAL: Each distinct request is generated and downloaded once, then read from disk (no API call)."""
+        calls = []
+
+        class FakeImages:
+            async def generate(self, **params):
+                calls.append(params["prompt"])
+                image = type("Image", (), {"url": f"https://images.test/{len(calls)}.png", "revised_prompt": "r"})
+                return type("Response", (), {"data": [image]})
+
+        fake_client = type("Client", (), {"images": FakeImages()})
+        http = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=b"png")))
+        store = ImageStore(tmp_path)
+
+        first = asyncio.run(generate_images(fake_client, store, ["a cat", "a dog", "a cat"], per_minute=6000, http=http))
+        second = asyncio.run(generate_images(fake_client, store, ["a cat"], per_minute=6000, http=http))
+
+        assert sorted(calls) == ["a cat", "a dog"]  # The duplicate shared one generation
+        assert [image.prompt for image in first] == ["a cat", "a dog", "a cat"]
+        assert first[0].path == first[1].path  # Same bytes → same content-addressed file
+        assert second[0].cached and second[0].path.read_bytes() == b"png"
+
+    def test_failed_prompt_does_not_discard_the_batch(self, tmp_path):
+        """STRUCTURAL: A rejected prompt and a failed download are reported; the other images are kept (no API call)."""
+
+        class FakeImages:
+            async def generate(self, **params):
+                if params["prompt"] == "rejected":
+                    raise ValueError("content policy")
+                await asyncio.sleep(0.01)
+                image = type("Image", (), {"url": f"https://images.test/{params['prompt']}.png", "revised_prompt": None})
+                return type("Response", (), {"data": [image]})
+
+        def download(request):
+            return httpx.Response(404 if "broken" in request.url.path else 200, content=request.url.path.encode())
+
+        fake_client = type("Client", (), {"images": FakeImages()})
+        http = httpx.AsyncClient(transport=httpx.MockTransport(download))
+        prompts = ["a cat", "rejected", "broken", "a dog"]
+
+        images = asyncio.run(generate_images(fake_client, ImageStore(tmp_path), prompts, per_minute=6000, http=http))
+
+        assert [type(image) for image in images] == [StoredImage, FailedImage, FailedImage, StoredImage]
+        assert "content policy" in images[1].error and "404" in images[2].error
+        assert images[0].path.read_bytes() == b"/a cat.png" and images[3].path.exists()
+
+
+# =============================================================================
+# TEST 5: BATCH TRANSCRIPTION
+# =============================================================================
+
+
+class TestBatchTranscription:
+    """Tests for 6_batch_transcribe.py - directories of recordings."""
+
+    def test_audio_is_resampled_to_16k_mono(self):
+        """PROPERTY: 44.1kHz stereo becomes 16kHz mono at the same pitch, normalized (no API call)."""
+        t = np.arange(44100) / 44100
+        tone = np.sin(2 * np.pi * 440 * t)
+        stereo = np.stack([0.2 * tone, 0.1 * tone], axis=1) + 0.05  # Quiet, with a DC offset
+
+        audio = batch.normalize(batch.to_mono(stereo, 44100))
+
+        assert audio.ndim == 1
+        assert len(audio) == 16000
+        assert abs(np.abs(audio).max() - 0.9) < 1e-3
+        assert abs(audio.mean()) < 1e-3
+        peak_hz = np.argmax(np.abs(np.fft.rfft(audio))) * 16000 / len(audio)
+        assert abs(peak_hz - 440) <= 2
+
+    def test_long_audio_is_split_at_pauses(self):
+        """PROPERTY: Segments respect the length limit and are cut inside pauses (no API call)."""
+        rate = 16000
+        t = np.arange(8 * rate) / rate
+        speech = 0.5 * np.sin(2 * np.pi * 200 * t)
+        pause = np.zeros(rate)
+        audio = np.concatenate([speech, pause, speech, pause, speech]).astype(np.float32)  # 26s
+
+        bounds = batch.split_at_silence(audio, rate, max_seconds=10, search_seconds=3)
+
+        assert len(bounds) == 3
+        assert bounds[0][0] == 0 and bounds[-1][1] == len(audio)
+        for (_, end), (next_start, _) in zip(bounds, bounds[1:]):
+            assert end == next_start
+            assert np.abs(audio[end - 160:end + 160]).max() < 0.01, "Cut should fall in a pause"
+        assert all((end - start) / rate <= 10 for start, end in bounds)
+
+    def test_directory_is_transcribed_then_resumed(self, client, fixtures_path, tmp_path):
+        """STRUCTURAL: Every file ends up in the manifest; a rerun has nothing left to do."""
+        audio_path = fixtures_path / "test_audio.wav"
+        if not audio_path.exists():
+            pytest.skip("test_audio.wav not found - run generate_test_audio.py first")
+        shutil.copy(audio_path, tmp_path / "question.wav")
+        sf.write(tmp_path / "silence.wav", np.zeros(16000, dtype=np.float32), 16000)
+        manifest = tmp_path / "transcripts.jsonl"
+
+        stats = batch.transcribe_directory(client, tmp_path, manifest, workers=2)
+        assert stats == {"transcribed": 1, "silent": 1, "errors": 0}
+
+        records = [json.loads(line) for line in manifest.read_text().splitlines()]
+        assert {r["file"] for r in records} == {"question.wav", "silence.wav"}
+        assert len(batch.read_transcripts(manifest)["question.wav"]) > 0
+
+        # Resume: everything is checkpointed, so nothing is uploaded again
+        stats = batch.transcribe_directory(client, tmp_path, manifest, workers=2)
+        assert stats == {"transcribed": 0, "silent": 0, "errors": 0}
+
+    def test_crash_leftovers_and_bad_files_do_not_stop_a_rerun(self, tmp_path):
+        """PROPERTY: A torn manifest line, a re-split file and an unreadable file are handled (no API call)."""
+        sf.write(tmp_path / "silence.wav", np.zeros(16000, dtype=np.float32), 16000)
+        (tmp_path / "broken.wav").write_bytes(b"RIFF not really audio")
+        manifest = tmp_path / "transcripts.jsonl"
+        old = {"file": "talk.wav", "fingerprint": "1:1", "segments": 3}
+        new = {"file": "talk.wav", "fingerprint": "2:2", "segments": 2}
+        manifest.write_text("".join(json.dumps(r) + "\n" for r in [
+            {**old, "segment": 0, "text": "old start"},
+            {**old, "segment": 2, "text": "old end"},
+            {**new, "segment": 1, "text": "new end"},
+            {**new, "segment": 0, "text": "new start"},
+        ]) + '{"file": "silence.wav", "fingerprint')  # Crashed mid-write
+
+        assert batch.read_transcripts(manifest) == {"talk.wav": "new start new end"}
+
+        stats = batch.transcribe_directory(None, tmp_path, manifest, workers=2)  # Silence needs no client
+
+        assert stats == {"transcribed": 0, "silent": 1, "errors": 1}
+        records = batch.read_records(manifest)
+        assert len(records) == 6 == len(manifest.read_text().splitlines())
+        assert {r["file"]: "error" in r for r in records[4:]} == {"silence.wav": False, "broken.wav": True}
+
+
+# =============================================================================
+# TEST 6: RECORDED CASSETTES
+# =============================================================================
+
+
+class TestCassettes:
+    """Tests for tests/cassette.py - what a recorded cassette may contain."""
+
+    def test_recorded_cassette_contains_no_credentials(self, tmp_path):
+        """PROPERTY: Keys, cookies and account ids never reach the committed file; replay still works (no API call)."""
+
+        def api(request):
+            return httpx.Response(200, json={"ok": True}, headers={
+                "set-cookie": "__cf_bm=secret-cookie; path=/",
+                "openai-organization": "org-secret",
+                "openai-project": "proj_secret",
+                "x-request-id": "req_secret",
+                "x-ratelimit-remaining-requests": "499",
+            })
+
+        path = tmp_path / "cassette.json.gz"
+        recorder = CassetteTransport(mode="record", inner=httpx.MockTransport(api))
+        recorder.load(path)
+        with httpx.Client(transport=recorder, headers={"Authorization": "Bearer sk-secret"}) as http:
+            http.post("https://api.openai.com/v1/chat/completions", json={"model": "m"})
+        recorder.save()
+
+        recorded = gzip.decompress(path.read_bytes()).decode().lower()
+        for secret in ("sk-secret", "authorization", "cookie", "secret-cookie", "org-secret", "proj_secret", "req_secret"):
+            assert secret not in recorded
+
+        player = CassetteTransport(mode="replay")
+        player.load(path)
+        with httpx.Client(transport=player) as http:
+            response = http.post("https://api.openai.com/v1/chat/completions", json={"model": "m"})
+        assert response.json() == {"ok": True}
+        assert response.headers["x-ratelimit-remaining-requests"] == "499"
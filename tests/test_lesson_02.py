@@ -0,0 +1,708 @@
+"""
+Tests for Lesson 02: Standalone Agents
+
+Unlike Lesson 01, these tests exercise the local machinery around the
+agents (memory stores, caches, context building) and need no API key.
+Tests that run an agent end to end talk to the local stub server.
+
+Run tests:
+    uv run pytest tests/test_lesson_02.py -v
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pytest
+from openai import AsyncOpenAI
+
+LAB_DIR = Path(__file__).parent.parent / "docs" / "labs" / "02_standalone_agents"
+sys.path.insert(0, str(LAB_DIR))
+
+from background_summary import BackgroundSummarizer  # noqa: E402
+from context_builder import TokenCounter, _ByteEncoding, pack_context  # noqa: E402
+from fact_merge import FactIndex, merge_facts, merge_memory  # noqa: E402
+from memory_store import (  # noqa: E402
+    CachedMemoryStore,
+    JsonFileMemoryStore,
+    MemoryStore,
+    SqliteMemoryStore,
+    migrate_json_to_sqlite,
+)
+
+from vector_memory import VectorIndex, VectorMemoryStore  # noqa: E402
+
+from tests.stub_server import start_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def on_stub(monkeypatch):
+    """
+    on_stub(module, scenario) runs `await scenario()` with module.client talking to a stub server.
+
+    Each call gets a fresh event loop and a fresh client (closed afterwards);
+    make_client builds a different one, e.g. a client that counts uploads.
+    """
+    server = start_stub_server()
+    monkeypatch.setenv("OPENAI_BASE_URL", server.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-stub")
+
+    def run(module, scenario, make_client=None):
+        async def main():
+            client = make_client() if make_client else AsyncOpenAI(base_url=server.base_url, api_key="sk-stub")
+            monkeypatch.setattr(module, "client", client)
+            try:
+                return await scenario()
+            finally:
+                await client.close()
+
+        return asyncio.run(main())
+
+    yield run
+    server.shutdown()
+    server.server_close()
+
+
+# =============================================================================
+# TEST 1: LONG-TERM MEMORY STORES
+# =============================================================================
+
+
+class TestMemoryStore:
+    """Tests for memory_store.py - pluggable long-term memory backends."""
+
+    def test_sqlite_round_trip(self, tmp_path):
+        """Saved memory should come back unchanged; unknown users are None."""
+        store = SqliteMemoryStore(tmp_path / "memories.db")
+        memory = {"facts": ["Works at UniTN"], "preferences": ["Short answers"]}
+
+        store.save("alice", memory)
+
+        assert store.get("alice") == memory
+        assert store.get("bob") is None
+        assert store.count() == 1
+
+    def test_incomplete_backend_fails_at_construction(self):
+        """A backend missing part of the interface is rejected when created, not on first use."""
+
+        class ReadOnlyStore(MemoryStore):
+            def get(self, user_id):
+                return None
+
+        with pytest.raises(TypeError, match="save_many"):
+            ReadOnlyStore()
+
+    def test_sqlite_concurrent_updates_are_not_lost(self, tmp_path):
+        """Concurrent read-modify-write from two connections must not drop updates."""
+        path = tmp_path / "memories.db"
+        stores = [SqliteMemoryStore(path), SqliteMemoryStore(path)]
+
+        def add_facts(store, prefix):
+            for i in range(25):
+                store.update(
+                    "alice",
+                    lambda m: {"facts": (m or {"facts": []})["facts"] + [f"{prefix}{i}"]},
+                )
+
+        threads = [
+            threading.Thread(target=add_facts, args=(store, prefix))
+            for store, prefix in zip(stores, "ab")
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(stores[0].get("alice")["facts"]) == 50
+
+    def test_migration_from_json(self, tmp_path):
+        """Every user in the old JSON file should appear in the SQLite store."""
+        json_path = tmp_path / "user_memories.json"
+        old = JsonFileMemoryStore(json_path)
+        old.save_many({
+            "alice": {"facts": ["a"], "preferences": []},
+            "bob": {"facts": ["b"], "preferences": ["c"]},
+        })
+
+        store = SqliteMemoryStore(tmp_path / "memories.db")
+        migrated = migrate_json_to_sqlite(json_path, store)
+
+        assert migrated == 2
+        assert store.get("bob") == json.loads(json_path.read_text())["bob"]
+
+
+class TestMemoryCache:
+    """Tests for CachedMemoryStore - LRU cache with write-behind flushing."""
+
+    def test_repeated_reads_hit_the_cache(self, tmp_path):
+        """Only the first read of a user should reach the backing store."""
+        backing = SqliteMemoryStore(tmp_path / "memories.db")
+        backing.save("alice", {"facts": ["a"]})
+        cache = CachedMemoryStore(backing)
+
+        for _ in range(5):
+            assert cache.get("alice") == {"facts": ["a"]}
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 4
+
+    def test_writes_are_batched_until_flush(self, tmp_path):
+        """Saves stay in memory until flush_every dirty users accumulate."""
+        backing = SqliteMemoryStore(tmp_path / "memories.db")
+        cache = CachedMemoryStore(backing, flush_every=3, flush_interval=3600)
+
+        cache.save("alice", {"facts": ["a"]})
+        cache.save("bob", {"facts": ["b"]})
+        assert backing.count() == 0
+
+        cache.save("carol", {"facts": ["c"]})
+        assert backing.count() == 3
+        assert cache.stats()["flushes"] == 1
+
+    def test_eviction_by_size_writes_dirty_users(self, tmp_path):
+        """Evicting a dirty user must persist it, not lose it."""
+        backing = SqliteMemoryStore(tmp_path / "memories.db")
+        cache = CachedMemoryStore(backing, max_bytes=100, flush_every=1000, flush_interval=3600)
+
+        for i in range(10):
+            cache.save(f"user{i}", {"facts": ["x" * 20]})
+
+        stats = cache.stats()
+        assert stats["evictions"] > 0
+        assert stats["cached_bytes"] <= 100
+        assert backing.get("user0") == {"facts": ["x" * 20]}
+
+    def test_pending_writes_flush_on_a_timer(self, tmp_path):
+        """A save with no later write still reaches disk within flush_interval."""
+        backing = SqliteMemoryStore(tmp_path / "memories.db")
+        cache = CachedMemoryStore(backing, flush_every=1000, flush_interval=0.05)
+
+        cache.save("alice", {"facts": ["a"]})
+        assert backing.count() == 0
+        time.sleep(0.3)
+
+        assert backing.get("alice") == {"facts": ["a"]}
+        assert cache.stats()["dirty_users"] == 0
+        cache.close()
+
+    def test_unknown_users_are_not_cached(self, tmp_path):
+        """A user created by another process after a miss is visible right away."""
+        path = tmp_path / "memories.db"
+        cache = CachedMemoryStore(SqliteMemoryStore(path))
+        assert cache.get("dave") is None
+
+        SqliteMemoryStore(path).save("dave", {"facts": ["d"]})
+
+        assert cache.get("dave") == {"facts": ["d"]}
+
+
+# =============================================================================
+# TEST 2: SHORT-TERM MEMORY COMPRESSION
+# =============================================================================
+
+
+class TestBackgroundSummarizer:
+    """Tests for background_summary.py - compression off the critical path."""
+
+    def test_summary_is_swapped_in_when_ready(self):
+        """poll() returns nothing while summarizing, then (summary, upto)."""
+
+        async def scenario():
+            release = asyncio.Event()
+
+            async def slow_summarize(turns, existing):
+                await release.wait()
+                return existing + f"+{len(turns)}"
+
+            summarizer = BackgroundSummarizer(slow_summarize)
+            assert summarizer.submit([{"role": "user", "content": "hi"}], "memory", upto=2)
+            await asyncio.sleep(0)
+            assert summarizer.poll() is None
+            assert not summarizer.submit([], "memory", upto=4)  # One at a time
+
+            release.set()
+            while summarizer.busy:
+                await asyncio.sleep(0.01)
+
+            assert summarizer.poll() == ("memory+1", 2)
+            assert summarizer.poll() is None
+
+        asyncio.run(scenario())
+
+    def test_failed_summary_does_not_fail_the_next_turn(self, capsys):
+        """A summary that raised is logged and dropped; the next one can be submitted."""
+
+        async def scenario():
+            async def failing_summarize(turns, existing):
+                raise RuntimeError("summarizer down")
+
+            summarizer = BackgroundSummarizer(failing_summarize)
+            summarizer.submit([{"role": "user", "content": "hi"}], "memory", upto=2)
+            while summarizer.busy:
+                await asyncio.sleep(0.01)
+
+            assert summarizer.poll() is None
+            assert summarizer.submit([{"role": "user", "content": "hi"}], "memory", upto=2)  # Retried
+            await summarizer.shutdown()
+
+        asyncio.run(scenario())
+        assert "summarizer down" in capsys.readouterr().out
+
+
+# =============================================================================
+# TEST 3: TOKEN-BUDGET CONTEXT
+# =============================================================================
+
+
+class TestContextBuilder:
+    """Tests for context_builder.py - packing prompts to a token budget."""
+
+    def make_history(self, turns):
+        history = []
+        for i in range(turns):
+            history.append({"role": "user", "content": f"Question {i} " * 10})
+            history.append({"role": "assistant", "content": f"Answer {i} " * 10})
+        return history
+
+    def test_stays_within_budget_and_keeps_newest_turns(self):
+        """Packed requests never exceed the budget and end with the newest turns."""
+        counter = TokenCounter("gpt-4.1-mini")
+        history = self.make_history(50)
+
+        messages = pack_context(counter, "You are helpful.", history, "Next?", budget=400)
+
+        assert counter.count_messages(messages) <= 400
+        assert messages[-2] == history[-1]
+        assert messages[1]["role"] == "user"  # Never starts mid-turn
+
+    def test_fallback_count_never_undercounts(self):
+        """Without tiktoken, CJK and emoji (a token or more per character) still fit the budget."""
+        counter = TokenCounter("gpt-4.1-mini")
+        counter.encoding = _ByteEncoding()
+        counter.count.cache_clear()
+        text = "记忆模块 🧠🚀 " * 50
+
+        assert counter.count(text) >= 3 * len(text.replace(" ", ""))  # ≥ 3 bytes per CJK char / emoji
+        cut = counter.truncate(text, 100)
+        assert counter.count(cut) <= 100 and text.startswith(cut)
+
+    def test_long_paste_is_truncated_to_budget(self):
+        """A single huge user message is cut down instead of blowing the budget."""
+        counter = TokenCounter("gpt-4.1-mini")
+
+        messages = pack_context(counter, "You are helpful.", [], "word " * 10_000, budget=200)
+
+        assert counter.count_messages(messages) <= 200
+        assert messages[-1]["content"].startswith("word word")
+
+    def test_cache_friendly_layout_keeps_the_prefix_stable(self):
+        """With `memory`, changing the memory only changes the tail of the request."""
+        counter = TokenCounter("gpt-4.1-mini")
+        history = self.make_history(5)
+
+        before = pack_context(counter, "You are helpful.", history, "Next?", budget=2000, memory="MEMORY: v1")
+        after = pack_context(counter, "You are helpful.", history, "Next?", budget=2000, memory="MEMORY: v2 " * 20)
+
+        assert before[:-2] == after[:-2]  # Instructions + history: the cacheable prefix
+        assert before[-2] == {"role": "system", "content": "MEMORY: v1"}
+        assert counter.count_messages(pack_context(
+            counter, "You are helpful.", history, "Next?", budget=300, memory="MEMORY " * 500
+        )) <= 300
+
+
+# =============================================================================
+# TEST 4: SERVER-SIDE CONVERSATION STATE
+# =============================================================================
+
+
+class TestServerState:
+    """Tests for 2_stateful_agent.py --server-state and 6_state_benchmark.py, against the stub server."""
+
+    def test_server_state_uploads_only_the_new_message(self, on_stub):
+        """Chained turns upload a flat amount while full history grows; billed input grows in both."""
+        benchmark = importlib.import_module("6_state_benchmark")
+        messages = [f"Message number {i} with a little padding to make it realistic." for i in range(8)]
+        counter = benchmark.UploadCounter()
+
+        async def run():
+            history = await benchmark.run_conversation("history", messages, counter)
+            chained = await benchmark.run_conversation("server", messages, counter)
+            return history, chained
+
+        history, chained = on_stub(benchmark.agent, run, make_client=lambda: benchmark.measured_client(counter))
+
+        assert history[-1].uploaded > 5 * history[0].uploaded
+        assert max(t.uploaded for t in chained) < 2 * chained[0].uploaded
+        assert [t.input_tokens for t in chained] == [t.input_tokens for t in history]
+        assert chained[0].cached_tokens == 0 and chained[-1].cached_tokens > chained[-1].input_tokens / 2
+
+
+# =============================================================================
+# TEST 5: PROMPT-PREFIX CACHING
+# =============================================================================
+
+
+class TestPrefixCaching:
+    """Tests for CACHE_FRIENDLY_LAYOUT in 4_agent_with_long_term_memory.py, against the stub server."""
+
+    def test_cache_friendly_layout_raises_the_cache_hit_ratio(self, monkeypatch, on_stub):
+        """Moving the changing summary after the history means more of each request is a cache hit."""
+        agent = importlib.import_module("4_agent_with_long_term_memory")
+        monkeypatch.setattr(agent, "BACKGROUND_COMPRESSION", False)
+
+        async def conversation():
+            session = agent.LongTermSession(user_id="ada", long_term_memory={"facts": ["Builds voice agents"] * 20})
+            try:
+                for i in range(12):
+                    await agent.run_turn(session, f"Message {i}: " + "some detail " * 30)
+            finally:
+                await session.summarizer.shutdown()
+            return session
+
+        ratios = {}
+        for layout in (False, True):
+            monkeypatch.setattr(agent, "CACHE_FRIENDLY_LAYOUT", layout)
+            ratios[layout] = on_stub(agent, conversation).cache_hit_ratio
+
+        assert ratios[True] > ratios[False] + 0.05
+
+
+# =============================================================================
+# TEST 6: RETRIEVAL MEMORY
+# =============================================================================
+
+
+class TestVectorMemory:
+    """Tests for vector_memory.py and MEMORY_MODE = "retrieval" in 4_agent_with_long_term_memory.py."""
+
+    def test_index_search_persistence_and_dedup(self, tmp_path):
+        """Nearest memories come back first, duplicates are skipped, and a reopened index sees everything."""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(1000, 16)).astype(np.float32)
+        texts = [f"memory {i}" for i in range(1000)]
+        index = VectorIndex(tmp_path, "Alice", dimensions=16)
+
+        assert index.add(texts, ["facts"] * 1000, vectors) == 1000
+        assert index.add(["Memory 7", "new one"], ["facts", "preferences"], vectors[:2]) == 1
+
+        hits = index.search(vectors[42] + 0.01, k=3)
+        assert hits[0][0] == "memory 42" and hits[0][2] > 0.99
+        assert len(hits) == 3 and hits[0][2] >= hits[1][2] >= hits[2][2]
+
+        with open(index.vectors_path, "ab") as f:
+            f.write(b"\x00" * 64)  # A crash after writing a vector but before its text
+        reopened = VectorMemoryStore(tmp_path, dimensions=16).index("alice")
+        assert len(reopened) == 1001
+        assert "new one" in reopened and reopened.kinds[-1] == "preferences"
+
+        for torn in (24, 2):  # A crash partway through writing a vector row
+            with open(index.vectors_path, "ab") as f:
+                f.write(b"\x00" * torn)
+            assert VectorIndex(tmp_path, "alice", dimensions=16).search(vectors[42], k=1)[0][0] == "memory 42"
+
+        index.add(["added elsewhere"], ["facts"], vectors[:1])  # Another index on the same files
+        assert {text for text, _, _ in reopened.search(vectors[0], k=2)} == {"memory 0", "added elsewhere"}
+
+    def test_retrieval_keeps_prompt_size_constant(self, tmp_path, monkeypatch, on_stub):
+        """With 20 or 2,000 stored memories, a turn sends the same size prompt - with the relevant one in it."""
+        agent = importlib.import_module("4_agent_with_long_term_memory")
+        monkeypatch.setattr(agent, "MEMORY_MODE", "retrieval")
+        monkeypatch.setattr(agent, "VECTOR_DIR", tmp_path)
+        monkeypatch.setattr(agent, "_vector_store", None)
+        sent = []
+        build_messages = agent.build_messages
+
+        def capture(*args, **kwargs):
+            sent.append(build_messages(*args, **kwargs))
+            return sent[-1]
+
+        monkeypatch.setattr(agent, "build_messages", capture)
+
+        def turn(user_id, memories):
+            async def scenario():
+                await agent.remember(user_id, {"facts": memories})
+                session = await agent.start_session(user_id)
+                result = await agent.run_turn(session, "How is my vegetable garden doing?")
+                await session.summarizer.shutdown()
+                return result
+
+            return on_stub(agent, scenario)
+
+        filler = [f"Fact number {i} about topic {i * 7}" for i in range(2000)]
+        small = turn("small", filler[:19] + ["Grows tomatoes in a vegetable garden"])
+        large = turn("large", filler + ["Grows tomatoes in a vegetable garden"])
+
+        assert abs(large.prompt_tokens - small.prompt_tokens) < 0.2 * small.prompt_tokens
+        assert "Grows tomatoes in a vegetable garden" in str(sent[-1])
+
+
+# =============================================================================
+# TEST 7: LOCAL FACT MERGE
+# =============================================================================
+
+
+class TestFactMerge:
+    """Tests for fact_merge.py - deduplicating long-term memories without the LLM."""
+
+    def test_duplicates_near_duplicates_and_distinct_facts(self):
+        """Rephrasings collapse (keeping the detailed one); different or contradicting facts are kept."""
+        existing = ["Works at UniTN", "Lives in Rome", "Is building a voice assistant"]
+        candidates = [
+            "works at unitn.",  # Same after normalization
+            "Is building a voice assistant for the course",  # More detailed phrasing
+            "Lives in Milan",  # Contradiction, not a duplicate
+            "Prefers short answers",
+            "Prefers short answers!",
+        ]
+
+        merged, stats = merge_facts(existing, candidates)
+
+        assert merged == [
+            "Works at UniTN",
+            "Lives in Rome",
+            "Is building a voice assistant for the course",
+            "Lives in Milan",
+            "Prefers short answers",
+        ]
+        assert (stats.added, stats.duplicates, stats.replaced) == (2, 2, 1)
+
+    def test_merge_is_deterministic_and_loses_nothing(self):
+        """Same input, same output; every stored fact survives, if only as a more detailed phrasing."""
+        existing = {"facts": [f"Has visited city number {i} in {1990 + i}" for i in range(500)], "preferences": []}
+        candidates = {"facts": [f"Has visited city number {i} in {1990 + i}." for i in range(0, 500, 5)]
+                      + ["Speaks Italian"], "preferences": ["Likes examples in Python"]}
+
+        first, stats = merge_memory(existing, candidates)
+        second, _ = merge_memory(existing, candidates)
+
+        assert first == second
+        assert first["facts"] == existing["facts"] + ["Speaks Italian"]
+        assert first["preferences"] == ["Likes examples in Python"]
+        assert (stats.added, stats.duplicates, stats.replaced) == (2, 100, 0)
+
+        index = FactIndex(first["facts"])
+        assert index.find("has visited CITY number 42 in 2032") == 42
+        assert index.find("Has never visited a city") is None
+
+    def test_opposite_polarity_is_never_a_duplicate(self):
+        """A negated fact is a contradiction, not a rephrasing: neither side replaces or drops the other."""
+        pairs = [
+            ("Likes Python", "Dislikes Python"),
+            ("Is allergic to peanuts", "Is not allergic to peanuts"),
+            ("Is not allergic to peanuts", "Is allergic to peanuts"),  # Shorter correction
+            ("Likes Python", "Doesn't like Python"),
+            ("Is happy with the course", "Is unhappy with the course"),
+        ]
+        for stored, candidate in pairs:
+            merged, stats = merge_facts([stored], [candidate])
+            assert merged == [stored, candidate]
+            assert stats.added == 1
+
+    def test_prompt_mode_memory_is_capped(self, tmp_path, monkeypatch):
+        """Every stored memory goes into every prompt, so checkpoints keep only the newest MAX_MEMORY_ITEMS."""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-stub")
+        agent = importlib.import_module("4_agent_with_long_term_memory")
+        monkeypatch.setattr(agent, "_memory_store", CachedMemoryStore(SqliteMemoryStore(tmp_path / "memories.db")))
+        monkeypatch.setattr(agent, "MAX_MEMORY_ITEMS", 5)
+
+        async def extract(conversation):
+            return {"facts": [f"Owns {conversation[0]['content']} bikes"], "preferences": []}
+
+        monkeypatch.setattr(agent, "extract_long_term_facts", extract)
+        session = agent.LongTermSession(user_id="Ada", long_term_memory={})
+        for i in range(8):
+            session.conversation += [{"role": "user", "content": str(i)}, {"role": "assistant", "content": "ok"}]
+            asyncio.run(agent.checkpoint(session))
+
+        assert agent.get_user_memory("ada")["facts"] == [f"Owns {i} bikes" for i in range(3, 8)]
+
+    def test_malformed_extractions_count_as_nothing_new(self, monkeypatch):
+        """Valid JSON of the wrong shape must not crash a save or store garbage."""
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-stub")
+        agent = importlib.import_module("4_agent_with_long_term_memory")
+        empty = {"facts": [], "preferences": []}
+
+        for content in [None, "not json", "[]", '{"facts": null}', '{"facts": "Likes tea"}', '{"facts": [1, 2]}']:
+            assert agent.parse_candidates(content) == empty
+        assert agent.parse_candidates('{"facts": [" Likes tea ", ""]}') == {"facts": ["Likes tea"], "preferences": []}
+
+
+# =============================================================================
+# TEST 8: MULTI-USER MEMORY SERVER
+# =============================================================================
+
+
+class TestMemoryServer:
+    """Tests for 7_memory_server.py, over HTTP against the stub server."""
+
+    def serve(self, monkeypatch, tmp_path, on_stub, scenario, extract_seconds=0.0):
+        """Run scenario(server, http) with the memory server on a free port; facts are "Said: <first message>"."""
+        agent = importlib.import_module("4_agent_with_long_term_memory")
+        monkeypatch.setattr(agent, "_memory_store", CachedMemoryStore(SqliteMemoryStore(tmp_path / "memories.db")))
+        extracted = []
+
+        async def extract(conversation):
+            extracted.append(conversation)
+            await asyncio.sleep(extract_seconds)
+            return {"facts": [f"Said: {conversation[0]['content']}"], "preferences": []}
+
+        monkeypatch.setattr(agent, "extract_long_term_facts", extract)
+        memory_server = importlib.import_module("7_memory_server")
+
+        async def run():
+            server = memory_server.MemoryAgentServer(idle_timeout=60, checkpoint_interval=60)
+            listener = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+            port = listener.sockets[0].getsockname()[1]
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+                    await scenario(server, http)
+            finally:
+                await server.shutdown()
+                listener.close()
+                await listener.wait_closed()
+
+        on_stub(agent, run)
+        return agent.get_memory_store(), extracted
+
+    def test_sessions_are_isolated_checkpointed_and_evicted(self, monkeypatch, tmp_path, on_stub):
+        """Each user gets their own conversation; checkpoints save without ending it; idle sessions are saved and dropped."""
+
+        async def scenario(server, http):
+            async def user(i):
+                replies = []
+                for turn in range(3):
+                    response = await http.post("/chat", json={"user_id": f"user{i}", "message": f"user{i} turn{turn}"})
+                    replies.append(response.json())
+                return replies
+
+            results = await asyncio.gather(*[user(i) for i in range(20)])
+            for i, replies in enumerate(results):
+                assert [r["reply"] for r in replies] == [f"Stub reply: user{i} turn{t}" for t in range(3)]
+                assert [r["turn"] for r in replies] == [1, 2, 3]
+
+            assert await server.checkpoint_all() == 20
+            assert len(server.slots) == 20  # Saved, still open
+            assert await server.checkpoint_all() == 0  # Nothing new since
+
+            await http.post("/chat", json={"user_id": "USER0", "message": "back again"})
+            for key, slot in server.slots.items():
+                if key != "user0":
+                    slot.last_active -= 120
+            assert await server.evict_idle() == 19
+            assert list(server.slots) == ["user0"]
+            stats = (await http.get("/stats")).json()
+            assert stats["sessions"] == 1 and stats["turns_served"] == 61
+
+        store, extracted = self.serve(monkeypatch, tmp_path, on_stub, scenario)
+
+        assert len(extracted) == 21  # 20 checkpoints + user0's last turn, saved at shutdown
+        assert store.get("user7") == {"facts": ["Said: user7 turn0"], "preferences": []}
+        assert store.get("user0")["facts"] == ["Said: user0 turn0", "Said: back again"]
+
+    def test_one_users_messages_are_answered_in_order(self, monkeypatch, tmp_path, on_stub):
+        """Concurrent messages from one user are serialized; bad requests get 4xx, not a crash."""
+
+        async def scenario(server, http):
+            responses = await asyncio.gather(*[
+                http.post("/chat", json={"user_id": "ada", "message": f"message {i}"}) for i in range(5)
+            ])
+            assert sorted(r.json()["turn"] for r in responses) == [1, 2, 3, 4, 5]
+            conversation = server.slots["ada"].session.conversation
+            assert [m["role"] for m in conversation] == ["user", "assistant"] * 5
+            assert all(a["content"] == f"Stub reply: {u['content']}" for u, a in zip(conversation[::2], conversation[1::2]))
+
+            assert (await http.post("/chat", json={"user_id": "ada"})).status_code == 400
+            assert (await http.post("/chat", content=b"not json")).status_code == 400
+            assert (await http.get("/nope")).status_code == 404
+            ended = (await http.post("/end", json={"user_id": "ada"})).json()
+            assert ended["saved"]["facts"] == [f"Said: {conversation[0]['content']}"]
+            assert server.slots == {}
+
+        self.serve(monkeypatch, tmp_path, on_stub, scenario)
+
+    def test_checkpoint_does_not_hold_the_user_lock(self, monkeypatch, tmp_path, on_stub):
+        """A slow extraction doesn't delay the user's next message; ending mid-checkpoint doesn't extract twice."""
+
+        async def scenario(server, http):
+            await http.post("/chat", json={"user_id": "ada", "message": "I like tea"})
+            checkpoint = asyncio.create_task(server.checkpoint_all())
+            await asyncio.sleep(0.05)  # Extraction under way
+
+            start = time.monotonic()
+            reply = (await http.post("/chat", json={"user_id": "ada", "message": "and cake"})).json()
+            assert reply["turn"] == 2 and time.monotonic() - start < 0.4
+
+            ended = (await http.post("/end", json={"user_id": "ada"})).json()  # Waits for the checkpoint
+            assert ended["saved"]["facts"] == ["Said: I like tea", "Said: and cake"]
+            assert await checkpoint == 1
+
+        store, extracted = self.serve(monkeypatch, tmp_path, on_stub, scenario, extract_seconds=0.5)
+
+        assert [[m["content"] for m in turns] for turns in extracted] == [
+            ["I like tea", "Stub reply: I like tea"],
+            ["and cake", "Stub reply: and cake"],
+        ]
+
+    def test_internal_errors_are_not_leaked(self, monkeypatch, tmp_path, on_stub, capsys):
+        """A 500 response says only that something went wrong; the details go to the server log."""
+
+        async def scenario(server, http):
+            async def broken(user_id, message):
+                raise RuntimeError("secret internals")
+
+            monkeypatch.setattr(server, "chat", broken)
+            response = await http.post("/chat", json={"user_id": "ada", "message": "hi"})
+            assert response.status_code == 500
+            assert response.json() == {"error": "Internal server error"}
+
+        self.serve(monkeypatch, tmp_path, on_stub, scenario)
+        assert "secret internals" in capsys.readouterr().err
+
+    def test_malformed_requests_are_client_errors(self, monkeypatch, tmp_path, on_stub):
+        """A bad Content-Length or a body cut short is the client's fault: 400, not 500."""
+
+        async def scenario(server, http):
+            async def send(head, body=b""):
+                reader, writer = await asyncio.open_connection(http.base_url.host, http.base_url.port)
+                writer.write(b"POST /chat HTTP/1.1\r\nHost: x\r\n" + head + b"\r\n\r\n" + body)
+                writer.write_eof()
+                response = await reader.read()
+                writer.close()
+                return int(response.split(b" ")[1])
+
+            assert await send(b"Content-Length: ten") == 400
+            assert await send(b"Content-Length: -5") == 400
+            assert await send(b"Content-Length: 100", b'{"user_id": "ada"}') == 400
+
+        self.serve(monkeypatch, tmp_path, on_stub, scenario)
+
+    def test_one_failed_checkpoint_does_not_stop_the_others(self, monkeypatch, tmp_path, on_stub, capsys):
+        """The other sessions are still saved, counted and flushed; the failure is logged."""
+        agent = importlib.import_module("4_agent_with_long_term_memory")
+        save_turns = agent.save_turns
+
+        async def flaky(session, turns):
+            if session.user_id == "bob":
+                raise RuntimeError("extractor down")
+            return await save_turns(session, turns)
+
+        monkeypatch.setattr(agent, "save_turns", flaky)
+
+        async def scenario(server, http):
+            for user in ("ada", "bob", "cy"):
+                await http.post("/chat", json={"user_id": user, "message": f"I am {user}"})
+            assert await server.checkpoint_all() == 2
+            assert server.checkpoints == 2
+            assert server.slots["bob"].session.checkpointed_upto == 0  # Retried next round
+            assert agent.get_memory_store().backing.get("ada") == {"facts": ["Said: I am ada"], "preferences": []}
+            monkeypatch.setattr(agent, "save_turns", save_turns)
+
+        self.serve(monkeypatch, tmp_path, on_stub, scenario)
+        assert "Checkpoint failed for bob" in capsys.readouterr().out
@@ -0,0 +1,354 @@
+"""
+Tests for Lesson 10: Evaluation Lab
+
+These tests exercise the machinery around the blogify agent (running the
+generation grid) with stand-in agents, and need no API key.
+
+Run tests:
+    uv run pytest tests/test_lesson_10.py -v
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+import warnings
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+LAB_DIR = Path(__file__).parent.parent / "docs" / "labs" / "10_lab_eval_session"
+sys.path.insert(0, str(LAB_DIR))
+
+from blog_grid import load_results, run_grid  # noqa: E402
+from judge import JudgeEngine, JudgeItem, Rubric  # noqa: E402
+from reliability import (  # noqa: E402
+    STATISTICS,
+    bootstrap_ci,
+    cohen_kappa,
+    fleiss_kappa,
+    icc,
+    krippendorff_alpha,
+)
+from self_consistency import consistency, sample, sample_callable, sample_many  # noqa: E402
+
+ARTICLES = {"article_1": "World models...", "article_2": "A constitution..."}
+GUIDELINES = {"v1": "Be brief.", "v2": "Be playful."}
+
+
+# =============================================================================
+# TEST 1: GENERATION GRID
+# =============================================================================
+
+
+class TestBlogGrid:
+    """Tests for blog_grid.py - concurrent, incremental article × guidelines × sample runs."""
+
+    def test_grid_runs_concurrently_within_the_limit(self, tmp_path):
+        """Every cell is generated once, with no more than max_concurrent calls in flight."""
+        in_flight = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def blogify(article, guidelines):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)
+            with lock:
+                in_flight -= 1
+            return f"{guidelines} {article}"
+
+        results = run_grid(
+            blogify, ARTICLES, GUIDELINES, samples=3, store_path=tmp_path / "grid.jsonl", max_concurrent=4
+        )
+
+        assert len(results) == 2 * 2 * 3
+        assert 1 < peak <= 4
+        assert {(r["article"], r["guidelines"]) for r in results} == {
+            (a, g) for a in ARTICLES for g in GUIDELINES
+        }
+
+    def test_rerun_only_generates_new_cells(self, tmp_path):
+        """Stored cells are skipped; new samples, edited guidelines and failures are (re)generated."""
+        store = tmp_path / "grid.jsonl"
+        calls = []
+
+        def blogify(article, guidelines):
+            calls.append((article, guidelines))
+            if guidelines == "fail":
+                raise RuntimeError("rate limited")
+            return "blog"
+
+        run_grid(blogify, ARTICLES, GUIDELINES, samples=1, store_path=store)
+        assert len(calls) == 4
+
+        calls.clear()
+        run_grid(blogify, ARTICLES, GUIDELINES, samples=2, store_path=store)
+        assert len(calls) == 4  # Only the new sample #1 of each cell
+
+        calls.clear()
+        edited = {"v1": "Be brief.", "v2": "Be VERY playful."}
+        run_grid(blogify, ARTICLES, edited, samples=2, store_path=store)
+        assert {g for _, g in calls} == {"Be VERY playful."}  # v1 untouched
+
+        calls.clear()
+        run_grid(blogify, ARTICLES, {"v3": "fail"}, samples=1, store_path=store)
+        run_grid(blogify, ARTICLES, {"v3": "fail"}, samples=1, store_path=store)
+        assert len(calls) == 4  # Failures are stored as errors and retried next run
+        assert all(r["guidelines"] != "v3" for r in load_results(store))
+
+
+# =============================================================================
+# TEST 2: LLM-AS-JUDGE ENGINE
+# =============================================================================
+
+RUBRIC = Rubric("blog", {"accuracy": "Faithful to the source", "clarity": "Easy to follow"})
+
+
+def fake_judge(skip_ids=()):
+    """A stand-in judge: scores every item it is shown, except `skip_ids` when batched."""
+    prompts = []
+
+    def complete(system, user):
+        prompts.append(user)
+        ids = re.findall(r'<item id="([^"]+)">', user)
+        if len(ids) > 1:
+            ids = [i for i in ids if i not in skip_ids]
+        return json.dumps({
+            "judgments": [{"id": i, "scores": {"accuracy": 4, "clarity": 3}, "rationale": "ok"} for i in ids]
+        })
+
+    return complete, prompts
+
+
+class TestJudgeEngine:
+    """Tests for judge.py - batched, concurrent, cached rubric scoring."""
+
+    def test_items_are_packed_into_batches(self, tmp_path):
+        """12 items at 5 per call take 3 judge calls, and every item gets valid scores."""
+        complete, prompts = fake_judge()
+        engine = JudgeEngine(complete, cache_path=tmp_path / "cache.jsonl", max_batch_items=5)
+        items = [JudgeItem(f"blog_{i}", "article", f"blog text {i}") for i in range(12)]
+
+        judgments = engine.judge(items, RUBRIC)
+
+        assert len(prompts) == 3
+        assert [j.item_id for j in judgments] == [item.id for item in items]
+        assert all(j.scores == {"accuracy": 4, "clarity": 3} and j.error is None for j in judgments)
+
+    def test_judgments_are_cached_by_content(self, tmp_path):
+        """Re-judging the same content - even under new ids, in a new engine - makes no calls."""
+        cache = tmp_path / "cache.jsonl"
+        items = [JudgeItem(f"blog_{i}", "article", f"blog text {i}") for i in range(4)]
+        JudgeEngine(fake_judge()[0], cache_path=cache).judge(items, RUBRIC)
+
+        complete, prompts = fake_judge()
+        renamed = [JudgeItem(f"copy_{i}", item.input, item.output) for i, item in enumerate(items)]
+        judgments = JudgeEngine(complete, cache_path=cache).judge(renamed, RUBRIC)
+        assert prompts == []
+        assert all(j.cached for j in judgments)
+
+        stricter = Rubric("blog", {**RUBRIC.dimensions, "clarity": "Crystal clear"})
+        JudgeEngine(complete, cache_path=cache).judge(renamed, stricter)
+        assert len(prompts) == 1  # A changed rubric is a cache miss
+
+    def test_missing_items_are_retried_alone(self, tmp_path):
+        """An item the judge skipped in a batch is judged again in its own call."""
+        complete, prompts = fake_judge(skip_ids={"blog_2"})
+        engine = JudgeEngine(complete, cache_path=None)
+        items = [JudgeItem(f"blog_{i}", "article", "text") for i in range(4)]
+
+        judgments = engine.judge(items, RUBRIC)
+
+        assert len(prompts) == 2
+        assert '<item id="blog_2">' in prompts[1] and prompts[1].count("<item ") == 1
+        assert all(j.error is None for j in judgments)
+
+    def test_unbatchable_rubric_judges_one_item_per_call(self):
+        """A rubric that forbids batching never shows the judge two items at once."""
+        complete, prompts = fake_judge()
+        rubric = Rubric("pairwise-sensitive", RUBRIC.dimensions, batchable=False)
+        JudgeEngine(complete, cache_path=None).judge(
+            [JudgeItem(f"blog_{i}", "article", "text") for i in range(3)], rubric
+        )
+        assert len(prompts) == 3
+
+
+# =============================================================================
+# TEST 3: INTER-RATER RELIABILITY
+# =============================================================================
+
+# Shrout & Fleiss (1979): 6 targets × 4 judges
+SHROUT_FLEISS = np.array([[9, 2, 5, 8], [6, 1, 3, 2], [8, 4, 6, 8], [7, 1, 2, 6], [10, 5, 6, 9], [6, 2, 4, 7]])
+
+# Krippendorff (2011): 12 units × 4 observers, with missing ratings
+n = np.nan
+KRIPPENDORFF = np.array([
+    [1, 2, 3, 3, 2, 1, 4, 1, 2, n, n, n],
+    [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, n, 3],
+    [n, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, n],
+    [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, n],
+]).T
+
+
+class TestReliability:
+    """Tests for reliability.py - agreement statistics and their bootstrap CIs."""
+
+    def test_statistics_match_published_examples(self):
+        """Each statistic reproduces the worked example from its original paper."""
+        expected_icc = {"ICC(1,1)": 0.17, "ICC(2,1)": 0.29, "ICC(3,1)": 0.71, "ICC(3,k)": 0.91}
+        for form, value in expected_icc.items():
+            assert icc(SHROUT_FLEISS, form) == pytest.approx(value, abs=0.005)
+
+        assert krippendorff_alpha(KRIPPENDORFF, "nominal") == pytest.approx(0.743, abs=0.0005)
+        assert krippendorff_alpha(KRIPPENDORFF, "ordinal") == pytest.approx(0.815, abs=0.0005)
+        assert krippendorff_alpha(KRIPPENDORFF, "interval") == pytest.approx(0.849, abs=0.0005)
+
+        # Fleiss (1971) via Wikipedia: 10 items, 14 raters, categories 1-5
+        counts = [[0, 0, 0, 0, 14], [0, 2, 6, 4, 2], [0, 0, 3, 5, 6], [0, 3, 9, 2, 0], [2, 2, 8, 1, 1],
+                  [7, 7, 0, 0, 0], [3, 2, 6, 3, 0], [2, 5, 3, 2, 2], [6, 5, 2, 1, 0], [0, 2, 2, 3, 7]]
+        ratings = np.array([np.repeat(np.arange(1, 6), row) for row in counts])
+        assert fleiss_kappa(ratings) == pytest.approx(0.210, abs=0.0005)
+
+        # 5 of 8 agree, chance agreement 22/64
+        assert cohen_kappa([1, 1, 2, 2, 3, 3, 1, 2], [1, 2, 2, 2, 3, 1, 1, 3]) == pytest.approx(0.4286, abs=1e-4)
+
+    def test_kappa_on_a_single_category_is_perfect_agreement(self):
+        """Two raters who always give the same score agree perfectly, weighted or not - not 0/0."""
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")  # No divide-by-zero on the way
+            for weights in (None, "linear", "quadratic"):
+                assert cohen_kappa([4, 4, 4], [4, 4, 4], weights=weights) == 1.0
+        with pytest.raises(ValueError, match="Unknown weights"):
+            cohen_kappa([4, 4, 4], [4, 4, 4], weights="cubic")
+
+    def test_weighted_resamples_equal_explicit_resampling(self):
+        """A resample as item weights gives the same statistic as copying the drawn rows."""
+        rng = np.random.default_rng(0)
+        draws = rng.integers(0, len(KRIPPENDORFF), size=(20, len(KRIPPENDORFF)))
+        W = np.stack([np.bincount(d, minlength=len(KRIPPENDORFF)) for d in draws]).astype(float)
+
+        vectorized = STATISTICS["krippendorff_alpha"](KRIPPENDORFF, W, level="ordinal")
+        explicit = [krippendorff_alpha(KRIPPENDORFF[d], "ordinal") for d in draws]
+        np.testing.assert_allclose(vectorized, explicit)
+
+        vectorized = STATISTICS["icc"](SHROUT_FLEISS, W[:, :6])
+        explicit = [icc(SHROUT_FLEISS[np.repeat(np.arange(6), w.astype(int))]) for w in W[:, :6]]
+        np.testing.assert_allclose(vectorized, explicit)
+
+    def test_bootstrap_ci_brackets_the_estimate(self):
+        """Noisier raters give a lower estimate; the CI contains the estimate and narrows with more items."""
+        rng = np.random.default_rng(1)
+
+        def rate(n_items, noise):
+            truth = rng.integers(1, 6, n_items)
+            return np.clip(truth[:, None] + rng.integers(-noise, noise + 1, (n_items, 3)), 1, 5)
+
+        estimate, low, high = bootstrap_ci(rate(200, 1), "fleiss_kappa", n_resamples=5_000, seed=0)
+        assert low < estimate < high
+        assert bootstrap_ci(rate(200, 2), "fleiss_kappa", n_resamples=100, seed=0)[0] < estimate
+
+        _, wide_low, wide_high = bootstrap_ci(rate(50, 1), "fleiss_kappa", n_resamples=5_000, seed=0)
+        assert wide_high - wide_low > high - low
+
+
+# =============================================================================
+# TEST 4: SELF-CONSISTENCY SAMPLING
+# =============================================================================
+
+
+class FakeChatClient:
+    """Answers chat.completions.create(n=...) with n numbered choices and records each request."""
+
+    def __init__(self):
+        self.requests = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, n=1, **params):
+        with self.lock:
+            self.requests.append(n)
+        time.sleep(0.02)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"answer {i % 2}")) for i in range(n)],
+            usage=SimpleNamespace(prompt_tokens=100, completion_tokens=2 * n),
+        )
+
+
+class TestSelfConsistency:
+    """Tests for self_consistency.py - K samples per prompt in few requests, and their agreement."""
+
+    def test_samples_are_packed_into_n_requests(self):
+        """K=20 at 8 per request is 3 requests per prompt - the prompt is billed 3 times, not 20."""
+        client = FakeChatClient()
+        prompts = {f"q{i}": [{"role": "user", "content": f"Question {i}"}] for i in range(4)}
+
+        start = time.time()
+        results = sample_many(client, prompts, k=20, per_request=8, max_concurrent=12)
+        elapsed = time.time() - start
+
+        assert sorted(client.requests) == sorted([8, 8, 4] * 4)
+        assert elapsed < 0.02 * 12 / 2  # The 12 requests ran concurrently
+        for result in results.values():
+            assert len(result.samples) == 20
+            assert result.requests == 3
+            assert result.prompt_tokens == 300
+
+    def test_callable_fallback_keeps_going_past_errors(self):
+        """Without `n`, K concurrent calls; failed calls are recorded, not raised."""
+        calls = iter(range(100))
+        lock = threading.Lock()
+
+        def blogify(article, guidelines):
+            with lock:
+                call = next(calls)
+            if call == 0:
+                raise RuntimeError("overloaded")
+            return f"{guidelines} {article}"
+
+        result = sample_callable(blogify, ("article", "Be brief."), k=5)
+
+        assert result.samples == ["Be brief. article"] * 4
+        assert result.errors == ["RuntimeError: overloaded"]
+
+    def test_consistency_statistics(self):
+        """Formatting differences don't count as disagreement; numbers also get their spread."""
+        stats = consistency(["4", "4.", " 4", "The answer is 4."])
+        assert stats["agreement"] == 0.75
+        assert stats["distinct"] == 2
+        assert stats["mode"] == "4"
+        assert 0 < stats["similarity"] < 1
+        assert "mean" not in stats
+
+        scores = consistency(["3", "4", "5", "4"])
+        assert scores["mean"] == 4
+        assert scores["stdev"] == pytest.approx(0.7071, abs=1e-4)
+
+        assert consistency(["same"] * 5)["entropy_bits"] == 0
+        assert consistency(["a", "b", "c", "d"])["entropy_bits"] == 2
+
+    def test_refusals_and_non_finite_numbers(self):
+        """A completion without content is an error, not a sample; "nan" and "inf" aren't scores."""
+        client = FakeChatClient()
+        create = client.create
+
+        def create_with_refusal(model, messages, n=1, **params):
+            response = create(model, messages, n=n, **params)
+            response.choices[0] = SimpleNamespace(message=SimpleNamespace(content=None), finish_reason="content_filter")
+            return response
+
+        client.chat.completions.create = create_with_refusal
+        result = sample(client, [{"role": "user", "content": "Question"}], k=4)
+
+        assert len(result.samples) == 3
+        assert result.errors == ["No content (finish_reason=content_filter)"]
+
+        assert consistency(["4", None, "4"])["samples"] == 2
+        for odd in ("nan", "inf", "1e999"):
+            stats = consistency(["3", odd, "4"])
+            assert "mean" not in stats and stats["distinct"] == 3